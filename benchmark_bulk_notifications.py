@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""
+Benchmark send_bulk_notification against the previous per-user loop.
+
+The legacy path resolves each user with CustomUser.objects.get, inserts one
+Notification per user and blocks on a synchronous group_send for each. The
+bulk path resolves all users in one query, inserts with bulk_create in chunks
+and queues outbox events that the dispatcher then sends concurrently; its
+timing includes draining the outbox.
+
+Usage:
+    python benchmark_bulk_notifications.py [--users 10000] [--layer memory|redis]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'freelancehub_backend.settings')
+
+import django
+django.setup()
+
+from asgiref.sync import async_to_sync
+from channels.layers import channel_layers, get_channel_layer
+from django.conf import settings
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+
+from notifications.models import Notification
+from notifications.outbox import dispatch_batch
+from notifications.serializers import NotificationSerializer
+from notifications.utils import send_bulk_notification
+from users.models import CustomUser
+
+
+def legacy_send_bulk_notification(user_ids, title='', message='', notification_type='info', priority='medium'):
+    """The previous implementation: one lookup, insert and blocking send per user"""
+    notifications = []
+    for user_id in user_ids:
+        try:
+            user = CustomUser.objects.get(id=user_id)
+        except CustomUser.DoesNotExist:
+            continue
+        notification = Notification.objects.create(
+            user=user,
+            title=title or 'New Notification',
+            message=message,
+            notification_type=notification_type,
+            priority=priority,
+            data={}
+        )
+        async_to_sync(get_channel_layer().group_send)(f'notifications_{user.id}', {
+            'type': 'notification_message',
+            'message': {'type': 'notification', 'data': NotificationSerializer(notification).data}
+        })
+        notifications.append(notification)
+    return notifications
+
+
+def bulk_send_and_dispatch(user_ids, **kwargs):
+    notifications = send_bulk_notification(user_ids, **kwargs)
+
+    async def drain():
+        while await dispatch_batch():
+            pass
+
+    async_to_sync(drain)()
+    return notifications
+
+
+def measure(func, user_ids):
+    Notification.objects.all().delete()
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        notifications = func(user_ids, title='Benchmark', message='Scheduled maintenance tonight')
+        elapsed = time.perf_counter() - started
+    return {
+        'notifications': len(notifications),
+        'seconds': round(elapsed, 3),
+        'notifications_per_sec': round(len(notifications) / elapsed, 1),
+        'queries': len(queries),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--layer', choices=['memory', 'redis'], default='memory')
+    parser.add_argument('--redis-host', default='127.0.0.1')
+    parser.add_argument('--redis-port', type=int, default=6379)
+    args = parser.parse_args()
+
+    if args.layer == 'memory':
+        # Large capacity so undelivered group messages are not dropped mid-run
+        settings.CHANNEL_LAYERS = {'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+            'CONFIG': {'capacity': args.users * 2},
+        }}
+    else:
+        settings.CHANNEL_LAYERS = {'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [(args.redis_host, args.redis_port)]},
+        }}
+    channel_layers.backends = {}
+
+    setup_test_environment()
+    # The default query log keeps only the last 9000 queries
+    connection.queries_log = deque()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        CustomUser.objects.bulk_create([
+            CustomUser(username=f'bulk{i}', email=f'bulk{i}@example.com', user_type='freelancer')
+            for i in range(args.users)
+        ])
+        user_ids = list(CustomUser.objects.values_list('id', flat=True))
+
+        results = {
+            'legacy_per_user': measure(legacy_send_bulk_notification, user_ids),
+            'bulk': measure(bulk_send_and_dispatch, user_ids),
+        }
+        results['speedup'] = round(
+            results['legacy_per_user']['seconds'] / results['bulk']['seconds'], 1
+        )
+        print(json.dumps(results, indent=2))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+"""
+Benchmark ContractViewSet.analytics against the previous per-figure queries.
+
+Seeds one client with many contracts spread over several freelancers in a
+throwaway test database, then times the endpoint three ways: the previous
+implementation (a query per count and sum), the single conditional-aggregate
+pass with a cold cache, and a warm cache hit.
+
+Usage:
+    python benchmark_contract_analytics.py [--contracts 20000] [--runs 20]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'freelancehub_backend.settings')
+
+import django
+django.setup()
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from contracts.models import Contract
+from contracts.serializers import ContractSerializer
+from projects.models import Project, ProjectProposal
+from users.models import CustomUser
+
+STATUSES = ['draft', 'active', 'active', 'completed', 'completed', 'cancelled', 'terminated']
+
+
+def legacy_analytics(user):
+    """The previous implementation, minus the HTTP layer"""
+    contracts = Contract.objects.filter(project_proposal__project__client=user)
+    total_contracts = contracts.count()
+    active_contracts = contracts.filter(status='active').count()
+    completed_contracts = contracts.filter(status='completed').count()
+    cancelled_contracts = contracts.filter(status='cancelled').count()
+    total_value = contracts.aggregate(total=Sum('total_payment'))['total'] or 0
+    active_value = contracts.filter(status='active').aggregate(total=Sum('total_payment'))['total'] or 0
+    completed_value = contracts.filter(status='completed').aggregate(total=Sum('total_payment'))['total'] or 0
+    avg_value = total_value / total_contracts if total_contracts > 0 else 0
+    current_month = timezone.now().replace(day=1)
+    contracts_this_month = contracts.filter(created_at__gte=current_month).count()
+    overdue_contracts = contracts.filter(status='active', end_date__lt=timezone.now().date()).count()
+    recent_contracts = contracts.order_by('-created_at')[:5]
+    status_distribution = contracts.values('status').annotate(count=Count('status')).order_by('status')
+    return {
+        'summary': {
+            'total_contracts': total_contracts,
+            'active_contracts': active_contracts,
+            'completed_contracts': completed_contracts,
+            'cancelled_contracts': cancelled_contracts,
+            'total_value': total_value,
+            'active_value': active_value,
+            'completed_value': completed_value,
+            'average_contract_value': avg_value,
+            'contracts_this_month': contracts_this_month,
+            'overdue_contracts': overdue_contracts,
+        },
+        'status_distribution': list(status_distribution),
+        'recent_contracts': ContractSerializer(recent_contracts, many=True).data,
+    }
+
+
+def seed(contract_count, freelancer_count):
+    client = CustomUser.objects.create(username='bench-client', email='client@example.com', user_type='client')
+    CustomUser.objects.bulk_create([
+        CustomUser(username=f'bench-freelancer{i}', email=f'f{i}@example.com', user_type='freelancer')
+        for i in range(freelancer_count)
+    ])
+    freelancers = list(CustomUser.objects.filter(user_type='freelancer').values_list('id', flat=True))
+
+    deadline = timezone.now() + timedelta(days=30)
+    Project.objects.bulk_create([
+        Project(title=f'Project {i}', description='Benchmark', budget=1000, deadline=deadline, client=client)
+        for i in range(contract_count)
+    ], batch_size=1000)
+    projects = list(Project.objects.order_by('id').values_list('id', flat=True))
+    ProjectProposal.objects.bulk_create([
+        ProjectProposal(project_id=project_id, freelancer_id=freelancers[i % len(freelancers)],
+                        cover_letter='Benchmark', proposed_budget=900, status='accepted')
+        for i, project_id in enumerate(projects)
+    ], batch_size=1000)
+    proposals = list(ProjectProposal.objects.order_by('id').values_list('id', 'freelancer_id'))
+
+    today = date.today()
+    Contract.objects.bulk_create([
+        Contract(project_proposal_id=proposal_id, client=client, freelancer_id=freelancer_id,
+                 status=STATUSES[i % len(STATUSES)],
+                 start_date=today - timedelta(days=i % 400), end_date=today + timedelta(days=(i % 90) - 30),
+                 total_payment=100 + i % 5000)
+        for i, (proposal_id, freelancer_id) in enumerate(proposals)
+    ], batch_size=1000)
+    return client
+
+
+def measure(func, runs, before=None):
+    timings = []
+    query_counts = []
+    for _ in range(runs):
+        if before:
+            before()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        query_counts.append(len(queries))
+    return {
+        'median_ms': round(statistics.median(timings), 2),
+        'p90_ms': round(sorted(timings)[int(len(timings) * 0.9) - 1], 2),
+        'queries': max(query_counts),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--contracts', type=int, default=20000)
+    parser.add_argument('--freelancers', type=int, default=200)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        client = seed(args.contracts, args.freelancers)
+        api = APIClient()
+        api.force_authenticate(user=client)
+
+        def endpoint():
+            response = api.get('/api/contracts/contracts/analytics/')
+            assert response.status_code == 200
+
+        results = {
+            'contracts': args.contracts,
+            'legacy': measure(lambda: legacy_analytics(client), args.runs),
+            'single_pass_cold_cache': measure(endpoint, args.runs, before=cache.clear),
+            # The last cold run left the result cached
+            'single_pass_cached': measure(endpoint, args.runs),
+        }
+        results['speedup_cold'] = round(
+            results['legacy']['median_ms'] / results['single_pass_cold_cache']['median_ms'], 1
+        )
+        print(json.dumps(results, indent=2))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
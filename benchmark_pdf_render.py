@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+"""
+Benchmark contract, invoice and dispute PDF rendering.
+
+Renders each document type from a representative data snapshot and reports
+renders/sec and peak memory per document. The ``rebuilt_styles`` figures clear
+the style cache before every render, which is what every request paid when
+stylesheets were built inside the view.
+
+Usage:
+    python benchmark_pdf_render.py [--runs 200] [--milestones 12]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from contracts.pdf_generator import render_contract_pdf
+from disputes.pdf import render_dispute_pdf
+from freelancehub_backend import pdf
+from payments.pdf import render_invoice_pdf
+
+GENERATED_AT = 'October 19, 2026 at 09:30 AM'
+PARTIES = [
+    {'name': 'Ada Client', 'email': 'ada@example.com', 'id': 1},
+    {'name': 'Lin Freelancer', 'email': 'lin@example.com', 'id': 2},
+]
+
+
+def contract_data(milestones):
+    return {
+        'id': 1042,
+        'created': 'September 01, 2026',
+        'project_title': 'Marketing site redesign',
+        'status': 'Active',
+        'parties': PARTIES,
+        'total_payment': '12000.00',
+        'start_date': 'September 02, 2026',
+        'end_date': 'December 20, 2026',
+        'deliverables': 'Responsive templates, CMS integration and a style guide. ' * 6,
+        'milestones': [
+            {'title': f'Milestone {i}: design review & handover', 'amount': '1000.00',
+             'due_date': 'October 01, 2026', 'status': 'Pending'}
+            for i in range(milestones)
+        ],
+        'legacy_milestones': '',
+        'client_signed_on': 'September 01, 2026',
+        'freelancer_signed_on': 'September 02, 2026',
+        'generated_at': GENERATED_AT,
+    }
+
+
+def invoice_data():
+    return {
+        'id': 5311,
+        'issued': 'October 01, 2026',
+        'due': 'October 15, 2026',
+        'paid': 'October 03, 2026',
+        'status': 'Completed',
+        'contract_id': 1042,
+        'project_title': 'Marketing site redesign',
+        'parties': PARTIES,
+        'description': 'Milestone 3: component library and page templates',
+        'payment_type': 'Milestone Payment',
+        'milestone_number': 3,
+        'amount': '1000.00',
+        'platform_fee': '100.00',
+        'net_amount': '900.00',
+        'transaction_id': 'pi_3PzExample',
+        'notes': 'Thank you for the quick turnaround.',
+        'generated_at': GENERATED_AT,
+    }
+
+
+def dispute_data():
+    return {
+        'id': 77,
+        'title': 'Late delivery of milestone 3',
+        'type': 'Deadline Issue',
+        'priority': 'High',
+        'status': 'Resolved',
+        'opened': 'October 05, 2026',
+        'updated': 'October 09, 2026',
+        'opened_by': 'Lin Freelancer',
+        'project_title': 'Marketing site redesign',
+        'contract_id': 1042,
+        'description': 'The client changed the scope after sign-off, delaying delivery. ' * 8,
+        'resolution': 'Deadline extended by ten days; no penalty applied.',
+        'resolved_by': 'Support',
+        'generated_at': GENERATED_AT,
+    }
+
+
+def measure(render, data, runs, rebuild_styles=False):
+    render(data)  # warm up imports and the style cache
+    started = time.perf_counter()
+    for _ in range(runs):
+        if rebuild_styles:
+            pdf.styles.cache_clear()
+        render(data)
+    elapsed = time.perf_counter() - started
+
+    if rebuild_styles:
+        pdf.styles.cache_clear()
+    tracemalloc.start()
+    size = len(render(data))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'renders_per_sec': round(runs / elapsed, 1),
+        'peak_kib': round(peak / 1024, 1),
+        'pdf_kib': round(size / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--runs', type=int, default=200)
+    parser.add_argument('--milestones', type=int, default=12)
+    args = parser.parse_args()
+
+    if not pdf.REPORTLAB_AVAILABLE:
+        sys.exit('reportlab is not installed')
+
+    documents = {
+        'contract': (render_contract_pdf, contract_data(args.milestones)),
+        'invoice': (render_invoice_pdf, invoice_data()),
+        'dispute': (render_dispute_pdf, dispute_data()),
+    }
+    results = {}
+    for name, (render, data) in documents.items():
+        results[name] = {
+            'shared_styles': measure(render, data, args.runs),
+            'rebuilt_styles': measure(render, data, args.runs, rebuild_styles=True),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+Benchmark WebSocket handshake authentication under a reconnect storm.
+
+Simulates many clients reconnecting at once (e.g. after a deploy or a network
+blip) and measures how long it takes to populate scope['user'] with the old
+per-connect lookup from ChatConsumer.get_user_from_token, and with
+JWTAuthMiddleware with its user cache disabled, cold and warm.
+
+Usage:
+    python benchmark_ws_auth.py [--users 200] [--connects 5000] [--concurrency 500]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'freelancehub_backend.settings')
+
+import django
+django.setup()
+
+import jwt
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.test.utils import setup_test_environment
+
+from freelancehub_backend import jwt_middleware
+from users.email_auth import EmailTokenObtainPairSerializer
+from users.models import CustomUser
+
+
+async def inner_app(scope, receive, send):
+    assert scope['user'].is_authenticated
+
+
+class LegacyAuth:
+    """The previous ChatConsumer.get_user_from_token: decode and query per connect"""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        scope['user'] = await self.get_user(scope)
+        return await self.inner(scope, receive, send)
+
+    @database_sync_to_async
+    def get_user(self, scope):
+        token = parse_qs(scope['query_string'].decode())['token'][0]
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+        return CustomUser.objects.get(id=payload['user_id'])
+
+
+async def storm(app, tokens, connects, concurrency):
+    """Run ``connects`` handshakes with at most ``concurrency`` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def connect(i):
+        scope = {
+            'type': 'websocket',
+            'query_string': f'token={tokens[i % len(tokens)]}'.encode(),
+            'headers': [],
+        }
+        async with semaphore:
+            started = time.perf_counter()
+            await app(scope, None, None)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(connect(i) for i in range(connects)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'connects': connects,
+        'connects_per_sec': round(connects / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies), 3),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1], 3),
+        'max_ms': round(latencies[-1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--connects', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=500)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        users = CustomUser.objects.bulk_create([
+            CustomUser(username=f'bench{i}', email=f'bench{i}@example.com', user_type='client')
+            for i in range(args.users)
+        ])
+        tokens = [
+            str(EmailTokenObtainPairSerializer.get_token(user).access_token)
+            for user in CustomUser.objects.filter(id__in=[u.id for u in users])
+        ]
+        results = {}
+        results['legacy_per_connect'] = asyncio.run(
+            storm(LegacyAuth(inner_app), tokens, args.connects, args.concurrency)
+        )
+
+        app = jwt_middleware.JWTAuthMiddleware(inner_app)
+        jwt_middleware.user_cache.maxsize = 0
+        results['uncached_batched'] = asyncio.run(storm(app, tokens, args.connects, args.concurrency))
+
+        # Cold: fresh process after a deploy; warm: clients reconnecting after a blip
+        jwt_middleware.user_cache.maxsize = 10000
+        jwt_middleware.user_cache.clear()
+        results['cached_cold'] = asyncio.run(storm(app, tokens, args.connects, args.concurrency))
+        results['cached_warm'] = asyncio.run(storm(app, tokens, args.connects, args.concurrency))
+
+        print(json.dumps(results, indent=2))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
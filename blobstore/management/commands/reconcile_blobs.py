@@ -0,0 +1,73 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from blobstore.models import Blob
+from blobstore.storage import blob_fields, blob_storage, digest_from_name, reference_sources
+
+
+def count_references(fields, names=None):
+    """Blob references per digest from the FileField columns, optionally only for ``names``"""
+    counts = Counter()
+    for model, field in fields:
+        queryset = model._default_manager.exclude(**{field.attname: ''}).exclude(**{f'{field.attname}__isnull': True})
+        if names is not None:
+            queryset = queryset.filter(**{f'{field.attname}__in': names})
+        for name in queryset.values_list(field.attname, flat=True).iterator():
+            digest = digest_from_name(name)
+            if digest:
+                counts[digest] += 1
+    return counts
+
+
+class Command(BaseCommand):
+    help = "Recount blob references from every FileField and remove blobs nothing points at"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-minutes', type=int, default=60,
+            help='Keep unreferenced blobs younger than this; their rows may still be being saved'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report blobs that would change')
+
+    def handle(self, *args, **options):
+        fields = list(blob_fields())
+        counts = count_references(fields)
+        external = Counter()
+        for source in reference_sources:
+            for name in source():
+                digest = digest_from_name(name)
+                if digest:
+                    external[digest] += 1
+
+        cutoff = timezone.now() - timedelta(minutes=options['grace_minutes'])
+        fixed = removed = 0
+        for blob in Blob.objects.order_by('digest').iterator():
+            if blob.ref_count == counts[blob.digest] + external[blob.digest]:
+                continue
+            if options['dry_run']:
+                fixed += 1
+                continue
+
+            with transaction.atomic():
+                # Recount under the lock so uploads since the scan are not lost
+                blob = Blob.objects.select_for_update().filter(digest=blob.digest).first()
+                if blob is None:
+                    continue
+                expected = count_references(fields, [blob.name])[blob.digest] + external[blob.digest]
+                if expected == blob.ref_count:
+                    continue
+                if expected == 0 and blob.created_at < cutoff:
+                    blob.delete()
+                    # With the row gone the storage removes the file itself
+                    blob_storage.delete(blob.name)
+                    removed += 1
+                elif expected:
+                    Blob.objects.filter(digest=blob.digest).update(ref_count=expected)
+                    fixed += 1
+
+        verb = 'Would fix' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {fixed} blob reference counts; removed {removed} unreferenced blobs"))
@@ -0,0 +1,13 @@
+from django.db import models
+
+
+class Blob(models.Model):
+    """One stored file body, shared by every FileField that uploaded the same bytes"""
+    digest = models.CharField(max_length=64, primary_key=True)
+    name = models.CharField(max_length=100)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.digest} ({self.ref_count} refs)"
@@ -0,0 +1,186 @@
+"""
+Content-addressed storage for uploaded files.
+
+Each upload is stored once under its SHA-256 digest::
+
+    <MEDIA_ROOT>/blobs/<d[:2]>/<d[2:4]>/<digest><ext>
+
+and every FileField that saved the same bytes gets that same name back, so a
+deliverable attached to a project, a contract and a chat message is one file
+on disk. ``Blob.ref_count`` tracks how many rows point at it; ``delete()``
+releases one reference and removes the file with the last one.
+
+The count is bumped when the file is saved, before its row is written. Inside
+the caller's transaction that happens in a savepoint and rolls back with the
+row; outside one, a failed row save leaves the count high until
+``manage.py reconcile_blobs`` recounts references from the FileField columns
+and the registered reference sources.
+
+Uploads parsed by ``blobstore.uploadhandler`` already carry their digest, so
+saving a file that is already stored does not read or write it again. Other
+content is hashed while it is copied to a temporary file next to the blobs.
+Names that are not under ``blobs/`` (files saved before this storage) are
+handled exactly like ``FileSystemStorage``.
+"""
+import contextvars
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.db.models.fields.files import FileField
+
+BLOB_DIR = 'blobs'
+# Longest extension kept on blob names, dot included
+MAX_EXTENSION_LENGTH = 10
+
+# Callables yielding storage names held outside FileField columns; see reconcile_blobs
+reference_sources = []
+_retaining = contextvars.ContextVar('blobstore_retaining', default=False)
+
+
+def blob_name(digest, extension):
+    return f'{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+def digest_from_name(name):
+    """Return the digest a blob name was built from, or None for other names"""
+    parts = name.replace('\\', '/').split('/')
+    if len(parts) != 4 or parts[0] != BLOB_DIR:
+        return None
+    digest = os.path.splitext(parts[3])[0]
+    return digest if len(digest) == 64 else None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # The stored name comes from the content, not from upload_to
+        return name
+
+    def _save(self, name, content):
+        from .models import Blob
+
+        extension = os.path.splitext(name)[1].lower()
+        if len(extension) > MAX_EXTENSION_LENGTH:
+            extension = ''
+
+        digest = getattr(content, 'sha256', None)
+        if digest and self._add_reference(digest):
+            return Blob.objects.only('name').get(digest=digest).name
+
+        tmp_path, digest, size = self._spool(content)
+        try:
+            with transaction.atomic():
+                blob, _ = Blob.objects.select_for_update().get_or_create(
+                    digest=digest, defaults={'name': blob_name(digest, extension), 'size': size}
+                )
+                path = self.path(blob.name)
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(tmp_path, path)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(path, self.file_permissions_mode)
+                Blob.objects.filter(digest=digest).update(ref_count=F('ref_count') + 1)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return blob.name
+
+    def _add_reference(self, digest):
+        """Count one more reference to an existing blob; False when it is not stored yet"""
+        from .models import Blob
+
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update().filter(digest=digest).first()
+            if blob is None or not os.path.exists(self.path(blob.name)):
+                return False
+            Blob.objects.filter(digest=digest).update(ref_count=F('ref_count') + 1)
+        return True
+
+    def _spool(self, content):
+        """Copy ``content`` to a temporary file, hashing it on the way"""
+        tmp_dir = self.path(os.path.join(BLOB_DIR, 'tmp'))
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        sha256 = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    sha256.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return tmp_path, sha256.hexdigest(), size
+
+    def delete(self, name):
+        """Release one reference; the file goes with the last one"""
+        from .models import Blob
+
+        digest = digest_from_name(name) if name else None
+        if digest is None:
+            return super().delete(name)
+
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update().filter(digest=digest).first()
+            if blob is None:
+                return super().delete(name)
+            if blob.ref_count > 1:
+                Blob.objects.filter(digest=digest).update(ref_count=F('ref_count') - 1)
+                return
+            blob.delete()
+            super().delete(name)
+
+
+blob_storage = ContentAddressedStorage()
+
+
+def get_blob_storage():
+    """``storage=`` callable for FileFields, so MEDIA_ROOT overrides still apply"""
+    return blob_storage
+
+
+def register_reference_source(source):
+    """Count the names ``source()`` yields as blob references when reconciling"""
+    if source not in reference_sources:
+        reference_sources.append(source)
+
+
+@contextmanager
+def retain_files():
+    """Delete rows without releasing their blobs, for stores that take the references over"""
+    token = _retaining.set(True)
+    try:
+        yield
+    finally:
+        _retaining.reset(token)
+
+
+def blob_fields():
+    """``(model, field)`` for every concrete FileField stored in blobs"""
+    from django.apps import apps
+
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage):
+                yield model, field
+
+
+def release_files(sender, instance, **kwargs):
+    """post_delete receiver: release the blobs a deleted row pointed at"""
+    if _retaining.get():
+        return
+    for field in instance._meta.concrete_fields:
+        if not isinstance(field, FileField) or not isinstance(field.storage, ContentAddressedStorage):
+            continue
+        name = getattr(instance, field.attname).name
+        if name:
+            # Only once the delete is committed, a rollback keeps the row
+            transaction.on_commit(lambda name=name, storage=field.storage: storage.delete(name))
@@ -0,0 +1,147 @@
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from chats.models import ChatRoom, Message
+from contracts.models import Contract, ContractDocument
+from projects.models import Project, ProjectAttachment, ProjectProposal
+from .models import Blob
+from .storage import ContentAddressedStorage, blob_storage
+
+User = get_user_model()
+
+
+class ContentAddressedStorageTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client_user = User.objects.create_user(
+            username="client", email="client@example.com", password="testpass123", user_type='client'
+        )
+        freelancer = User.objects.create_user(
+            username="freelancer", email="freelancer@example.com", password="testpass123", user_type='freelancer'
+        )
+        self.project = Project.objects.create(
+            title="Website redesign",
+            description="Redesign the marketing site",
+            budget=1000,
+            deadline=timezone.now() + timedelta(days=30),
+            client=self.client_user
+        )
+        proposal = ProjectProposal.objects.create(
+            project=self.project, freelancer=freelancer, cover_letter="I can do this",
+            proposed_budget=900, status='accepted'
+        )
+        self.contract = Contract.objects.create(
+            project_proposal=proposal, start_date=date.today(), total_payment=900
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.client_user)
+
+    def upload(self, content=b"%PDF-1.4 final deliverable"):
+        project_response = self.client.post(
+            f"/api/projects/projects/{self.project.id}/upload_attachment/",
+            {"file": SimpleUploadedFile("Deliverable.PDF", content)}, format="multipart"
+        )
+        contract_response = self.client.post(
+            f"/api/contracts/contracts/{self.contract.id}/upload_document/",
+            {"document": SimpleUploadedFile("deliverable-v1.pdf", content)}, format="multipart"
+        )
+        self.assertEqual(project_response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(contract_response.status_code, status.HTTP_201_CREATED)
+
+    def test_identical_uploads_share_one_blob_until_the_last_reference_goes(self):
+        """Test dedupe across models, the hashed-upload fast path and refcounted deletes"""
+        with mock.patch.object(ContentAddressedStorage, '_spool', side_effect=ContentAddressedStorage._spool,
+                               autospec=True) as spool:
+            self.upload()
+        # The second upload arrived already hashed and its blob existed, so it was not copied
+        self.assertEqual(spool.call_count, 1)
+
+        attachment = ProjectAttachment.objects.get()
+        document = ContractDocument.objects.get()
+        self.assertEqual(attachment.file.name, document.file.name)
+        self.assertTrue(attachment.file.name.startswith('blobs/'))
+        self.assertTrue(attachment.file.name.endswith('.pdf'))
+        self.assertEqual(document.filename, "deliverable-v1.pdf")
+        blob = Blob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        path = attachment.file.path
+        self.assertEqual(len(os.listdir(os.path.dirname(path))), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment.delete()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(Blob.objects.get().ref_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.contract.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(Blob.objects.exists())
+
+
+class BlobReferenceTestCase(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=os.path.join(self.tmp, 'media'), CHAT_ARCHIVE_ROOT=os.path.join(self.tmp, 'archive')
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(username="sender", email="sender@example.com", password="testpass123")
+        self.room = ChatRoom.objects.create(is_group=False)
+        self.room.participants.add(self.user)
+
+    def send(self, content):
+        return Message.objects.create(
+            chat_room=self.room, sender=self.user, message_type='file',
+            attachment=ContentFile(content, name="notes.txt")
+        )
+
+    def test_chat_deletes_release_and_archives_keep_references(self):
+        """Test message deletes, archive hand-over and the reconcile command"""
+        deleted = self.send(b"deleted with its message")
+        path = deleted.attachment.path
+        with self.captureOnCommitCallbacks(execute=True):
+            deleted.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(Blob.objects.exists())
+
+        archived = self.send(b"kept by the archive")
+        Message.objects.filter(id=archived.id).update(created_at=timezone.now() - timedelta(days=400))
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("archive_messages", "--days", "180", stdout=StringIO())
+        self.assertFalse(Message.objects.exists())
+        self.assertEqual(Blob.objects.get().ref_count, 1)
+        self.assertTrue(os.path.exists(archived.attachment.path))
+
+        # A row save that failed after its upload, and a count that drifted
+        orphan = blob_storage.save("orphan.txt", ContentFile(b"row never saved"))
+        Blob.objects.filter(name=orphan).update(created_at=timezone.now() - timedelta(days=1))
+        Blob.objects.filter(name=archived.attachment.name).update(ref_count=5)
+
+        out = StringIO()
+        call_command("reconcile_blobs", stdout=out)
+        self.assertIn("Fixed 1 blob reference counts; removed 1 unreferenced blobs", out.getvalue())
+        self.assertEqual(Blob.objects.get().ref_count, 1)
+        self.assertFalse(os.path.exists(blob_storage.path(orphan)))
+        self.assertTrue(os.path.exists(archived.attachment.path))
@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_migrate
 
 class ChatsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
-    name = "chats"
\ No newline at end of file
+    name = "chats"
+
+    def ready(self):
+        from blobstore.storage import register_reference_source, release_files
+        from .archive import archived_attachment_names
+        from .models import Message
+        from .search import ensure_search_index
+        post_migrate.connect(ensure_search_index, sender=self)
+        post_delete.connect(release_files, sender=Message, dispatch_uid='chat_message_release_files')
+        register_reference_source(archived_attachment_names)
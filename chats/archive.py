@@ -0,0 +1,211 @@
+"""
+Cold storage for old chat messages.
+
+Messages past the hot window are moved out of ``chats_message`` into
+gzip-compressed, append-only JSONL segments, one directory per room::
+
+    <CHAT_ARCHIVE_ROOT>/<room_id>/index.json
+    <CHAT_ARCHIVE_ROOT>/<room_id>/segment-<first_id>-<last_id>.jsonl.gz
+
+Each record is the ``MessageSerializer`` payload captured at archive time plus
+the ids of the users who had read it, with attachment URLs pointing straight
+at storage. The index lists segments in id order so history reads only open
+the segments they need. Archived messages keep their attachment files in
+storage, each segment record holding the blob reference its row had, but are
+no longer part of the search index.
+"""
+import gzip
+import json
+import os
+from functools import lru_cache
+from urllib.parse import unquote, urlparse
+
+from django.conf import settings
+from django.db import transaction
+
+from blobstore.storage import retain_files
+
+SEGMENT_SIZE = 1000
+INDEX_FILE = 'index.json'
+
+
+def archive_root():
+    return getattr(settings, 'CHAT_ARCHIVE_ROOT', os.path.join(settings.BASE_DIR, 'chat_archive'))
+
+
+def room_dir(room_id):
+    return os.path.join(archive_root(), str(room_id))
+
+
+def load_index(room_id):
+    """Return the segment list for a room, oldest first"""
+    path = os.path.join(room_dir(room_id), INDEX_FILE)
+    try:
+        with open(path) as f:
+            return json.load(f)['segments']
+    except FileNotFoundError:
+        return []
+
+
+def _write_index(room_id, segments):
+    path = os.path.join(room_dir(room_id), INDEX_FILE)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'segments': segments}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _write_segment(room_id, records):
+    """Write one immutable segment and return its index entry"""
+    first_id, last_id = records[0]['id'], records[-1]['id']
+    name = f'segment-{first_id}-{last_id}.jsonl.gz'
+    path = os.path.join(room_dir(room_id), name)
+
+    with open(path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as f:
+            for record in records:
+                f.write(json.dumps(record, default=str).encode())
+                f.write(b'\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    return {
+        'file': name,
+        'first_id': first_id,
+        'last_id': last_id,
+        'first_created_at': records[0]['created_at'],
+        'last_created_at': records[-1]['created_at'],
+        'count': len(records),
+    }
+
+
+@lru_cache(maxsize=32)
+def _read_segment(path, mtime):
+    with gzip.open(path, 'rb') as f:
+        return tuple(json.loads(line) for line in f)
+
+
+def read_segment(room_id, segment):
+    path = os.path.join(room_dir(room_id), segment['file'])
+    return _read_segment(path, os.path.getmtime(path))
+
+
+def archived_history(room_id, before_id=None, limit=50):
+    """Return up to ``limit`` archived messages older than ``before_id``, newest first"""
+    results = []
+    for segment in reversed(load_index(room_id)):
+        if before_id is not None and segment['first_id'] >= before_id:
+            continue
+        for record in reversed(read_segment(room_id, segment)):
+            if before_id is not None and record['id'] >= before_id:
+                continue
+            results.append(record)
+            if len(results) >= limit:
+                return results
+    return results
+
+
+def archived_slice(room_id, offset=0, limit=50):
+    """Return up to ``limit`` archived messages after skipping the ``offset`` newest, newest first"""
+    results = []
+    for segment in reversed(load_index(room_id)):
+        if offset >= segment['count']:
+            offset -= segment['count']
+            continue
+        records = read_segment(room_id, segment)[::-1]
+        results.extend(records[offset:offset + limit - len(results)])
+        offset = 0
+        if len(results) >= limit:
+            break
+    return results
+
+
+def archived_count(room_id):
+    return sum(segment['count'] for segment in load_index(room_id))
+
+
+def iter_archived(room_id, after_id=None):
+    """Yield archived messages with an id above ``after_id``, oldest first"""
+    for segment in load_index(room_id):
+        if after_id is not None and segment['last_id'] <= after_id:
+            continue
+        path = os.path.join(room_dir(room_id), segment['file'])
+        with gzip.open(path, 'rb') as f:
+            for line in f:
+                record = json.loads(line)
+                if after_id is None or record['id'] > after_id:
+                    yield record
+
+
+def archived_attachment_names():
+    """Storage names of archived attachments; registered as a blobstore reference source"""
+    media_path = urlparse(settings.MEDIA_URL or '').path
+    try:
+        room_ids = [name for name in os.listdir(archive_root()) if name.isdigit()]
+    except FileNotFoundError:
+        return
+    for room_id in room_ids:
+        for record in iter_archived(room_id):
+            if record.get('attachment'):
+                path = unquote(urlparse(record['attachment']).path)
+                if media_path and path.startswith(media_path):
+                    path = path[len(media_path):]
+                yield path.lstrip('/')
+
+
+def archive_room(room_id, cutoff, segment_size=SEGMENT_SIZE, dry_run=False):
+    """
+    Move messages of a room created before ``cutoff`` into cold storage.
+
+    Segments are written and fsynced before the rows are deleted. Rows left
+    behind by an interrupted run are recognised by the index and only deleted.
+    Returns the number of messages archived.
+    """
+    from .models import Message
+    from .serializers import MessageSerializer
+
+    segments = load_index(room_id)
+    archived_up_to = segments[-1]['last_id'] if segments else 0
+
+    base_queryset = Message.objects.filter(chat_room_id=room_id, created_at__lt=cutoff)
+    if dry_run:
+        return base_queryset.filter(id__gt=archived_up_to).count()
+
+    os.makedirs(room_dir(room_id), exist_ok=True)
+
+    # Clean up rows already written to a segment by an interrupted run
+    with retain_files():
+        base_queryset.filter(id__lte=archived_up_to).delete()
+
+    archived = 0
+    while True:
+        batch = list(
+            base_queryset.filter(id__gt=archived_up_to)
+            .select_related('sender', 'chat_room')
+            .prefetch_related('read_by')
+            .order_by('id')[:segment_size]
+        )
+        if not batch:
+            break
+
+        records = []
+        for message in batch:
+            record = MessageSerializer(message).data
+            record['read_by_ids'] = [user.id for user in message.read_by.all()]
+            # The attachment endpoint 404s once the row is gone, so link the stored variants
+            for variant in ('thumbnail', 'preview'):
+                field_file = getattr(message, f'attachment_{variant}')
+                record[f'{variant}_url'] = field_file.url if field_file else None
+            records.append(record)
+
+        segments.append(_write_segment(room_id, records))
+        _write_index(room_id, segments)
+
+        archived_up_to = batch[-1].id
+        with transaction.atomic(), retain_files():
+            Message.objects.filter(id__in=[message.id for message in batch]).delete()
+        archived += len(batch)
+
+    return archived
@@ -1,23 +1,18 @@
 import json
-import jwt
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.contrib.auth import get_user_model
-from django.conf import settings
 from .models import ChatRoom, Message
 
-User = get_user_model()
-
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         """Handle WebSocket connection"""
         self.chat_room_id = self.scope['url_route']['kwargs']['chat_room_id']
         self.room_group_name = f'chat_{self.chat_room_id}'
         
-        # Get user from JWT token
-        self.user = await self.get_user_from_token()
+        # User is resolved from the JWT by JWTAuthMiddleware
+        self.user = self.scope['user']
         
-        if not self.user:
+        if not self.user.is_authenticated:
             await self.close(code=4001)  # Unauthorized
             return
         
@@ -47,7 +42,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection"""
-        if hasattr(self, 'user') and self.user:
+        if hasattr(self, 'user') and self.user.is_authenticated:
             # Notify that user left
             await self.channel_layer.group_send(
                 self.room_group_name,
@@ -121,6 +116,13 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'message': event['message']
         }))
 
+    async def message_updated(self, event):
+        """Send updated message fields, such as finished image variants, to WebSocket"""
+        await self.send(text_data=json.dumps({
+            'type': 'message_updated',
+            'message': event['message']
+        }))
+
     async def typing_indicator(self, event):
         """Send typing indicator to WebSocket"""
         # Don't send typing indicator back to the sender
@@ -150,34 +152,6 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 'username': event['username']
             }))
 
-    @database_sync_to_async
-    def get_user_from_token(self):
-        """Extract user from JWT token in query parameters"""
-        try:
-            token = None
-            query_string = self.scope.get('query_string', b'').decode()
-            
-            # Parse query string to get token
-            for param in query_string.split('&'):
-                if param.startswith('token='):
-                    token = param.split('=')[1]
-                    break
-            
-            if not token:
-                return None
-            
-            # Decode JWT token
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            user_id = payload.get('user_id')
-            
-            if user_id:
-                return User.objects.get(id=user_id)
-            
-        except (jwt.InvalidTokenError, User.DoesNotExist, Exception):
-            pass
-        
-        return None
-
     @database_sync_to_async
     def check_user_participation(self):
         """Check if user is a participant in the chat room"""
@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chats.archive import archive_room, SEGMENT_SIZE
+from chats.models import ChatRoom, Message
+
+
+class Command(BaseCommand):
+    help = "Move chat messages older than the hot window into compressed per-room segments"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=getattr(settings, 'CHAT_ARCHIVE_AFTER_DAYS', 180),
+            help='Archive messages older than this many days'
+        )
+        parser.add_argument('--room', type=int, help='Only archive this chat room')
+        parser.add_argument(
+            '--segment-size',
+            type=int,
+            default=SEGMENT_SIZE,
+            help='Messages per segment file'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be archived')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+
+        if options['room']:
+            room_ids = [options['room']]
+        else:
+            room_ids = list(
+                Message.objects.filter(created_at__lt=cutoff)
+                .values_list('chat_room_id', flat=True)
+                .distinct()
+                .order_by('chat_room_id')
+            )
+
+        total = 0
+        for room_id in room_ids:
+            if not ChatRoom.objects.filter(id=room_id).exists():
+                continue
+            count = archive_room(
+                room_id,
+                cutoff,
+                segment_size=options['segment_size'],
+                dry_run=options['dry_run']
+            )
+            if count:
+                self.stdout.write(f"Room {room_id}: {count} messages")
+            total += count
+
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {total} messages older than {cutoff:%Y-%m-%d}"))
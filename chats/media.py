@@ -0,0 +1,116 @@
+"""
+Image variant generation for chat attachments.
+
+Image uploads are resized into small ``thumbnail`` and ``preview`` variants by a
+background worker pool so chat history never has to ship the original file.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+
+# Try to import Pillow, but handle gracefully if not installed
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels for each generated variant
+IMAGE_VARIANTS = {
+    'thumbnail': getattr(settings, 'CHAT_THUMBNAIL_SIZE', 200),
+    'preview': getattr(settings, 'CHAT_PREVIEW_SIZE', 800),
+}
+VARIANT_QUALITY = 82
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'CHAT_IMAGE_WORKERS', 2),
+    thread_name_prefix='chat-media'
+)
+
+
+def variant_upload_path(instance, filename):
+    """Generate upload path for generated image variants"""
+    return os.path.join('chat_files', str(instance.chat_room_id), 'variants', filename)
+
+
+def render_variant(image, max_edge):
+    """Return JPEG bytes of ``image`` scaled down to fit ``max_edge``"""
+    variant = image.copy()
+    variant.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    if variant.mode not in ('RGB', 'L'):
+        variant = variant.convert('RGB')
+
+    buffer = BytesIO()
+    variant.save(buffer, format='JPEG', quality=VARIANT_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def generate_image_variants(message_id):
+    """Build all configured variants for an image message"""
+    from .models import Message
+
+    close_old_connections()
+    try:
+        message = Message.objects.get(id=message_id)
+        if message.message_type != 'image' or not message.attachment:
+            return
+
+        with message.attachment.open('rb') as source:
+            image = Image.open(source)
+            image = ImageOps.exif_transpose(image)
+            image.load()
+
+        base_name = os.path.splitext(os.path.basename(message.attachment.name))[0]
+        update_fields = []
+        for variant, max_edge in IMAGE_VARIANTS.items():
+            field = getattr(message, f'attachment_{variant}')
+            field.save(
+                f'{message.id}_{base_name}_{variant}.jpg',
+                ContentFile(render_variant(image, max_edge)),
+                save=False
+            )
+            update_fields.append(f'attachment_{variant}')
+
+        message.save(update_fields=update_fields)
+        notify_variants_ready(message)
+    except Message.DoesNotExist:
+        pass
+    except Exception as e:
+        logger.error(f"Failed to generate image variants for message {message_id}: {e}")
+    finally:
+        close_old_connections()
+
+
+def notify_variants_ready(message):
+    """Tell the room that the message now has thumbnail and preview URLs"""
+    from .serializers import MessageSerializer
+
+    serializer = MessageSerializer(message)
+    async_to_sync(get_channel_layer().group_send)(
+        f'chat_{message.chat_room_id}',
+        {
+            'type': 'message_updated',
+            'message': {
+                'id': message.id,
+                'thumbnail_url': serializer.get_thumbnail_url(message),
+                'preview_url': serializer.get_preview_url(message),
+            }
+        }
+    )
+
+
+def schedule_image_variants(message):
+    """Queue variant generation once the message row is committed"""
+    if not PIL_AVAILABLE or message.message_type != 'image' or not message.attachment:
+        return
+
+    transaction.on_commit(lambda: _executor.submit(generate_image_variants, message.id))
@@ -1,7 +1,9 @@
 from django.db import models
 from django.conf import settings
 from jobs.models import Job
+from blobstore.storage import get_blob_storage
 from contracts.models import Contract
+from .media import variant_upload_path
 import os
 
 def chat_file_upload_path(instance, filename):
@@ -86,9 +88,11 @@ class Message(models.Model):
         default='text'
     )
     
-    # File attachment fields
+    # File attachment fields; deleting a message releases its blob, except when
+    # archive_room moves it to a segment, which then holds the reference
     attachment = models.FileField(
         upload_to=chat_file_upload_path, 
+        storage=get_blob_storage,
         null=True, 
         blank=True
     )
@@ -96,6 +100,18 @@ class Message(models.Model):
     attachment_size = models.PositiveIntegerField(null=True, blank=True)
     attachment_type = models.CharField(max_length=100, blank=True)
     
+    # Downscaled image variants generated in the background
+    attachment_thumbnail = models.FileField(
+        upload_to=variant_upload_path, 
+        null=True, 
+        blank=True
+    )
+    attachment_preview = models.FileField(
+        upload_to=variant_upload_path, 
+        null=True, 
+        blank=True
+    )
+    
     # Message status
     is_edited = models.BooleanField(default=False)
     edited_at = models.DateTimeField(null=True, blank=True)
@@ -0,0 +1,171 @@
+"""
+Full-text search over chat messages.
+
+On SQLite the index is an external-content FTS5 table kept in sync with
+``chats_message`` by triggers, so inserts, edits and deletes update it
+incrementally. The room id is indexed alongside the content so per-room
+searches are resolved inside the index. Other databases fall back to a
+``icontains`` scan.
+"""
+import html
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+
+FTS_TABLE = 'chats_message_fts'
+SNIPPET_TOKENS = 12
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_END = '</mark>'
+
+# Private-use markers let snippets be HTML-escaped before highlighting
+_MARK_START = '\ue000'
+_MARK_END = '\ue001'
+
+CREATE_STATEMENTS = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        content,
+        chat_room_id,
+        content='chats_message',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON chats_message BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, content, chat_room_id)
+        VALUES (new.id, new.content, new.chat_room_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON chats_message BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content, chat_room_id)
+        VALUES ('delete', old.id, old.content, old.chat_room_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF content, chat_room_id ON chats_message BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content, chat_room_id)
+        VALUES ('delete', old.id, old.content, old.chat_room_id);
+        INSERT INTO {FTS_TABLE}(rowid, content, chat_room_id)
+        VALUES (new.id, new.content, new.chat_room_id);
+    END
+    """,
+]
+
+
+def fts_available(using=DEFAULT_DB_ALIAS):
+    return connections[using].vendor == 'sqlite'
+
+
+def ensure_search_index(using=DEFAULT_DB_ALIAS, **kwargs):
+    """Create the FTS table and triggers, building the index on first run"""
+    if not fts_available(using):
+        return
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE]
+        )
+        exists = cursor.fetchone() is not None
+
+        for statement in CREATE_STATEMENTS:
+            cursor.execute(statement)
+
+        if not exists:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def build_match_query(query):
+    """
+    Turn free text into a safe FTS5 expression.
+
+    Every word is quoted so user input cannot inject FTS syntax, words are
+    ANDed together and the last word is treated as a prefix.
+    """
+    terms = [term.replace('"', '""') for term in query.split()]
+    if not terms:
+        return None
+    phrases = [f'"{term}"' for term in terms]
+    phrases[-1] += '*'
+    return 'content : (' + ' '.join(phrases) + ')'
+
+
+def search_messages(user, query, chat_room_id=None, cursor=None, limit=20):
+    """
+    Return ``(message_id, snippet)`` pairs, newest first.
+
+    Results are limited to rooms the user participates in and paginated by
+    message id: pass the last id of a page as ``cursor`` to get the next one.
+    """
+    if fts_available():
+        return _search_fts(user, query, chat_room_id, cursor, limit)
+    return _search_fallback(user, query, chat_room_id, cursor, limit)
+
+
+def _search_fts(user, query, chat_room_id, cursor, limit):
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    sql = f"""
+        SELECT f.rowid,
+               snippet({FTS_TABLE}, 0, %s, %s, '…', %s)
+        FROM {FTS_TABLE} f
+        INNER JOIN chats_message m ON m.id = f.rowid
+        WHERE {FTS_TABLE} MATCH %s
+    """
+    params = [_MARK_START, _MARK_END, SNIPPET_TOKENS]
+    if chat_room_id:
+        # The room is part of the index, so the match itself is room-scoped
+        params.append(f'({match}) AND chat_room_id : "{int(chat_room_id)}"')
+    else:
+        params.append(match)
+
+    # Per-candidate membership check through the participants index
+    sql += """
+          AND EXISTS (
+              SELECT 1 FROM chats_chatroom_participants p
+              WHERE p.chatroom_id = m.chat_room_id AND p.customuser_id = %s
+          )
+    """
+    params.append(user.id)
+    if cursor:
+        sql += " AND f.rowid < %s"
+        params.append(int(cursor))
+    sql += " ORDER BY f.rowid DESC LIMIT %s"
+    params.append(limit)
+
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        return [(message_id, _render_snippet(snippet)) for message_id, snippet in db_cursor.fetchall()]
+
+
+def _search_fallback(user, query, chat_room_id, cursor, limit):
+    from .models import Message
+
+    terms = query.split()
+    if not terms:
+        return []
+
+    queryset = Message.objects.filter(chat_room__participants=user)
+    if chat_room_id:
+        queryset = queryset.filter(chat_room_id=chat_room_id)
+    for term in terms:
+        queryset = queryset.filter(content__icontains=term)
+    if cursor:
+        queryset = queryset.filter(id__lt=cursor)
+
+    rows = queryset.order_by('-id').values_list('id', 'content')[:limit]
+    return [(message_id, highlight(content, terms)) for message_id, content in rows]
+
+
+def highlight(content, terms):
+    """Mark matched terms in plain text the same way FTS5 snippets do"""
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    return _render_snippet(pattern.sub(lambda m: f'{_MARK_START}{m.group(0)}{_MARK_END}', content))
+
+
+def _render_snippet(snippet):
+    """Escape message text and turn match markers into highlight tags"""
+    return html.escape(snippet).replace(_MARK_START, HIGHLIGHT_START).replace(_MARK_END, HIGHLIGHT_END)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.urls import reverse
 from .models import ChatRoom, Message, Chat
 
 User = get_user_model()
@@ -19,6 +20,8 @@ class MessageSerializer(serializers.ModelSerializer):
     read_by_users = UserBasicSerializer(source='read_by', many=True, read_only=True)
     is_read_by_current_user = serializers.SerializerMethodField()
     attachment_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    preview_url = serializers.SerializerMethodField()
     file_size_formatted = serializers.SerializerMethodField()
 
     class Meta:
@@ -26,7 +29,8 @@ class MessageSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'chat_room', 'sender', 'content', 'message_type',
             'attachment', 'attachment_name', 'attachment_size', 'attachment_type',
-            'attachment_url', 'file_size_formatted', 'is_edited', 'edited_at',
+            'attachment_url', 'thumbnail_url', 'preview_url',
+            'file_size_formatted', 'is_edited', 'edited_at',
             'read_by_users', 'is_read_by_current_user', 'created_at', 'updated_at'
         ]
         read_only_fields = [
@@ -36,6 +40,8 @@ class MessageSerializer(serializers.ModelSerializer):
     def get_is_read_by_current_user(self, obj):
         request = self.context.get('request')
         if request and hasattr(request, 'user') and request.user.is_authenticated:
+            if 'read_by' in getattr(obj, '_prefetched_objects_cache', {}):
+                return any(user.id == request.user.id for user in obj.read_by.all())
             return obj.is_read_by(request.user)
         return False
 
@@ -53,6 +59,22 @@ class MessageSerializer(serializers.ModelSerializer):
                 return obj.attachment.url
         return None
 
+    def get_thumbnail_url(self, obj):
+        return self._get_variant_url(obj, 'thumbnail')
+
+    def get_preview_url(self, obj):
+        return self._get_variant_url(obj, 'preview')
+
+    def _get_variant_url(self, obj, variant):
+        """URL of the streaming endpoint for a generated image variant"""
+        if not getattr(obj, f'attachment_{variant}'):
+            return None
+        url = f"{reverse('message-attachment', kwargs={'pk': obj.id})}?variant={variant}"
+        request = self.context.get('request')
+        if request:
+            return request.build_absolute_uri(url)
+        return url
+
     def get_file_size_formatted(self, obj):
         if obj.attachment_size:
             # Convert bytes to human readable format
@@ -0,0 +1,122 @@
+"""
+Conditional and ranged file delivery for chat attachments.
+"""
+import hashlib
+import re
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
+
+from blobstore.storage import digest_from_name
+
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_etag(field_file):
+    """
+    Strong ETag derived from the file content
+
+    Blobs already carry their SHA-256 in the stored name; any other file is
+    hashed as it is read.
+    """
+    digest = digest_from_name(field_file.name)
+    if digest is None:
+        hasher = hashlib.sha256()
+        with field_file.open('rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+    return f'"{digest}"'
+
+
+def parse_range(header, size):
+    """
+    Parse a single ``bytes=`` range header.
+
+    Returns an inclusive ``(start, end)`` tuple, ``None`` when the header is
+    absent or unsupported, or ``False`` when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def iter_file_range(field_file, start, length):
+    """Yield ``length`` bytes of the file starting at ``start``"""
+    with field_file.open('rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def stream_field_file(request, field_file, content_type, filename=None):
+    """
+    Stream a stored file honouring ``If-None-Match`` and ``Range`` headers
+    """
+    size = field_file.size
+    etag = file_etag(field_file)
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response
+
+    byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+
+    # Serve the full file if If-Range does not match the current version
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if byte_range and if_range and if_range.strip() != etag:
+        byte_range = None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            iter_file_range(field_file, start, length),
+            status=206,
+            content_type=content_type
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    else:
+        length = size
+        response = StreamingHttpResponse(
+            iter_file_range(field_file, 0, size),
+            content_type=content_type
+        )
+
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=86400'
+    if filename:
+        response['Content-Disposition'] = f'inline; filename="{filename}"'
+    return response
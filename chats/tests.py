@@ -1,3 +1,339 @@
-from django.test import TestCase
+import hashlib
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.core.management import call_command
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
+from rest_framework import status
+from PIL import Image
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from blobstore.storage import digest_from_name
+
+from .models import ChatRoom, Message
+from .media import generate_image_variants
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+)
+class MessageAttachmentTestCase(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="chatter",
+            email="chatter@example.com",
+            password="testpass123"
+        )
+        self.chat_room = ChatRoom.objects.create(is_group=False)
+        self.chat_room.participants.add(self.user)
+
+        buffer = BytesIO()
+        Image.new('RGB', (1600, 1200), color='red').save(buffer, format='PNG')
+        self.message = Message.objects.create(
+            chat_room=self.chat_room,
+            sender=self.user,
+            message_type='image',
+            attachment=SimpleUploadedFile('photo.png', buffer.getvalue(), content_type='image/png'),
+            attachment_name='photo.png',
+            attachment_type='image/png'
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def attachment_url(self, variant):
+        return f"/api/chats/messages/{self.message.id}/attachment/?variant={variant}"
+
+    def test_generates_downscaled_variants(self):
+        """Test that thumbnail and preview variants are created, exposed and announced"""
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(f"chat_{self.chat_room.id}", channel)
+
+        generate_image_variants(self.message.id)
+        self.message.refresh_from_db()
+
+        event = async_to_sync(channel_layer.receive)(channel)
+        self.assertEqual(event["type"], "message_updated")
+        self.assertEqual(event["message"]["id"], self.message.id)
+        self.assertTrue(event["message"]["preview_url"].endswith(self.attachment_url("preview")))
+
+        with self.message.attachment_thumbnail.open('rb') as f:
+            self.assertEqual(max(Image.open(f).size), 200)
+        with self.message.attachment_preview.open('rb') as f:
+            self.assertEqual(max(Image.open(f).size), 800)
+
+        response = self.client.get(f"/api/chats/messages/{self.message.id}/")
+        self.assertTrue(response.data["thumbnail_url"].endswith(self.attachment_url("thumbnail")))
+
+    def test_variant_urls_empty_until_generated(self):
+        """Test that variant URLs are null before the worker has run"""
+        response = self.client.get(f"/api/chats/messages/{self.message.id}/")
+        self.assertIsNone(response.data["thumbnail_url"])
+        self.assertIsNone(response.data["preview_url"])
+
+    def test_range_and_etag(self):
+        """Test partial content and conditional requests"""
+        size = self.message.attachment.size
+
+        response = self.client.get(self.attachment_url("original"), HTTP_RANGE="bytes=0-99")
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response["Content-Range"], f"bytes 0-99/{size}")
+        self.assertEqual(len(b"".join(response.streaming_content)), 100)
+
+        etag = response["ETag"]
+        response = self.client.get(self.attachment_url("original"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(self.attachment_url("original"), HTTP_RANGE=f"bytes={size}-")
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+    def test_etag_follows_content(self):
+        """Test that ETags come from file content, not the stored name and size"""
+        response = self.client.get(self.attachment_url("original"))
+        digest = digest_from_name(self.message.attachment.name)
+        self.assertEqual(response["ETag"], f'"{digest}"')
+
+        generate_image_variants(self.message.id)
+        self.message.refresh_from_db()
+        with self.message.attachment_thumbnail.open('rb') as f:
+            content = f.read()
+        response = self.client.get(self.attachment_url("thumbnail"))
+        self.assertEqual(response["ETag"], f'"{hashlib.sha256(content).hexdigest()}"')
+
+        # Same name and size, different bytes
+        self.message.attachment_thumbnail.storage.delete(self.message.attachment_thumbnail.name)
+        self.message.attachment_thumbnail.storage.save(
+            self.message.attachment_thumbnail.name, ContentFile(bytes(reversed(content)))
+        )
+        response = self.client.get(self.attachment_url("thumbnail"), HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_missing_variant_returns_404(self):
+        """Test that requesting a variant that is not ready returns 404"""
+        response = self.client.get(self.attachment_url("thumbnail"))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class MessageSearchTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="searcher",
+            email="searcher@example.com",
+            password="testpass123"
+        )
+        self.outsider = User.objects.create_user(
+            username="outsider",
+            email="outsider@example.com",
+            password="testpass123"
+        )
+        self.room = ChatRoom.objects.create(is_group=False)
+        self.room.participants.add(self.user)
+        self.other_room = ChatRoom.objects.create(is_group=False)
+        self.other_room.participants.add(self.user)
+        self.private_room = ChatRoom.objects.create(is_group=False)
+        self.private_room.participants.add(self.outsider)
+
+        for i in range(3):
+            Message.objects.create(chat_room=self.room, sender=self.user, content=f"invoice draft {i}")
+        Message.objects.create(chat_room=self.other_room, sender=self.user, content="final invoice <b>sent</b>")
+        Message.objects.create(chat_room=self.private_room, sender=self.outsider, content="secret invoice")
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_search_scoped_to_participant_rooms(self):
+        """Test that search only returns messages from the user's rooms"""
+        response = self.client.get("/api/chats/messages/search/", {"q": "invoice"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        contents = [r["content"] for r in response.data["results"]]
+        self.assertEqual(len(contents), 4)
+        self.assertNotIn("secret invoice", contents)
+
+    def test_search_single_room_with_cursor(self):
+        """Test per-room search paginated by cursor"""
+        response = self.client.get(
+            "/api/chats/messages/search/", {"q": "invoice", "chat_room": self.room.id, "limit": 2}
+        )
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIsNotNone(response.data["next_cursor"])
+
+        response = self.client.get(
+            "/api/chats/messages/search/",
+            {"q": "invoice", "chat_room": self.room.id, "limit": 2, "cursor": response.data["next_cursor"]}
+        )
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertIsNone(response.data["next_cursor"])
+
+    def test_search_limit_is_clamped(self):
+        """Test that zero or negative limits return a single hit instead of failing"""
+        for limit in (0, -1):
+            response = self.client.get(
+                "/api/chats/messages/search/", {"q": "invoice", "chat_room": self.room.id, "limit": limit}
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data["results"]), 1)
+            self.assertIsNotNone(response.data["next_cursor"])
+
+    def test_search_highlights_and_escapes(self):
+        """Test that snippets are highlighted and HTML-escaped"""
+        response = self.client.get(
+            "/api/chats/messages/search/", {"q": "final", "chat_room": self.other_room.id}
+        )
+        snippet = response.data["results"][0]["snippet"]
+        self.assertIn("<mark>final</mark>", snippet)
+        self.assertIn("&lt;b&gt;", snippet)
+
+    def test_index_follows_edits(self):
+        """Test that edited messages are re-indexed"""
+        message = Message.objects.filter(chat_room=self.room).first()
+        message.content = "renamed milestone"
+        message.save()
+
+        response = self.client.get("/api/chats/messages/search/", {"q": "milestone"})
+        self.assertEqual([r["id"] for r in response.data["results"]], [message.id])
+
+    def test_cannot_search_foreign_room(self):
+        """Test that searching a room the user is not in returns 404"""
+        response = self.client.get(
+            "/api/chats/messages/search/", {"q": "invoice", "chat_room": self.private_room.id}
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class MessageArchiveTestCase(TestCase):
+    def setUp(self):
+        archive_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_root, ignore_errors=True)
+        settings_override = override_settings(CHAT_ARCHIVE_ROOT=archive_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(
+            username="archiver",
+            email="archiver@example.com",
+            password="testpass123"
+        )
+        self.room = ChatRoom.objects.create(is_group=False)
+        self.room.participants.add(self.user)
+
+        old = timezone.now() - timedelta(days=400)
+        self.messages = []
+        for i in range(10):
+            message = Message.objects.create(chat_room=self.room, sender=self.user, content=f"message {i}")
+            self.messages.append(message)
+        # The first seven messages fall outside the hot window
+        Message.objects.filter(id__in=[m.id for m in self.messages[:7]]).update(created_at=old)
+        self.messages[0].read_by.add(self.user)
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_archive_and_read_through(self):
+        """Test that history pages continue seamlessly into archived segments"""
+        call_command("archive_messages", "--days", "180", "--segment-size", "3", stdout=StringIO())
+        self.assertEqual(Message.objects.filter(chat_room=self.room).count(), 3)
+
+        ids = []
+        before = None
+        while True:
+            params = {"chat_room": self.room.id, "limit": 4}
+            if before:
+                params["before"] = before
+            response = self.client.get("/api/chats/messages/history/", params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(r["id"] for r in response.data["results"])
+            before = response.data["next_cursor"]
+            if not before:
+                break
+
+        self.assertEqual(ids, [m.id for m in reversed(self.messages)])
+        first = response.data["results"][-1]
+        self.assertTrue(first["archived"])
+        self.assertTrue(first["is_read_by_current_user"])
+
+    def test_list_falls_through_to_archive(self):
+        """Test that the paginated room listing continues into archived messages"""
+        call_command("archive_messages", "--days", "180", "--segment-size", "3", stdout=StringIO())
+
+        ids = []
+        for page in (1, 2, 3):
+            response = self.client.get(
+                "/api/chats/messages/", {"chat_room": self.room.id, "page_size": 4, "page": page}
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["count"], 10)
+            ids.extend(r["id"] for r in response.data["results"])
+        self.assertEqual(ids, [m.id for m in reversed(self.messages)])
+        self.assertIsNone(response.data["next"])
+        self.assertTrue(response.data["results"][-1]["is_read_by_current_user"])
+
+    def test_archived_records_link_stored_variants(self):
+        """Test that archived variant URLs point at storage rather than the message endpoint"""
+        message = self.messages[0]
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media_root):
+            message.attachment_thumbnail.save("thumb.jpg", ContentFile(b"jpeg"), save=False)
+            Message.objects.filter(id=message.id).update(attachment_thumbnail=message.attachment_thumbnail.name)
+            call_command("archive_messages", "--days", "180", stdout=StringIO())
+
+        response = self.client.get("/api/chats/messages/history/", {"chat_room": self.room.id, "limit": 50})
+        record = response.data["results"][-1]
+        self.assertEqual(record["id"], message.id)
+        self.assertTrue(record["thumbnail_url"].endswith(message.attachment_thumbnail.name))
+        self.assertNotIn("/attachment/", record["thumbnail_url"])
+        self.assertIsNone(record["preview_url"])
+
+    def test_history_rejects_bad_limits(self):
+        """Test that history clamps zero or negative limits and rejects non-integers"""
+        for limit in (0, -1):
+            response = self.client.get("/api/chats/messages/history/", {"chat_room": self.room.id, "limit": limit})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data["results"]), 1)
+
+        response = self.client.get("/api/chats/messages/history/", {"chat_room": self.room.id, "limit": "ten"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "Invalid pagination parameters")
+
+    def test_export_includes_archived_messages(self):
+        """Test that the JSONL export streams archived then hot messages"""
+        call_command("archive_messages", "--days", "180", "--segment-size", "3", stdout=StringIO())
+
+        response = self.client.get(f"/api/chats/chatrooms/{self.room.id}/export/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([line["id"] for line in lines], [m.id for m in self.messages])
+
+        response = self.client.get(
+            f"/api/chats/chatrooms/{self.room.id}/export/", {"after_id": self.messages[5].id}
+        )
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([line["id"] for line in lines], [m.id for m in self.messages[6:]])
+
+    def test_rerun_is_idempotent(self):
+        """Test that archiving twice does not duplicate segments"""
+        call_command("archive_messages", "--days", "180", stdout=StringIO())
+        call_command("archive_messages", "--days", "180", stdout=StringIO())
+
+        response = self.client.get("/api/chats/messages/history/", {"chat_room": self.room.id, "limit": 50})
+        self.assertEqual(len(response.data["results"]), 10)
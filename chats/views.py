@@ -10,6 +10,11 @@ from asgiref.sync import async_to_sync
 import json
 
 from .models import ChatRoom, Message, Chat
+from .media import schedule_image_variants
+from .streaming import stream_field_file
+from .search import search_messages
+from .archive import archived_count, archived_history, archived_slice, iter_archived
+from freelancehub_backend.exports import iter_queryset_chunks, jsonl_response, parse_after_id
 from .serializers import (
     ChatRoomSerializer, MessageSerializer, MessageCreateSerializer, 
     LegacyChatSerializer, UserBasicSerializer
@@ -96,6 +101,32 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
         chat_room.mark_all_read(request.user)
         return Response({'message': 'All messages marked as read'})
 
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        """Stream the full room history as JSONL, archived messages first"""
+        chat_room = self.get_object()
+        
+        try:
+            after_id = parse_after_id(request)
+        except ValueError:
+            return Response({'error': 'Invalid after_id'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        def records():
+            last_id = after_id or 0
+            for record in iter_archived(chat_room.id, after_id):
+                record.pop('read_by_ids', None)
+                record['archived'] = True
+                last_id = record['id']
+                yield record
+            
+            queryset = Message.objects.filter(chat_room=chat_room).select_related(
+                'sender', 'chat_room'
+            ).prefetch_related('read_by')
+            for chunk in iter_queryset_chunks(queryset, last_id):
+                yield from MessageSerializer(chunk, many=True, context={'request': request}).data
+        
+        return jsonl_response(request, records(), f'chat-{chat_room.id}')
+
     @action(detail=False, methods=['post'])
     def create_private_chat(self, request):
         """Create or get existing private chat between two users"""
@@ -155,6 +186,48 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
             message
         )
 
+def archived_payload(record, request):
+    """Shape an archived record like a live ``MessageSerializer`` payload for ``request``"""
+    record = dict(record)
+    record['is_read_by_current_user'] = request.user.id in record.pop('read_by_ids', [])
+    record['archived'] = True
+    for field in ('attachment_url', 'thumbnail_url', 'preview_url'):
+        if record.get(field):
+            record[field] = request.build_absolute_uri(record[field])
+    return record
+
+
+class RoomHistory:
+    """
+    A room's hot messages, newest first, continued by its archived segments.
+
+    Sliceable and sized so ``MessagePagination`` can page across both stores;
+    slices come back as serialized payloads.
+    """
+
+    def __init__(self, queryset, room_id, request):
+        self.queryset = queryset
+        self.room_id = room_id
+        self.request = request
+        self.hot_count = queryset.count()
+
+    def __len__(self):
+        return self.hot_count + archived_count(self.room_id)
+
+    def __getitem__(self, index):
+        start, stop = index.start or 0, index.stop
+        results = []
+        if start < self.hot_count:
+            results = list(MessageSerializer(
+                self.queryset[start:stop], many=True, context={'request': self.request}
+            ).data)
+        if stop > self.hot_count:
+            offset = max(start, self.hot_count)
+            records = archived_slice(self.room_id, offset - self.hot_count, stop - offset)
+            results.extend(archived_payload(record, self.request) for record in records)
+        return results
+
+
 class MessageViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing messages
@@ -175,6 +248,17 @@ class MessageViewSet(viewsets.ModelViewSet):
         
         return queryset.order_by('-created_at')
 
+    def list(self, request, *args, **kwargs):
+        """Room listings continue into archived messages past the last hot page"""
+        chat_room_id = request.query_params.get('chat_room', '')
+        if not chat_room_id.isdigit() or not archived_count(chat_room_id):
+            return super().list(request, *args, **kwargs)
+        if not ChatRoom.objects.filter(id=chat_room_id, participants=request.user).exists():
+            return super().list(request, *args, **kwargs)
+        
+        history = RoomHistory(self.filter_queryset(self.get_queryset()), chat_room_id, request)
+        return self.get_paginated_response(self.paginate_queryset(history))
+
     def perform_create(self, serializer):
         """Create a new message and notify WebSocket"""
         message = serializer.save(sender=self.request.user)
@@ -182,6 +266,9 @@ class MessageViewSet(viewsets.ModelViewSet):
         # Update chat room's updated_at timestamp
         message.chat_room.save(update_fields=['updated_at'])
         
+        # Build thumbnail and preview variants in the background
+        schedule_image_variants(message)
+        
         # Notify WebSocket
         channel_layer = get_channel_layer()
         message_data = MessageSerializer(message, context={'request': self.request}).data
@@ -201,6 +288,117 @@ class MessageViewSet(viewsets.ModelViewSet):
         message.mark_as_read(request.user)
         return Response({'message': 'Message marked as read'})
 
+    @action(detail=True, methods=['get'])
+    def attachment(self, request, pk=None):
+        """Stream the attachment or one of its image variants"""
+        message = self.get_object()
+        variant = request.query_params.get('variant', 'original')
+        
+        if variant not in ('original', 'thumbnail', 'preview'):
+            return Response({'error': 'Invalid variant'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if variant == 'original':
+            field_file = message.attachment
+            content_type = message.attachment_type or 'application/octet-stream'
+            filename = message.attachment_name
+        else:
+            field_file = getattr(message, f'attachment_{variant}')
+            content_type = 'image/jpeg'
+            filename = None
+        
+        if not field_file:
+            return Response({'error': 'Attachment not available'}, status=status.HTTP_404_NOT_FOUND)
+        
+        return stream_field_file(request, field_file, content_type, filename)
+
+    @action(detail=False, methods=['get'])
+    def history(self, request):
+        """
+        Cursor-paginated room history, newest first.
+        
+        Pass the ``next_cursor`` of a page as ``before`` to load older messages.
+        Once the hot table is exhausted the page is filled from archived segments.
+        """
+        chat_room_id = request.query_params.get('chat_room')
+        before = request.query_params.get('before')
+        
+        try:
+            chat_room_id = int(chat_room_id)
+        except (TypeError, ValueError):
+            return Response({'error': 'chat_room is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            before = int(before) if before else None
+            limit = max(1, min(
+                int(request.query_params.get('limit', MessagePagination.page_size)),
+                MessagePagination.max_page_size
+            ))
+        except ValueError:
+            return Response({'error': 'Invalid pagination parameters'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not ChatRoom.objects.filter(id=chat_room_id, participants=request.user).exists():
+            return Response({'error': 'Chat room not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        queryset = Message.objects.filter(chat_room_id=chat_room_id).select_related(
+            'sender', 'chat_room'
+        ).prefetch_related('read_by').order_by('-id')
+        if before:
+            queryset = queryset.filter(id__lt=before)
+        
+        results = MessageSerializer(queryset[:limit], many=True, context={'request': request}).data
+        
+        if len(results) < limit:
+            archive_before = results[-1]['id'] if results else before
+            for record in archived_history(chat_room_id, archive_before, limit - len(results)):
+                results.append(archived_payload(record, request))
+        
+        return Response({
+            'results': results,
+            'next_cursor': results[-1]['id'] if len(results) == limit else None,
+        })
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Full-text search across the user's chat rooms or a single room"""
+        query = request.query_params.get('q', '').strip()
+        chat_room_id = request.query_params.get('chat_room')
+        cursor = request.query_params.get('cursor')
+        
+        if not query:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), MessagePagination.max_page_size))
+            cursor = int(cursor) if cursor else None
+            chat_room_id = int(chat_room_id) if chat_room_id else None
+        except ValueError:
+            return Response({'error': 'Invalid pagination parameters'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if chat_room_id and not ChatRoom.objects.filter(
+            id=chat_room_id, participants=request.user
+        ).exists():
+            return Response({'error': 'Chat room not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        hits = search_messages(request.user, query, chat_room_id, cursor, limit)
+        
+        messages = Message.objects.select_related('sender', 'chat_room').prefetch_related(
+            'read_by'
+        ).in_bulk([message_id for message_id, _ in hits])
+        
+        results = []
+        for message_id, snippet in hits:
+            message = messages.get(message_id)
+            if message is None:
+                continue
+            data = MessageSerializer(message, context={'request': request}).data
+            data['snippet'] = snippet
+            results.append(data)
+        
+        return Response({
+            'results': results,
+            'next_cursor': hits[-1][0] if len(hits) == limit else None,
+        })
+
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
         """Get count of unread messages for the current user"""
@@ -279,6 +477,9 @@ class MessageViewSet(viewsets.ModelViewSet):
             # Update chat room timestamp
             chat_room.save(update_fields=['updated_at'])
             
+            # Build thumbnail and preview variants in the background
+            schedule_image_variants(message)
+            
             # Notify WebSocket
             channel_layer = get_channel_layer()
             message_serializer = MessageSerializer(message, context={'request': request})
@@ -0,0 +1,90 @@
+"""
+Contract analytics computed in one conditional-aggregation pass.
+
+Every figure in the summary, including the status distribution, comes from a
+single ``aggregate()`` over the user's contracts instead of a query per
+number. Results are cached per user for CONTRACT_ANALYTICS_CACHE_TIMEOUT
+seconds in the shared cache and dropped once a change to one of the user's
+contracts, their milestones or documents, or their payments commits; the
+timeout only bounds the date-relative figures (this month, overdue).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Contract
+
+CACHE_TIMEOUT = getattr(settings, 'CONTRACT_ANALYTICS_CACHE_TIMEOUT', 300)
+# Admins see every contract, so any change drops their shared entry
+ALL_CONTRACTS_KEY = 'contract_analytics:all'
+
+
+def cache_key(user):
+    return ALL_CONTRACTS_KEY if user.is_superuser else f'contract_analytics:{user.id}'
+
+
+def contract_summary(contracts):
+    """Summary counts, values and status distribution in one query"""
+    now = timezone.now()
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    statuses = [choice for choice, _ in Contract.STATUS_CHOICES]
+
+    aggregates = {f'status_{value}': Count('id', filter=Q(status=value)) for value in statuses}
+    aggregates.update(
+        total_contracts=Count('id'),
+        total_value=Sum('total_payment'),
+        active_value=Sum('total_payment', filter=Q(status='active')),
+        completed_value=Sum('total_payment', filter=Q(status='completed')),
+        contracts_this_month=Count('id', filter=Q(created_at__gte=month_start)),
+        overdue_contracts=Count('id', filter=Q(status='active', end_date__lt=now.date())),
+    )
+    row = contracts.order_by().aggregate(**aggregates)
+
+    total_contracts = row['total_contracts']
+    total_value = row['total_value'] or 0
+    summary = {
+        'total_contracts': total_contracts,
+        'active_contracts': row['status_active'],
+        'completed_contracts': row['status_completed'],
+        'cancelled_contracts': row['status_cancelled'],
+        'total_value': total_value,
+        'active_value': row['active_value'] or 0,
+        'completed_value': row['completed_value'] or 0,
+        'average_contract_value': total_value / total_contracts if total_contracts > 0 else 0,
+        'contracts_this_month': row['contracts_this_month'],
+        'overdue_contracts': row['overdue_contracts'],
+    }
+    status_distribution = [
+        {'status': value, 'count': row[f'status_{value}']}
+        for value in sorted(statuses) if row[f'status_{value}']
+    ]
+    return summary, status_distribution
+
+
+def invalidate_users(*user_ids):
+    keys = [ALL_CONTRACTS_KEY] + [f'contract_analytics:{user_id}' for user_id in set(user_ids) if user_id]
+    # After commit, so a reader cannot re-cache figures from before the change
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_contracts(*contract_ids):
+    """Invalidate the parties of contracts changed without a Contract save"""
+    parties = Contract.objects.filter(id__in=contract_ids).values_list('client_id', 'freelancer_id')
+    invalidate_users(*(user_id for pair in parties for user_id in pair))
+
+
+def invalidate_for_contract(sender, instance, **kwargs):
+    """post_save/post_delete receiver for Contract"""
+    invalidate_users(instance.client_id, instance.freelancer_id)
+
+
+def invalidate_for_document(sender, instance, **kwargs):
+    """post_save/post_delete receiver for ContractDocument"""
+    invalidate_contracts(instance.contract_id)
+
+
+def invalidate_for_payment(sender, instance, **kwargs):
+    """post_save/post_delete receiver for Payment"""
+    invalidate_users(instance.payer_id, instance.recipient_id)
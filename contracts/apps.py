@@ -1,6 +1,24 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class ContractsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "contracts"
+
+    def ready(self):
+        from .analytics import invalidate_for_contract, invalidate_for_document, invalidate_for_payment
+        from blobstore.storage import release_files
+        from .models import Contract, ContractDocument, sync_contract_client, sync_contract_freelancer
+        from .pdf_cache import invalidate_contract
+        post_save.connect(invalidate_contract, sender=Contract, dispatch_uid='contract_pdf_cache_save')
+        post_delete.connect(invalidate_contract, sender=Contract, dispatch_uid='contract_pdf_cache_delete')
+        post_save.connect(invalidate_for_contract, sender=Contract, dispatch_uid='contract_analytics_save')
+        post_delete.connect(invalidate_for_contract, sender=Contract, dispatch_uid='contract_analytics_delete')
+        post_save.connect(invalidate_for_document, sender=ContractDocument, dispatch_uid='contract_analytics_document_save')
+        post_delete.connect(invalidate_for_document, sender=ContractDocument, dispatch_uid='contract_analytics_document_delete')
+        post_save.connect(invalidate_for_payment, sender='payments.Payment', dispatch_uid='contract_analytics_payment_save')
+        post_delete.connect(invalidate_for_payment, sender='payments.Payment', dispatch_uid='contract_analytics_payment_delete')
+        post_save.connect(sync_contract_client, sender='projects.Project', dispatch_uid='contract_sync_client')
+        post_save.connect(sync_contract_freelancer, sender='projects.ProjectProposal', dispatch_uid='contract_sync_freelancer')
+        post_delete.connect(release_files, sender=ContractDocument, dispatch_uid='contract_document_release_files')
@@ -0,0 +1,104 @@
+"""
+Bulk ZIP export of contract PDFs and documents.
+
+Contracts are read in id-ordered chunks and written to the archive one at a
+time, so memory stays flat however many are exported. PDFs come from the PDF
+cache when they are current; missing ones are submitted to the render pool a
+few contracts ahead of the one being written, so renders run in parallel
+while earlier entries are already streaming to the client.
+"""
+import logging
+import os
+from collections import deque
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from freelancehub_backend.exports import iter_queryset_chunks
+from . import pdf_cache, render_service
+from .pdf_generator import REPORTLAB_AVAILABLE, contract_pdf_data, render_contract_pdf
+
+logger = logging.getLogger(__name__)
+
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def iter_file(opened, chunk_size=FILE_CHUNK_SIZE):
+    """Yield an open binary file in chunks and close it"""
+    with opened as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def start_pdf(contract):
+    """Return ``(contract, version, future)``; the future is None when cached or the pool is full"""
+    version = pdf_cache.content_version(contract)
+    if pdf_cache.is_cached(contract.id, version):
+        return contract, version, None
+    try:
+        return contract, version, render_service.submit(contract, version)
+    except render_service.RenderQueueFull:
+        return contract, version, None
+
+
+def pdf_chunks(contract, version, future):
+    if future is not None:
+        return [future.result()]
+    cached = pdf_cache.open_cached(contract.id, version)
+    if cached is not None:
+        return iter_file(cached)
+    # The pool was full when this contract came up; render it here instead
+    content = render_contract_pdf(contract_pdf_data(contract, timezone.now()))
+    pdf_cache.store(contract.id, version, content)
+    return [content]
+
+
+def entry_filename(filename):
+    """A user-supplied filename reduced to one safe path component"""
+    try:
+        return get_valid_filename(os.path.basename(filename.replace('\\', '/')))
+    except SuspiciousFileOperation:
+        return 'document'
+
+
+def contract_entries(contract, version, future):
+    """ZIP entries for one contract: its PDF, then its documents"""
+    folder = f'contract-{contract.id}'
+    if REPORTLAB_AVAILABLE:
+        try:
+            chunks = pdf_chunks(contract, version, future)
+        except Exception as e:
+            logger.error(f"Skipping PDF for contract {contract.id} in export: {e}")
+        else:
+            yield f'{folder}/contract-{contract.id}.pdf', contract.updated_at, chunks
+
+    for document in contract.documents.all():
+        try:
+            opened = document.file.open('rb')
+        except (OSError, ValueError) as e:
+            logger.error(f"Skipping document {document.id} in export: {e}")
+            continue
+        name = f'{folder}/documents/{document.id}-{entry_filename(document.filename)}'
+        yield name, document.uploaded_at, iter_file(opened)
+
+
+def iter_export_entries(queryset, lookahead=None):
+    """Yield ``iter_zip`` entries for every contract in ``queryset``"""
+    if lookahead is None:
+        lookahead = max(1, render_service.worker_count()) * 2
+    queryset = queryset.select_related(
+        'project_proposal__project', 'client', 'freelancer'
+    ).prefetch_related('documents', 'milestone_items')
+
+    pending = deque()
+    for chunk in iter_queryset_chunks(queryset, chunk_size=50):
+        for contract in chunk:
+            pending.append(start_pdf(contract) if REPORTLAB_AVAILABLE else (contract, None, None))
+            if len(pending) > lookahead:
+                yield from contract_entries(*pending.popleft())
+    while pending:
+        yield from contract_entries(*pending.popleft())
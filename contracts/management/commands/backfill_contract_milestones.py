@@ -0,0 +1,123 @@
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from contracts import pdf_cache
+from contracts.models import Contract, ContractMilestone
+from users.models import CustomUser
+
+
+def parse_legacy_milestones(raw):
+    """Parse the old ``Contract.milestones`` JSON list; returns None for free text"""
+    try:
+        value = json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(value, list):
+        return None
+    return [item for item in value if isinstance(item, dict)]
+
+
+def parse_amount(value):
+    try:
+        return Decimal(str(value or 0)).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return Decimal('0.00')
+
+
+def parse_moment(value):
+    moment = parse_datetime(value) if isinstance(value, str) else None
+    if moment and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_day(value):
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        return parse_date(value[:10])
+    except ValueError:
+        return None
+
+
+def build_milestones(contract, items, user_ids):
+    milestones = []
+    for item in items:
+        created_by = item.get('created_by')
+        completed_by = item.get('completed_by')
+        milestones.append(ContractMilestone(
+            contract=contract,
+            title=str(item.get('title') or 'Milestone')[:255],
+            description=str(item.get('description') or ''),
+            amount=parse_amount(item.get('amount')),
+            due_date=parse_day(item.get('due_date')),
+            status='completed' if item.get('status') == 'completed' else 'pending',
+            created_by_id=created_by if created_by in user_ids else None,
+            created_at=parse_moment(item.get('created_at')) or contract.created_at,
+            completed_at=parse_moment(item.get('completed_at')),
+            completed_by_id=completed_by if completed_by in user_ids else None,
+        ))
+    return milestones
+
+
+class Command(BaseCommand):
+    help = "Move milestones stored as JSON in Contract.milestones into ContractMilestone rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Contracts read per query')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be created')
+
+    def handle(self, *args, **options):
+        # Migrated contracts have their JSON cleared, so this also picks up contracts
+        # that got rows through add_milestone before they were backfilled
+        pending = Contract.objects.exclude(milestones='')
+        last_id = 0
+        migrated = created = skipped = 0
+
+        while True:
+            batch = list(
+                pending.filter(id__gt=last_id).order_by('id').only('id', 'milestones', 'created_at')[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            parsed = {}
+            for contract in batch:
+                items = parse_legacy_milestones(contract.milestones)
+                if items:
+                    parsed[contract] = items
+                else:
+                    # Free text is still shown on the contract PDF as before
+                    skipped += 1
+
+            # Authors may have been deleted since; keep only users that still exist
+            referenced = {
+                item.get(key) for items in parsed.values() for item in items
+                for key in ('created_by', 'completed_by') if isinstance(item.get(key), int)
+            }
+            user_ids = set(CustomUser.objects.filter(id__in=referenced).values_list('id', flat=True))
+
+            rows = []
+            for contract, items in parsed.items():
+                rows.extend(build_milestones(contract, items, user_ids))
+            migrated += len(parsed)
+            created += len(rows)
+            if parsed and not options['dry_run']:
+                with transaction.atomic():
+                    ContractMilestone.objects.bulk_create(rows)
+                    Contract.objects.filter(id__in=[contract.id for contract in parsed]).update(milestones='')
+                # The PDF now shows a milestone table instead of the raw JSON
+                for contract in parsed:
+                    pdf_cache.invalidate(contract.id)
+
+        verb = 'Would create' if options['dry_run'] else 'Created'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {created} milestones for {migrated} contracts; "
+            f"skipped {skipped} contracts without a JSON milestone list"
+        ))
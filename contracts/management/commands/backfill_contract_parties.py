@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max, OuterRef, Q, Subquery
+
+from contracts.models import Contract
+from projects.models import ProjectProposal
+
+
+class Command(BaseCommand):
+    help = "Fill Contract.client and Contract.freelancer from the accepted proposal"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Contract ids updated per statement')
+
+    def handle(self, *args, **options):
+        proposal = ProjectProposal.objects.filter(id=OuterRef('project_proposal_id'))
+        missing = Contract.objects.filter(Q(client__isnull=True) | Q(freelancer__isnull=True))
+        max_id = missing.aggregate(max_id=Max('id'))['max_id'] or 0
+        batch_size = options['batch_size']
+
+        updated = 0
+        # Walk id ranges so each UPDATE stays short and does not lock the whole table
+        for start in range(0, max_id, batch_size):
+            updated += missing.filter(id__gt=start, id__lte=start + batch_size).update(
+                client_id=Subquery(proposal.values('project__client_id')[:1]),
+                freelancer_id=Subquery(proposal.values('freelancer_id')[:1]),
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Filled parties on {updated} contracts"))
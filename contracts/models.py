@@ -1,4 +1,10 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from blobstore.storage import get_blob_storage
 from users.models import CustomUser
 from projects.models import ProjectProposal
 
@@ -6,6 +12,17 @@ def contract_file_upload_path(instance, filename):
     """Generate upload path for contract files"""
     return f'contracts/{instance.contract.id}/{filename}'
 
+class ContractQuerySet(models.QuerySet):
+    def with_payment_totals(self):
+        """Annotate ``total_paid``, ``pending_amount`` and ``payment_count`` in the same query"""
+        zero = Value(Decimal('0.00'), output_field=models.DecimalField(max_digits=12, decimal_places=2))
+        return self.annotate(
+            total_paid=Coalesce(Sum('payments__amount', filter=Q(payments__status='completed')), zero),
+            pending_amount=Coalesce(Sum('payments__amount', filter=Q(payments__status='pending')), zero),
+            payment_count=Count('payments'),
+        )
+
+
 class Contract(models.Model):
     STATUS_CHOICES = [
         ('draft', 'Draft'),
@@ -21,6 +38,16 @@ class Contract(models.Model):
         on_delete=models.CASCADE, 
         related_name='contract'
     )
+    # Copied from the proposal so role filters and permission checks need no joins;
+    # kept in sync by save() and the Project/ProjectProposal receivers below
+    client = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='contracts_as_client', db_index=False
+    )
+    freelancer = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='contracts_as_freelancer', db_index=False
+    )
     
     # Contract details
     start_date = models.DateField()
@@ -28,6 +55,8 @@ class Contract(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
     total_payment = models.DecimalField(max_digits=10, decimal_places=2)
     deliverables = models.TextField(blank=True)
+    # Legacy JSON list, superseded by ContractMilestone; backfill_contract_milestones
+    # moves it into rows and clears it, so only free text is left here
     milestones = models.TextField(blank=True)
     
     # Signing information
@@ -54,19 +83,30 @@ class Contract(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ContractQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['client', 'status'], name='contract_client_status_idx'),
+            models.Index(fields=['freelancer', 'status'], name='contract_freelancer_status_idx'),
+        ]
     
     def __str__(self):
         return f"Contract for {self.project_proposal.project.title}"
     
-    @property
-    def client(self):
-        return self.project_proposal.project.client
+    def save(self, *args, **kwargs):
+        if self.project_proposal_id and (self.client_id is None or self.freelancer_id is None):
+            proposal = self.project_proposal
+            self.client_id = proposal.project.client_id
+            self.freelancer_id = proposal.freelancer_id
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'client', 'freelancer'}
+        super().save(*args, **kwargs)
     
-    @property
-    def freelancer(self):
-        return self.project_proposal.freelancer
+    def is_party(self, user):
+        """Whether ``user`` is the client or freelancer, without loading either"""
+        return user.id in (self.client_id, self.freelancer_id)
     
     @property
     def project(self):
@@ -76,9 +116,28 @@ class Contract(models.Model):
     def is_fully_signed(self):
         return self.signed_by_client and self.signed_by_freelancer
 
+
+def sync_contract_client(sender, instance, **kwargs):
+    """post_save receiver for Project: follow a change of client"""
+    if kwargs.get('created'):
+        return
+    Contract.objects.filter(project_proposal__project=instance).exclude(
+        client_id=instance.client_id
+    ).update(client_id=instance.client_id)
+
+
+def sync_contract_freelancer(sender, instance, **kwargs):
+    """post_save receiver for ProjectProposal: follow a change of freelancer"""
+    if kwargs.get('created'):
+        return
+    Contract.objects.filter(project_proposal=instance).exclude(
+        freelancer_id=instance.freelancer_id
+    ).update(freelancer_id=instance.freelancer_id)
+
+
 class ContractDocument(models.Model):
     contract = models.ForeignKey(Contract, on_delete=models.CASCADE, related_name='documents')
-    file = models.FileField(upload_to=contract_file_upload_path)
+    file = models.FileField(upload_to=contract_file_upload_path, storage=get_blob_storage)
     filename = models.CharField(max_length=255)
     uploaded_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     uploaded_at = models.DateTimeField(auto_now_add=True)
@@ -94,4 +153,62 @@ class ContractDocument(models.Model):
     )
     
     def __str__(self):
-        return f"{self.contract} - {self.filename}"
\ No newline at end of file
+        return f"{self.contract} - {self.filename}"
+
+
+class ContractMilestone(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('completed', 'Completed'),
+    ]
+
+    contract = models.ForeignKey(Contract, on_delete=models.CASCADE, related_name='milestone_items')
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    due_date = models.DateField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    created_by = models.ForeignKey(
+        CustomUser, null=True, blank=True, on_delete=models.SET_NULL, related_name='created_milestones'
+    )
+    # Not auto_now_add so the backfill can keep the original timestamps
+    created_at = models.DateTimeField(default=timezone.now)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    completed_by = models.ForeignKey(
+        CustomUser, null=True, blank=True, on_delete=models.SET_NULL, related_name='completed_milestones'
+    )
+
+    class Meta:
+        # Backfilled rows keep their original created_at, so they sort before later additions
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['contract', 'status'], name='milestone_contract_status_idx'),
+            models.Index(fields=['due_date'], name='milestone_due_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.get_status_display()})"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.touch_contract(self.contract_id)
+
+    @staticmethod
+    def touch_contract(contract_id):
+        """Milestones are part of the contract document, so bump its updated_at"""
+        from .analytics import invalidate_contracts
+        Contract.objects.filter(pk=contract_id).update(updated_at=timezone.now())
+        # The update sends no post_save, so drop the cached analytics here
+        invalidate_contracts(contract_id)
+
+    @classmethod
+    def complete(cls, contract_id, milestone_id, user):
+        """Mark one pending milestone completed with a single UPDATE; returns False if there is none"""
+        updated = cls.objects.filter(id=milestone_id, contract_id=contract_id, status='pending').update(
+            status='completed',
+            completed_at=timezone.now(),
+            completed_by=user
+        )
+        if updated:
+            cls.touch_contract(contract_id)
+        return bool(updated)
@@ -0,0 +1,91 @@
+"""
+On-disk cache for rendered contract PDFs.
+
+Each rendered file is stored under CONTRACT_PDF_CACHE_ROOT as
+``<contract_id>/<version>.pdf``. The version is a digest of everything the
+document shows: the contract's own fields, the project title and both
+parties' names and emails (milestone changes bump the contract's
+``updated_at``). Changing any of them, even through ``QuerySet.update()`` or
+on the project or user, yields a new version, so a stale file is never
+served. The version doubles as the strong ETag for ``download_pdf``.
+
+Saving or deleting a contract removes its cached files; files left behind by
+project or user edits are removed when the next version is stored.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+# Bump whenever the PDF layout changes so existing files are re-rendered
+RENDER_VERSION = 3
+
+VERSION_FIELDS = [
+    'id', 'status', 'total_payment', 'start_date', 'end_date', 'deliverables', 'milestones',
+    'signed_by_client', 'signed_by_freelancer', 'created_at', 'updated_at',
+]
+
+
+def cache_root():
+    return Path(getattr(settings, 'CONTRACT_PDF_CACHE_ROOT', Path(settings.BASE_DIR) / 'contract_pdf_cache'))
+
+
+def content_version(contract):
+    """Digest of the data rendered into the contract's PDF"""
+    client = contract.client
+    freelancer = contract.freelancer
+    parts = [str(RENDER_VERSION)]
+    parts += [str(getattr(contract, field)) for field in VERSION_FIELDS]
+    parts.append(contract.project_proposal.project.title)
+    for user in (client, freelancer):
+        parts += [str(user.id), user.first_name, user.last_name, user.email]
+    return hashlib.sha256('\x1f'.join(parts).encode()).hexdigest()[:32]
+
+
+def cached_path(contract_id, version):
+    return cache_root() / str(contract_id) / f'{version}.pdf'
+
+
+def is_cached(contract_id, version):
+    return cached_path(contract_id, version).exists()
+
+
+def open_cached(contract_id, version):
+    """Open the cached PDF for this version, or return None"""
+    try:
+        # Opening directly avoids racing an invalidation between a check and the open
+        return open(cached_path(contract_id, version), 'rb')
+    except FileNotFoundError:
+        return None
+
+
+def store(contract_id, version, content):
+    """Write a rendered PDF atomically and drop older versions of it"""
+    path = cached_path(contract_id, version)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    for stale in path.parent.glob('*.pdf'):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    return path
+
+
+def invalidate(contract_id):
+    """Remove every cached PDF for a contract"""
+    shutil.rmtree(cache_root() / str(contract_id), ignore_errors=True)
+
+
+def invalidate_contract(sender, instance, **kwargs):
+    """post_save/post_delete receiver for Contract"""
+    invalidate(instance.pk)
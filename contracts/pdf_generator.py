@@ -0,0 +1,110 @@
+"""
+Contract PDF layout.
+
+``render_contract_pdf`` works from the plain dict built by
+``contract_pdf_data`` and touches neither the ORM nor Django settings, so it
+can run in a worker process (see ``render_service``).
+"""
+from freelancehub_backend.pdf import (
+    REPORTLAB_AVAILABLE, footer, heading, render, spacer, table, text, title
+)
+
+
+def contract_pdf_data(contract, generated_at):
+    """Snapshot everything the contract PDF shows"""
+    client = contract.client
+    freelancer = contract.freelancer
+    signed_on = contract.updated_at.strftime('%B %d, %Y')
+    return {
+        'id': contract.id,
+        'created': contract.created_at.strftime('%B %d, %Y'),
+        'project_title': contract.project_proposal.project.title,
+        'status': contract.get_status_display(),
+        'parties': [
+            {'name': f"{user.first_name} {user.last_name}", 'email': user.email, 'id': user.id}
+            for user in (client, freelancer)
+        ],
+        'total_payment': str(contract.total_payment),
+        'start_date': contract.start_date.strftime('%B %d, %Y'),
+        'end_date': contract.end_date.strftime('%B %d, %Y') if contract.end_date else 'Not specified',
+        'deliverables': contract.deliverables,
+        'milestones': [
+            {
+                'title': milestone.title,
+                'amount': str(milestone.amount),
+                'due_date': milestone.due_date.strftime('%B %d, %Y') if milestone.due_date else '',
+                'status': milestone.get_status_display(),
+            }
+            for milestone in contract.milestone_items.all()
+        ],
+        # Free text, or JSON not yet moved into rows by backfill_contract_milestones
+        'legacy_milestones': contract.milestones,
+        'client_signed_on': signed_on if contract.signed_by_client else None,
+        'freelancer_signed_on': signed_on if contract.signed_by_freelancer else None,
+        'generated_at': generated_at.strftime('%B %d, %Y at %I:%M %p'),
+    }
+
+
+def contract_layout(data):
+    client, freelancer = data['parties']
+    layout = [
+        title("FREELANCE CONTRACT"),
+        spacer(20),
+        table([
+            ['Contract ID:', str(data['id'])],
+            ['Date Created:', data['created']],
+            ['Project:', data['project_title']],
+            ['Status:', data['status']],
+        ], [2, 4], style='fields'),
+        spacer(20),
+        heading("PARTIES"),
+        table([
+            ['CLIENT', 'FREELANCER'],
+            [client['name'], freelancer['name']],
+            [client['email'], freelancer['email']],
+            [f"User ID: {client['id']}", f"User ID: {freelancer['id']}"],
+        ], [3, 3], style='parties'),
+        spacer(20),
+        heading("FINANCIAL TERMS"),
+        table([
+            ['Total Payment:', f"${data['total_payment']}"],
+            ['Start Date:', data['start_date']],
+            ['End Date:', data['end_date']],
+        ], [2, 4], style='fields'),
+        spacer(20),
+    ]
+
+    if data['deliverables']:
+        layout += [heading("DELIVERABLES"), text(data['deliverables']), spacer(15)]
+
+    if data['milestones']:
+        layout += [
+            heading("MILESTONES"),
+            table([['Milestone', 'Amount', 'Due', 'Status']] + [
+                [m['title'], f"${m['amount']}", m['due_date'], m['status']]
+                for m in data['milestones']
+            ], [3, 1, 1.25, 0.75], style='list', wrap=[0], repeat_header=True),
+            spacer(15),
+        ]
+    elif data['legacy_milestones']:
+        layout += [heading("MILESTONES"), text(data['legacy_milestones']), spacer(15)]
+
+    layout += [
+        heading("SIGNATURES"),
+        table([
+            ['Party', 'Status', 'Date'],
+            ['Client', 'Signed' if data['client_signed_on'] else 'Pending', data['client_signed_on'] or ''],
+            ['Freelancer', 'Signed' if data['freelancer_signed_on'] else 'Pending', data['freelancer_signed_on'] or ''],
+        ], [2, 2, 2]),
+        spacer(30),
+        footer(
+            f"Generated on {data['generated_at']}",
+            "This is a legally binding contract between the specified parties.",
+        ),
+    ]
+    return layout
+
+
+def render_contract_pdf(data):
+    """Render the contract PDF and return its bytes"""
+    return render(contract_layout(data))
@@ -0,0 +1,198 @@
+"""
+Contract PDF rendering in a process pool.
+
+Reportlab is CPU-bound and holds the GIL, so renders run in a bounded
+``ProcessPoolExecutor`` (CONTRACT_PDF_WORKERS processes, default one per
+core) instead of the request thread. Workers are spawned rather than forked
+and only import ``pdf_generator``, which needs neither Django nor a database.
+
+A job is identified by the contract and its PDF cache version, so concurrent
+requests for the same document share one render. Finished PDFs are written
+to the PDF cache and the job state is kept in the shared cache, so a poll can
+land on any worker; users who asked to be told get a ``pdf_ready`` event on
+their notifications socket. At most CONTRACT_PDF_MAX_PENDING renders are
+queued per process.
+
+Set CONTRACT_PDF_WORKERS to 0 to render inline (used by the tests).
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.urls import reverse
+from django.utils import timezone
+
+from . import pdf_cache
+from .pdf_generator import contract_pdf_data, render_contract_pdf
+
+logger = logging.getLogger(__name__)
+
+JOB_STATE_TIMEOUT = 3600
+
+_lock = threading.Lock()
+_executor = None
+# In-flight renders in this process, by job id
+_jobs = {}
+# Users to notify when a job finishes, by job id
+_listeners = {}
+
+
+class RenderQueueFull(Exception):
+    """Raised when CONTRACT_PDF_MAX_PENDING renders are already queued"""
+
+
+def worker_count():
+    return getattr(settings, 'CONTRACT_PDF_WORKERS', os.cpu_count() or 1)
+
+
+def max_pending():
+    return getattr(settings, 'CONTRACT_PDF_MAX_PENDING', max(1, worker_count()) * 8)
+
+
+def sync_timeout():
+    """Seconds download_pdf waits for a render before handing back a job"""
+    return getattr(settings, 'CONTRACT_PDF_SYNC_TIMEOUT', 10)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=worker_count(),
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _executor
+
+
+def submit_to_pool(data):
+    global _executor
+    try:
+        return get_executor().submit(render_contract_pdf, data)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool
+        logger.warning("PDF render pool was broken, restarting it")
+        _executor = None
+        return get_executor().submit(render_contract_pdf, data)
+
+
+def job_id(contract_id, version):
+    return f'{contract_id}-{version}'
+
+
+def job_cache_key(job):
+    return f'contract_pdf_job:{job}'
+
+
+def job_status(contract_id, version):
+    """State of the render job for this version, readable from any process"""
+    job = job_id(contract_id, version)
+    status = {'job_id': job, 'download_url': reverse('contract-download-pdf', args=[contract_id])}
+    if pdf_cache.is_cached(contract_id, version):
+        status['status'] = 'done'
+        return status
+    state = cache.get(job_cache_key(job)) or {'status': 'not_started'}
+    status.update(state)
+    return status
+
+
+def submit(contract, version, notify_user_id=None):
+    """Start rendering the contract PDF, or join the render already running"""
+    job = job_id(contract.id, version)
+    inline_data = None
+    with _lock:
+        if notify_user_id is not None:
+            _listeners.setdefault(job, set()).add(notify_user_id)
+        future = _jobs.get(job)
+        if future is not None:
+            return future
+        if len(_jobs) >= max_pending():
+            _listeners.pop(job, None)
+            raise RenderQueueFull()
+
+        data = contract_pdf_data(contract, timezone.now())
+        if worker_count():
+            future = submit_to_pool(data)
+        else:
+            future = Future()
+            inline_data = data
+        _jobs[job] = future
+        cache.set(job_cache_key(job), {'status': 'pending'}, JOB_STATE_TIMEOUT)
+
+    owner_thread = threading.get_ident()
+    future.add_done_callback(lambda done: finish(contract.id, version, done, owner_thread))
+    if inline_data is not None:
+        try:
+            future.set_result(render_contract_pdf(inline_data))
+        except Exception as e:
+            future.set_exception(e)
+    return future
+
+
+def render(contract, version, user_id=None, timeout=None):
+    """
+    Render through the pool and wait up to ``timeout`` seconds
+
+    Returns the PDF bytes, or None if it is not ready in time; ``user_id`` is
+    then sent a ``pdf_ready`` event when it is.
+    """
+    future = submit(contract, version)
+    try:
+        return future.result(timeout=sync_timeout() if timeout is None else timeout)
+    except TimeoutError:
+        if user_id is None:
+            return None
+    job = job_id(contract.id, version)
+    with _lock:
+        # finish() collects listeners under the same lock, so this one is not missed
+        if _jobs.get(job) is future:
+            _listeners.setdefault(job, set()).add(user_id)
+            return None
+    return future.result()
+
+
+def finish(contract_id, version, future, owner_thread=None):
+    """Store a finished render and tell whoever asked"""
+    try:
+        _finish(contract_id, version, future)
+    finally:
+        # Pool callbacks run on the executor's management thread, which Django's
+        # request cycle never cleans up; close the connections it opened here
+        if owner_thread is not None and threading.get_ident() != owner_thread:
+            connections.close_all()
+
+
+def _finish(contract_id, version, future):
+    job = job_id(contract_id, version)
+    with _lock:
+        _jobs.pop(job, None)
+        listeners = _listeners.pop(job, set())
+
+    try:
+        pdf_cache.store(contract_id, version, future.result())
+        state = {'status': 'done'}
+    except Exception as e:
+        logger.error(f"Failed to render PDF for contract {contract_id}: {e}")
+        state = {'status': 'failed', 'error': str(e)}
+    cache.set(job_cache_key(job), state, JOB_STATE_TIMEOUT)
+
+    if not listeners:
+        return
+    from notifications.utils import send_notification_to_user
+    event = {
+        'type': 'pdf_ready',
+        'contract_id': contract_id,
+        'job_id': job,
+        'status': state['status'],
+        'download_url': reverse('contract-download-pdf', args=[contract_id]),
+    }
+    for user_id in listeners:
+        try:
+            send_notification_to_user(user_id, event, priority='high')
+        except Exception as e:
+            logger.error(f"Failed to queue pdf_ready event for user {user_id}: {e}")
@@ -15,7 +15,7 @@ class ContractDocumentSerializer(serializers.ModelSerializer):
         fields = ['id', 'file', 'filename', 'uploaded_by', 'uploaded_at', 'document_type']
 
 from rest_framework import serializers
-from .models import Contract, ContractDocument
+from .models import Contract, ContractDocument, ContractMilestone
 from users.models import CustomUser
 from projects.models import Project, ProjectProposal
 from django.utils import timezone
@@ -47,6 +47,15 @@ class ContractDocumentSerializer(serializers.ModelSerializer):
             return obj.file.size
         return None
 
+class ContractMilestoneSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ContractMilestone
+        fields = [
+            'id', 'contract', 'title', 'description', 'amount', 'due_date', 'status',
+            'created_by', 'created_at', 'completed_at', 'completed_by'
+        ]
+        read_only_fields = ['contract', 'status', 'created_by', 'created_at', 'completed_at', 'completed_by']
+
 class ContractSerializer(serializers.ModelSerializer):
     client = UserShortSerializer(read_only=True)
     freelancer = UserShortSerializer(read_only=True)
@@ -55,6 +64,7 @@ class ContractSerializer(serializers.ModelSerializer):
     project_description = serializers.CharField(source='project_proposal.project.description', read_only=True)
     project_category = serializers.CharField(source='project_proposal.project.category', read_only=True)
     documents = ContractDocumentSerializer(many=True, read_only=True)
+    milestone_items = ContractMilestoneSerializer(many=True, read_only=True)
     
     # Calculated fields
     days_remaining = serializers.SerializerMethodField()
@@ -67,11 +77,22 @@ class ContractSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'project_proposal', 'project_id', 'project_title', 'project_description', 'project_category',
             'client', 'freelancer', 'start_date', 'end_date', 'status', 
-            'total_payment', 'deliverables', 'milestones', 'created_at', 
+            'total_payment', 'deliverables', 'milestones', 'milestone_items', 'created_at', 
             'updated_at', 'signed_by_client', 'signed_by_freelancer', 
             'cancellation_reason', 'documents', 'days_remaining', 'progress_percentage',
             'is_overdue', 'can_be_completed'
         ]
+        # Legacy free text; milestones are written as ContractMilestone rows via add_milestone
+        read_only_fields = ['milestones']
+    
+    def validate(self, data):
+        # Refuse rather than silently drop milestones sent the old way
+        if 'milestones' in getattr(self, 'initial_data', {}):
+            raise serializers.ValidationError({
+                'milestones': 'Milestones are no longer set on the contract. '
+                              'POST each one to /api/contracts/contracts/<id>/add_milestone/ instead.'
+            })
+        return data
     
     def get_days_remaining(self, obj):
         if obj.end_date and obj.status == 'active':
@@ -113,7 +134,7 @@ class ContractDetailSerializer(ContractSerializer):
             'id': project.id,
             'title': project.title,
             'description': project.description,
-            'category': project.category,
+            'category': project.category.name if project.category_id else None,
             'budget': project.budget,
             'status': project.status,
             'created_at': project.created_at,
@@ -121,17 +142,20 @@ class ContractDetailSerializer(ContractSerializer):
         }
     
     def get_payment_info(self, obj):
-        # Get payment information related to this contract
-        payments = obj.payments.all()
-        total_paid = sum(p.amount for p in payments.filter(status='completed'))
-        pending_payments = sum(p.amount for p in payments.filter(status='pending'))
+        # Totals come from Contract.objects.with_payment_totals(); fall back to one query
+        if not hasattr(obj, 'total_paid'):
+            totals = Contract.objects.filter(pk=obj.pk).with_payment_totals().values(
+                'total_paid', 'pending_amount', 'payment_count'
+            )[0]
+            for name, value in totals.items():
+                setattr(obj, name, value)
         
         return {
             'total_amount': obj.total_payment,
-            'total_paid': total_paid,
-            'pending_amount': pending_payments,
-            'remaining_amount': obj.total_payment - total_paid,
-            'payment_count': payments.count(),
+            'total_paid': obj.total_paid,
+            'pending_amount': obj.pending_amount,
+            'remaining_amount': obj.total_payment - obj.total_paid,
+            'payment_count': obj.payment_count,
         }
     
     def get_timeline_info(self, obj):
@@ -151,7 +175,7 @@ class CreateContractSerializer(serializers.ModelSerializer):
         model = Contract
         fields = [
             'proposal_id', 'start_date', 'end_date', 'total_payment', 
-            'deliverables', 'milestones'
+            'deliverables'
         ]
     
     def validate_proposal_id(self, value):
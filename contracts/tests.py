@@ -1,3 +1,514 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from io import BytesIO, StringIO
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from projects.models import Category, Project, ProjectProposal
+from notifications.models import OutboxEvent
+from payments.models import Payment
+from . import render_service
+from .models import Contract, ContractDocument, ContractMilestone
+from .serializers import ContractDetailSerializer
+
+User = get_user_model()
+
+
+def create_contract(client, freelancer, title="Website redesign", **kwargs):
+    project = Project.objects.create(
+        title=title,
+        description="Redesign the marketing site",
+        budget=1000,
+        deadline=timezone.now() + timedelta(days=30),
+        client=client
+    )
+    proposal = ProjectProposal.objects.create(
+        project=project,
+        freelancer=freelancer,
+        cover_letter="I can do this",
+        proposed_budget=900,
+        status='accepted'
+    )
+    kwargs.setdefault('start_date', date.today())
+    kwargs.setdefault('total_payment', 900)
+    return Contract.objects.create(project_proposal=proposal, **kwargs)
+
+
+class ContractPdfCacheTestCase(TestCase):
+    def setUp(self):
+        self.cache_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_root, ignore_errors=True)
+        settings_override = override_settings(CONTRACT_PDF_CACHE_ROOT=self.cache_root, CONTRACT_PDF_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client_user = User.objects.create_user(
+            username="client", email="client@example.com", password="testpass123", user_type='client'
+        )
+        self.freelancer = User.objects.create_user(
+            username="freelancer", email="freelancer@example.com", password="testpass123", user_type='freelancer'
+        )
+        self.contract = create_contract(self.client_user, self.freelancer)
+        self.url = f"/api/contracts/contracts/{self.contract.id}/download_pdf/"
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.client_user)
+
+    def download(self, if_none_match=None):
+        headers = {'If-None-Match': if_none_match} if if_none_match else {}
+        with mock.patch.object(
+            render_service, 'render_contract_pdf', wraps=render_service.render_contract_pdf
+        ) as render:
+            response = self.client.get(self.url, headers=headers)
+        return response, render.call_count
+
+    def test_pdf_is_rendered_once_and_revalidated_with_etag(self):
+        """Test that repeat downloads come from the cache and If-None-Match gets a 304"""
+        response, renders = self.download()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(renders, 1)
+        etag = response["ETag"]
+        body = response.content
+        self.assertTrue(body.startswith(b"%PDF"))
+
+        response, renders = self.download()
+        self.assertEqual(renders, 0)
+        self.assertEqual(b"".join(response.streaming_content), body)
+        self.assertEqual(response["ETag"], etag)
+
+        response, renders = self.download(if_none_match=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(renders, 0)
+
+    def test_failed_render_returns_job_error(self):
+        """Test that a render error becomes a JSON 500 and a failed job, not a crash"""
+        with mock.patch.object(render_service, 'render_contract_pdf', side_effect=ValueError("bad font")):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertEqual(response.data["status"], "failed")
+        self.assertEqual(response.data["error"], "bad font")
+
+        response = self.client.get(f"/api/contracts/contracts/{self.contract.id}/pdf_job/")
+        self.assertEqual(response.data["status"], "failed")
+
+        # The next download retries the render
+        response, renders = self.download()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(renders, 1)
+
+    def test_contract_and_party_changes_invalidate_the_cache(self):
+        """Test that editing the contract or a party yields a new ETag and a fresh render"""
+        response, _ = self.download()
+        etag = response["ETag"]
+
+        self.contract.total_payment = 1200
+        self.contract.save()
+        response, renders = self.download(if_none_match=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(renders, 1)
+        self.assertNotEqual(response["ETag"], etag)
+        etag = response["ETag"]
+
+        User.objects.filter(id=self.freelancer.id).update(first_name="Renamed")
+        response, renders = self.download(if_none_match=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(renders, 1)
+
+        # Older versions are dropped when the new one is stored
+        self.assertEqual(len(os.listdir(os.path.join(self.cache_root, str(self.contract.id)))), 1)
+
+
+class ContractMilestoneTestCase(TestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            username="client", email="client@example.com", password="testpass123", user_type='client'
+        )
+        self.freelancer = User.objects.create_user(
+            username="freelancer", email="freelancer@example.com", password="testpass123", user_type='freelancer'
+        )
+        self.contract = create_contract(self.client_user, self.freelancer, status='active')
+        self.url = f"/api/contracts/contracts/{self.contract.id}/"
+        self.client = APIClient()
+
+    def test_milestones_are_rows_added_and_completed_individually(self):
+        """Test that adding and completing milestones touches single rows and shows up as due"""
+        self.client.force_authenticate(user=self.client_user)
+        due = (date.today() + timedelta(days=3)).isoformat()
+        response = self.client.post(self.url + "add_milestone/", {
+            "milestone": {"title": "Wireframes", "amount": "250.00", "due_date": due}
+        }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total_milestones"], 1)
+        milestone_id = response.data["milestone"]["id"]
+
+        response = self.client.get("/api/contracts/contracts/upcoming_milestones/")
+        self.assertEqual([m["id"] for m in response.data["results"]], [milestone_id])
+
+        self.client.force_authenticate(user=self.freelancer)
+        response = self.client.post(self.url + "complete_milestone/", {"milestone_id": milestone_id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        milestone = ContractMilestone.objects.get(id=milestone_id)
+        self.assertEqual(milestone.status, "completed")
+        self.assertEqual(milestone.completed_by, self.freelancer)
+
+        completed_at = milestone.completed_at
+
+        response = self.client.post(self.url + "complete_milestone/", {"milestone_id": milestone_id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ContractMilestone.objects.get(id=milestone_id).completed_at, completed_at)
+
+        response = self.client.post(self.url + "complete_milestone/", {"milestone_id": milestone_id + 100})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_legacy_milestones_field_is_rejected(self):
+        """Test that contract writes carrying milestones are refused instead of silently dropped"""
+        self.client.force_authenticate(user=self.client_user)
+        response = self.client.patch(self.url, {"milestones": '[{"title": "Sneaky"}]'}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("add_milestone", str(response.data["milestones"]))
+        self.contract.refresh_from_db()
+        self.assertEqual(self.contract.milestones, "")
+
+        project = Project.objects.create(
+            title="Logo", description="New logo", budget=300,
+            deadline=timezone.now() + timedelta(days=10), client=self.client_user
+        )
+        proposal = ProjectProposal.objects.create(
+            project=project, freelancer=self.freelancer, cover_letter="Happy to help",
+            proposed_budget=250, status='accepted'
+        )
+        payload = {
+            "proposal": proposal.id, "project_proposal": proposal.id, "start_date": str(date.today()),
+            "total_payment": "250.00", "milestones": '[{"title": "Draft"}]'
+        }
+        response = self.client.post("/api/contracts/contracts/", payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("add_milestone", str(response.data["milestones"]))
+        self.assertFalse(Contract.objects.filter(project_proposal=proposal).exists())
+
+        del payload["milestones"]
+        response = self.client.post("/api/contracts/contracts/", payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_backfill_copies_json_milestones(self):
+        """Test that the backfill moves the legacy JSON into rows, even next to newer rows"""
+        added = ContractMilestone.objects.create(contract=self.contract, title="Launch", amount=50)
+        Contract.objects.filter(id=self.contract.id).update(milestones=json.dumps([
+            {"id": 1, "title": "Design", "amount": 100.0, "due_date": "2025-03-01", "status": "completed",
+             "created_by": self.client_user.id, "created_at": "2025-01-01T10:00:00+00:00",
+             "completed_by": self.freelancer.id},
+            {"id": 2, "title": "Build", "amount": 400.5, "due_date": "", "status": "pending", "created_by": 9999},
+        ]))
+        other = create_contract(self.client_user, self.freelancer, title="Free text")
+        Contract.objects.filter(id=other.id).update(milestones="Two phases, paid on delivery")
+
+        call_command("backfill_contract_milestones", stdout=StringIO())
+        call_command("backfill_contract_milestones", stdout=StringIO())
+
+        design, build, launch = ContractMilestone.objects.filter(contract=self.contract)
+        self.assertEqual(launch, added)
+        self.contract.refresh_from_db()
+        self.assertEqual(self.contract.milestones, "")
+        self.assertEqual((design.title, design.status, design.due_date), ("Design", "completed", date(2025, 3, 1)))
+        self.assertEqual(design.completed_by, self.freelancer)
+        self.assertEqual(str(build.amount), "400.50")
+        self.assertIsNone(build.due_date)
+        self.assertIsNone(build.created_by)
+        self.assertFalse(ContractMilestone.objects.filter(contract=other).exists())
+        other.refresh_from_db()
+        self.assertEqual(other.milestones, "Two phases, paid on delivery")
+
+
+class ContractAnalyticsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client_user = User.objects.create_user(
+            username="client", email="client@example.com", password="testpass123", user_type='client'
+        )
+        freelancer = User.objects.create_user(
+            username="freelancer", email="freelancer@example.com", password="testpass123", user_type='freelancer'
+        )
+        yesterday = date.today() - timedelta(days=1)
+        create_contract(self.client_user, freelancer, title="A", status='active', total_payment=100, end_date=yesterday)
+        create_contract(self.client_user, freelancer, title="B", status='active', total_payment=300)
+        self.completed = create_contract(self.client_user, freelancer, title="C", status='completed', total_payment=200)
+        create_contract(self.client_user, freelancer, title="D", status='cancelled', total_payment=50)
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.client_user)
+
+    def test_summary_in_one_aggregate_and_cached_until_a_contract_changes(self):
+        """Test the single-pass summary, its cache and invalidation after a contract save commits"""
+        response = self.client.get("/api/contracts/contracts/analytics/")
+        summary = response.data["summary"]
+        self.assertEqual(summary["total_contracts"], 4)
+        self.assertEqual(summary["active_contracts"], 2)
+        self.assertEqual(summary["completed_contracts"], 1)
+        self.assertEqual(summary["cancelled_contracts"], 1)
+        self.assertEqual(summary["total_value"], 650)
+        self.assertEqual(summary["active_value"], 400)
+        self.assertEqual(summary["completed_value"], 200)
+        self.assertEqual(summary["overdue_contracts"], 1)
+        self.assertEqual(summary["contracts_this_month"], 4)
+        self.assertEqual(response.data["status_distribution"], [
+            {"status": "active", "count": 2},
+            {"status": "cancelled", "count": 1},
+            {"status": "completed", "count": 1},
+        ])
+        self.assertEqual(len(response.data["recent_contracts"]), 4)
+
+        # Only the lookup in the database-backed shared cache
+        with self.assertNumQueries(1):
+            cached = self.client.get("/api/contracts/contracts/analytics/")
+        self.assertEqual(cached.data, response.data)
+
+        self.completed.status = 'active'
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.completed.save()
+        # Dropped only on commit, so a reader in the meantime still gets the old figures
+        self.assertEqual(self.client.get("/api/contracts/contracts/analytics/").data, response.data)
+        for callback in callbacks:
+            callback()
+        response = self.client.get("/api/contracts/contracts/analytics/")
+        self.assertEqual(response.data["summary"]["active_contracts"], 3)
+
+    def test_milestone_and_document_changes_refresh_recent_contracts(self):
+        """Test that updates bypassing Contract.save still drop the cached recent_contracts"""
+        def recent(title):
+            response = self.client.get("/api/contracts/contracts/analytics/")
+            return next(c for c in response.data["recent_contracts"] if c["project_title"] == title)
+
+        self.assertEqual(recent("C")["milestone_items"], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            milestone = ContractMilestone.objects.create(contract=self.completed, title="Handover", amount=200)
+        self.assertEqual(recent("C")["milestone_items"][0]["status"], "pending")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ContractMilestone.complete(self.completed.id, milestone.id, self.client_user)
+        self.assertEqual(recent("C")["milestone_items"][0]["status"], "completed")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            document = ContractDocument.objects.create(
+                contract=self.completed, file=ContentFile(b"notes", name="notes.txt"),
+                filename="notes.txt", uploaded_by=self.client_user
+            )
+        self.assertEqual(len(recent("C")["documents"]), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            document.delete()
+        self.assertEqual(recent("C")["documents"], [])
+
+
+class ContractPaymentTotalsTestCase(TestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            username="client", email="client@example.com", password="testpass123", user_type='client'
+        )
+        freelancer = User.objects.create_user(
+            username="freelancer", email="freelancer@example.com", password="testpass123", user_type='freelancer'
+        )
+        self.contract = create_contract(self.client_user, freelancer, status='active', total_payment=1000)
+        project = self.contract.project_proposal.project
+        project.category = Category.objects.create(name="Web Development")
+        project.save()
+        for amount, payment_status in [(300, 'completed'), (200, 'completed'), (150, 'pending'), (99, 'failed')]:
+            Payment.objects.create(
+                contract=self.contract, payer=self.client_user, recipient=freelancer,
+                amount=amount, description="Milestone", status=payment_status
+            )
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.client_user)
+
+    def test_detail_reads_annotated_payment_totals(self):
+        """Test that payment_info is correct and costs no query of its own"""
+        url = f"/api/contracts/contracts/{self.contract.id}/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["project"]["category"], "Web Development")
+        self.assertEqual(response.data["payment_info"], {
+            "total_amount": Decimal("1000"),
+            "total_paid": Decimal("500"),
+            "pending_amount": Decimal("150"),
+            "remaining_amount": Decimal("500"),
+            "payment_count": 4,
+        })
+
+        annotated = Contract.objects.with_payment_totals().get(id=self.contract.id)
+        with self.assertNumQueries(0):
+            ContractDetailSerializer(annotated).get_payment_info(annotated)
+
+
+class ContractPartiesTestCase(TestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            username="client", email="client@example.com", password="testpass123", user_type='client'
+        )
+        self.freelancer = User.objects.create_user(
+            username="freelancer", email="freelancer@example.com", password="testpass123", user_type='freelancer'
+        )
+        self.contract = create_contract(self.client_user, self.freelancer)
+
+    def test_parties_are_denormalized_and_follow_the_project(self):
+        """Test that client/freelancer are copied on create and kept in sync"""
+        self.assertEqual(self.contract.client_id, self.client_user.id)
+        self.assertEqual(self.contract.freelancer_id, self.freelancer.id)
+
+        new_client = User.objects.create_user(
+            username="client2", email="client2@example.com", password="testpass123", user_type='client'
+        )
+        project = self.contract.project_proposal.project
+        project.client = new_client
+        project.save()
+        self.contract.refresh_from_db()
+        self.assertEqual(self.contract.client_id, new_client.id)
+
+        api = APIClient()
+        api.force_authenticate(user=self.client_user)
+        response = api.get(f"/api/contracts/contracts/{self.contract.id}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        api.force_authenticate(user=new_client)
+        response = api.get(f"/api/contracts/contracts/{self.contract.id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_backfill_fills_missing_parties(self):
+        """Test the backfill command on contracts saved before the columns existed"""
+        Contract.objects.filter(id=self.contract.id).update(client=None, freelancer=None)
+        call_command("backfill_contract_parties", batch_size=1, stdout=StringIO())
+        self.contract.refresh_from_db()
+        self.assertEqual(self.contract.client_id, self.client_user.id)
+        self.assertEqual(self.contract.freelancer_id, self.freelancer.id)
+
+
+class ContractExportTestCase(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        settings_override = override_settings(
+            CONTRACT_PDF_CACHE_ROOT=os.path.join(self.tmp, 'pdf'),
+            MEDIA_ROOT=os.path.join(self.tmp, 'media'),
+            CONTRACT_PDF_WORKERS=0
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client_user = User.objects.create_user(
+            username="client", email="client@example.com", password="testpass123", user_type='client'
+        )
+        freelancer = User.objects.create_user(
+            username="freelancer", email="freelancer@example.com", password="testpass123", user_type='freelancer'
+        )
+        self.active = [
+            create_contract(self.client_user, freelancer, title=f"Active {i}", status='active') for i in range(3)
+        ]
+        create_contract(self.client_user, freelancer, title="Draft")
+        stranger = User.objects.create_user(
+            username="stranger", email="stranger@example.com", password="testpass123", user_type='client'
+        )
+        create_contract(stranger, freelancer, title="Not yours", status='active')
+
+        self.document = ContractDocument.objects.create(
+            contract=self.active[0],
+            file=ContentFile(b"signed scope", name="scope.txt"),
+            filename="scope.txt",
+            uploaded_by=self.client_user
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.client_user)
+
+    def test_export_streams_filtered_contracts_as_zip(self):
+        """Test that the export holds a PDF per matching contract plus its documents"""
+        response = self.client.get("/api/contracts/contracts/export/", {"status": "active"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/zip")
+
+        archive = zipfile.ZipFile(BytesIO(b"".join(response.streaming_content)))
+        expected = [f"contract-{c.id}/contract-{c.id}.pdf" for c in self.active]
+        expected.insert(1, f"contract-{self.active[0].id}/documents/{self.document.id}-scope.txt")
+        self.assertEqual(archive.namelist(), expected)
+        self.assertTrue(archive.read(expected[0]).startswith(b"%PDF"))
+        self.assertEqual(archive.read(expected[1]), b"signed scope")
+
+    def test_export_entry_names_cannot_escape_the_contract_folder(self):
+        """Test that traversal and absolute paths in document filenames are stripped"""
+        self.document.filename = "../../etc/passwd"
+        self.document.save()
+        other = ContractDocument.objects.create(
+            contract=self.active[0], file=ContentFile(b"x", name="x.txt"), filename="/..",
+            uploaded_by=self.client_user
+        )
+
+        response = self.client.get("/api/contracts/contracts/export/", {"status": "active"})
+        names = zipfile.ZipFile(BytesIO(b"".join(response.streaming_content))).namelist()
+        folder = f"contract-{self.active[0].id}/documents"
+        self.assertIn(f"{folder}/{self.document.id}-passwd", names)
+        self.assertIn(f"{folder}/{other.id}-document", names)
+        self.assertFalse(any(".." in name or name.startswith("/") for name in names))
+
+    def test_export_rejects_unknown_status(self):
+        response = self.client.get("/api/contracts/contracts/export/", {"status": "archived"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ContractPdfJobTestCase(TransactionTestCase):
+    def setUp(self):
+        self.cache_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_root, ignore_errors=True)
+        settings_override = override_settings(CONTRACT_PDF_CACHE_ROOT=self.cache_root, CONTRACT_PDF_WORKERS=1)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client_user = User.objects.create_user(
+            username="client", email="client@example.com", password="testpass123", user_type='client'
+        )
+        freelancer = User.objects.create_user(
+            username="freelancer", email="freelancer@example.com", password="testpass123", user_type='freelancer'
+        )
+        self.contract = create_contract(self.client_user, freelancer)
+        self.url = f"/api/contracts/contracts/{self.contract.id}/pdf_job/"
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.client_user)
+
+    def test_job_renders_in_worker_process_and_pushes_pdf_ready(self):
+        """Test that a submitted job finishes in the pool, is pollable and notifies the requester"""
+        close_all = mock.patch.object(
+            render_service.connections, 'close_all', wraps=render_service.connections.close_all
+        )
+        with close_all as closed:
+            response = self.client.post(self.url)
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            self.assertEqual(response.data["status"], "pending")
+
+            # Wait for the worker (spawning the pool takes a moment)
+            for _ in range(300):
+                response = self.client.get(self.url)
+                if response.data["status"] != "pending" and closed.called:
+                    break
+                time.sleep(0.1)
+        self.assertEqual(response.data["status"], "done")
+        # The callback thread closed the connection it wrote the outbox event on
+        self.assertTrue(closed.called)
+
+        event = OutboxEvent.objects.get(group_name=f"notifications_{self.client_user.id}")
+        self.assertEqual(event.message["message"]["type"], "pdf_ready")
+        self.assertEqual(event.message["message"]["job_id"], response.data["job_id"])
+
+        response = self.client.get(response.data["download_url"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"%PDF"))
@@ -2,30 +2,24 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, JsonResponse
 from django.template.loader import get_template
-from io import BytesIO
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from decimal import Decimal
+from django.core.cache import cache
 from django.utils import timezone
-from django.db.models import Q, Count, Sum
-from .models import Contract, ContractDocument
-from .serializers import ContractSerializer, ContractDocumentSerializer
+from django.db.models import Q
+from django.utils.http import parse_etags
+from freelancehub_backend.exports import zip_response
+from . import analytics as contract_analytics, pdf_cache, render_service
+from .export import iter_export_entries
+from .pdf_generator import REPORTLAB_AVAILABLE
+from .models import Contract, ContractDocument, ContractMilestone
+from .serializers import (
+    ContractSerializer, ContractDetailSerializer, ContractDocumentSerializer, ContractMilestoneSerializer
+)
 from projects.models import ProjectProposal
 
-# Try to import reportlab, but handle gracefully if not installed
-try:
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.lib.units import inch
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-    from reportlab.lib import colors
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-    REPORTLAB_AVAILABLE = True
-except ImportError:
-    REPORTLAB_AVAILABLE = False
-
 class ContractPagination(PageNumberPagination):
     page_size = 12
     page_size_query_param = 'page_size'
@@ -36,9 +30,7 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
         # Only client or freelancer involved in the contract can modify it
-        return (obj.client == request.user or 
-                obj.freelancer == request.user or 
-                request.user.is_superuser)
+        return obj.is_party(request.user) or request.user.is_superuser
 
 class ContractViewSet(viewsets.ModelViewSet):
     serializer_class = ContractSerializer
@@ -48,19 +40,24 @@ class ContractViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.is_superuser:
-            return Contract.objects.all().select_related(
-                'project_proposal__project', 
-                'project_proposal__freelancer'
-            )
+            queryset = Contract.objects.all()
         elif user.user_type == 'client':
-            return Contract.objects.filter(
-                project_proposal__project__client=user
-            ).select_related('project_proposal__project', 'project_proposal__freelancer')
+            queryset = Contract.objects.filter(client=user)
         elif user.user_type == 'freelancer':
-            return Contract.objects.filter(
-                project_proposal__freelancer=user
-            ).select_related('project_proposal__project', 'project_proposal__freelancer')
-        return Contract.objects.none()
+            queryset = Contract.objects.filter(freelancer=user)
+        else:
+            return Contract.objects.none()
+        queryset = queryset.select_related('project_proposal__project', 'client', 'freelancer')
+        
+        if self.action == 'retrieve':
+            # Payment totals for ContractDetailSerializer without a query per contract
+            queryset = queryset.select_related('project_proposal__project__category').with_payment_totals()
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return ContractDetailSerializer
+        return ContractSerializer
 
     def create(self, request, *args, **kwargs):
         """Create a contract from an accepted proposal"""
@@ -102,15 +99,12 @@ class ContractViewSet(viewsets.ModelViewSet):
         """Get contracts for current user"""
         user = request.user
         if user.user_type == 'client':
-            queryset = Contract.objects.filter(
-                project_proposal__project__client=user
-            ).select_related('project_proposal__project', 'project_proposal__freelancer')
+            queryset = Contract.objects.filter(client=user)
         elif user.user_type == 'freelancer':
-            queryset = Contract.objects.filter(
-                project_proposal__freelancer=user
-            ).select_related('project_proposal__project', 'project_proposal__freelancer')
+            queryset = Contract.objects.filter(freelancer=user)
         else:
             queryset = Contract.objects.none()
+        queryset = queryset.select_related('project_proposal__project', 'client', 'freelancer')
         
         page = self.paginate_queryset(queryset)
         if page is not None:
@@ -184,9 +178,9 @@ class ContractViewSet(viewsets.ModelViewSet):
         contract = self.get_object()
         user = request.user
         
-        if user == contract.client:
+        if user.id == contract.client_id:
             contract.signed_by_client = True
-        elif user == contract.freelancer:
+        elif user.id == contract.freelancer_id:
             contract.signed_by_freelancer = True
         else:
             return Response({'detail': 'You are not authorized to sign this contract'}, 
@@ -227,15 +221,108 @@ class ContractViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def download_pdf(self, request, pk=None):
-        """Download contract as PDF"""
+        """Download contract as PDF, served from the PDF cache when unchanged"""
         contract = self.get_object()
         
         if not REPORTLAB_AVAILABLE:
             # Fallback to simple text-based PDF generation
             return self.generate_simple_pdf(contract)
         
-        # Create advanced PDF with reportlab
-        return self.generate_advanced_pdf(contract)
+        version = pdf_cache.content_version(contract)
+        etag = f'"{version}"'
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+        
+        cached = pdf_cache.open_cached(contract.id, version)
+        if cached is not None:
+            response = FileResponse(cached, content_type='application/pdf')
+        else:
+            try:
+                content = render_service.render(contract, version, user_id=request.user.id)
+            except render_service.RenderQueueFull:
+                return Response({'error': 'Too many PDFs are being generated, try again shortly'},
+                              status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '5'})
+            except Exception as e:
+                # The job records the failure too, but pool callbacks may not have run yet
+                job = render_service.job_status(contract.id, version)
+                job.update(status='failed', error=str(e))
+                return Response(job, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            if content is None:
+                # Still rendering; the client polls pdf_job or waits for the pdf_ready event
+                return Response(render_service.job_status(contract.id, version),
+                              status=status.HTTP_202_ACCEPTED)
+            response = HttpResponse(content, content_type='application/pdf')
+        
+        response['Content-Disposition'] = f'attachment; filename="contract-{contract.id}.pdf"'
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def export(self, request):
+        """
+        Stream contract PDFs and documents as a ZIP
+        
+        Filters: ?status=active,completed, ?created_after= and ?created_before=
+        (YYYY-MM-DD), and ?user=<id> for admins.
+        """
+        queryset = self.get_queryset()
+        params = request.query_params
+        
+        statuses = [value for value in params.get('status', '').split(',') if value]
+        valid_statuses = {choice for choice, _ in Contract.STATUS_CHOICES}
+        if any(value not in valid_statuses for value in statuses):
+            return Response({'error': f"Invalid status. Choose from: {', '.join(sorted(valid_statuses))}"},
+                          status=status.HTTP_400_BAD_REQUEST)
+        if statuses:
+            queryset = queryset.filter(status__in=statuses)
+        
+        try:
+            created_after = date.fromisoformat(params['created_after']) if params.get('created_after') else None
+            created_before = date.fromisoformat(params['created_before']) if params.get('created_before') else None
+        except ValueError:
+            return Response({'error': 'Invalid date format. Use YYYY-MM-DD'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        if created_after:
+            queryset = queryset.filter(created_at__date__gte=created_after)
+        if created_before:
+            queryset = queryset.filter(created_at__date__lte=created_before)
+        
+        try:
+            user_id = int(params['user']) if params.get('user') else None
+        except ValueError:
+            return Response({'error': 'Invalid user'}, status=status.HTTP_400_BAD_REQUEST)
+        if user_id and request.user.is_superuser:
+            queryset = queryset.filter(
+                Q(client_id=user_id) | Q(freelancer_id=user_id)
+            )
+        
+        return zip_response(request, iter_export_entries(queryset), f'contracts-{user_id or request.user.id}')
+
+    @action(detail=True, methods=['get', 'post'], permission_classes=[permissions.IsAuthenticated])
+    def pdf_job(self, request, pk=None):
+        """Start rendering the contract PDF in the background (POST) or check on it (GET)"""
+        contract = self.get_object()
+        
+        if not REPORTLAB_AVAILABLE:
+            return Response({'error': 'PDF generation is not available'},
+                          status=status.HTTP_501_NOT_IMPLEMENTED)
+        
+        version = pdf_cache.content_version(contract)
+        if request.method == 'POST' and not pdf_cache.is_cached(contract.id, version):
+            try:
+                render_service.submit(contract, version, notify_user_id=request.user.id)
+            except render_service.RenderQueueFull:
+                return Response({'error': 'Too many PDFs are being generated, try again shortly'},
+                              status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '5'})
+        
+        job = render_service.job_status(contract.id, version)
+        if request.method == 'POST' and job['status'] != 'done':
+            return Response(job, status=status.HTTP_202_ACCEPTED)
+        return Response(job)
     
     def generate_simple_pdf(self, contract):
         """Generate simple PDF without reportlab"""
@@ -273,213 +360,38 @@ Generated on: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}
         response['Content-Disposition'] = f'attachment; filename="contract-{contract.id}.txt"'
         return response
     
-    def generate_advanced_pdf(self, contract):
-        """Generate advanced PDF with reportlab"""
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        story = []
-        styles = getSampleStyleSheet()
-        
-        # Title
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            textColor=colors.darkblue
-        )
-        story.append(Paragraph("FREELANCE CONTRACT", title_style))
-        story.append(Spacer(1, 20))
-        
-        # Contract Info Table
-        contract_data = [
-            ['Contract ID:', str(contract.id)],
-            ['Date Created:', contract.created_at.strftime('%B %d, %Y')],
-            ['Project:', contract.project_proposal.project.title],
-            ['Status:', contract.get_status_display()],
-        ]
-        
-        contract_table = Table(contract_data, colWidths=[2*inch, 4*inch])
-        contract_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(contract_table)
-        story.append(Spacer(1, 20))
-        
-        # Parties
-        story.append(Paragraph("PARTIES", styles['Heading2']))
-        
-        parties_data = [
-            ['CLIENT', 'FREELANCER'],
-            [f"{contract.client.first_name} {contract.client.last_name}", 
-             f"{contract.freelancer.first_name} {contract.freelancer.last_name}"],
-            [contract.client.email, contract.freelancer.email],
-            [f"User ID: {contract.client.id}", f"User ID: {contract.freelancer.id}"],
-        ]
-        
-        parties_table = Table(parties_data, colWidths=[3*inch, 3*inch])
-        parties_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 11),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(parties_table)
-        story.append(Spacer(1, 20))
-        
-        # Financial Terms
-        story.append(Paragraph("FINANCIAL TERMS", styles['Heading2']))
-        
-        financial_data = [
-            ['Total Payment:', f"${contract.total_payment}"],
-            ['Start Date:', contract.start_date.strftime('%B %d, %Y')],
-            ['End Date:', contract.end_date.strftime('%B %d, %Y') if contract.end_date else 'Not specified'],
-        ]
-        
-        financial_table = Table(financial_data, colWidths=[2*inch, 4*inch])
-        financial_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(financial_table)
-        story.append(Spacer(1, 20))
-        
-        # Deliverables
-        if contract.deliverables:
-            story.append(Paragraph("DELIVERABLES", styles['Heading2']))
-            story.append(Paragraph(contract.deliverables, styles['Normal']))
-            story.append(Spacer(1, 15))
-        
-        # Milestones
-        if contract.milestones:
-            story.append(Paragraph("MILESTONES", styles['Heading2']))
-            story.append(Paragraph(contract.milestones, styles['Normal']))
-            story.append(Spacer(1, 15))
-        
-        # Signatures
-        story.append(Paragraph("SIGNATURES", styles['Heading2']))
-        
-        signature_data = [
-            ['Party', 'Status', 'Date'],
-            ['Client', 'Signed' if contract.signed_by_client else 'Pending', 
-             contract.updated_at.strftime('%B %d, %Y') if contract.signed_by_client else ''],
-            ['Freelancer', 'Signed' if contract.signed_by_freelancer else 'Pending',
-             contract.updated_at.strftime('%B %d, %Y') if contract.signed_by_freelancer else ''],
-        ]
-        
-        signature_table = Table(signature_data, colWidths=[2*inch, 2*inch, 2*inch])
-        signature_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 11),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(signature_table)
-        
-        # Footer
-        story.append(Spacer(1, 30))
-        footer_style = ParagraphStyle(
-            'Footer',
-            parent=styles['Normal'],
-            fontSize=8,
-            alignment=TA_CENTER,
-            textColor=colors.grey
-        )
-        story.append(Paragraph(f"Generated on {timezone.now().strftime('%B %d, %Y at %I:%M %p')}", footer_style))
-        story.append(Paragraph("This is a legally binding contract between the specified parties.", footer_style))
-        
-        # Build PDF
-        doc.build(story)
-        buffer.seek(0)
-        
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="contract-{contract.id}.pdf"'
-        return response
-
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def analytics(self, request):
         """Get comprehensive contract analytics"""
         user = request.user
+        key = contract_analytics.cache_key(user)
+        analytics_data = cache.get(key)
+        if analytics_data is not None:
+            return Response(analytics_data)
         
         # Base queryset based on user type
         if user.is_superuser:
             contracts = Contract.objects.all()
         elif user.user_type == 'client':
-            contracts = Contract.objects.filter(project_proposal__project__client=user)
+            contracts = Contract.objects.filter(client=user)
         elif user.user_type == 'freelancer':
-            contracts = Contract.objects.filter(project_proposal__freelancer=user)
+            contracts = Contract.objects.filter(freelancer=user)
         else:
             contracts = Contract.objects.none()
         
-        # Calculate statistics
-        total_contracts = contracts.count()
-        active_contracts = contracts.filter(status='active').count()
-        completed_contracts = contracts.filter(status='completed').count()
-        cancelled_contracts = contracts.filter(status='cancelled').count()
-        
-        # Financial statistics
-        total_value = contracts.aggregate(total=Sum('total_payment'))['total'] or 0
-        active_value = contracts.filter(status='active').aggregate(total=Sum('total_payment'))['total'] or 0
-        completed_value = contracts.filter(status='completed').aggregate(total=Sum('total_payment'))['total'] or 0
-        
-        # Average contract value
-        avg_value = total_value / total_contracts if total_contracts > 0 else 0
-        
-        # Monthly statistics
-        current_month = timezone.now().replace(day=1)
-        contracts_this_month = contracts.filter(created_at__gte=current_month).count()
-        
-        # Overdue contracts
-        today = timezone.now().date()
-        overdue_contracts = contracts.filter(
-            status='active',
-            end_date__lt=today
-        ).count()
+        summary, status_distribution = contract_analytics.contract_summary(contracts)
         
         # Recent activity
-        recent_contracts = contracts.order_by('-created_at')[:5]
-        
-        # Contract status distribution
-        status_distribution = contracts.values('status').annotate(
-            count=Count('status')
-        ).order_by('status')
+        recent_contracts = contracts.select_related(
+            'project_proposal__project__category', 'client', 'freelancer'
+        ).prefetch_related('documents', 'milestone_items').order_by('-created_at')[:5]
         
         analytics_data = {
-            'summary': {
-                'total_contracts': total_contracts,
-                'active_contracts': active_contracts,
-                'completed_contracts': completed_contracts,
-                'cancelled_contracts': cancelled_contracts,
-                'total_value': total_value,
-                'active_value': active_value,
-                'completed_value': completed_value,
-                'average_contract_value': avg_value,
-                'contracts_this_month': contracts_this_month,
-                'overdue_contracts': overdue_contracts,
-            },
-            'status_distribution': list(status_distribution),
+            'summary': summary,
+            'status_distribution': status_distribution,
             'recent_contracts': ContractSerializer(recent_contracts, many=True, context={'request': request}).data,
         }
+        cache.set(key, analytics_data, contract_analytics.CACHE_TIMEOUT)
         
         return Response(analytics_data)
 
@@ -490,7 +402,7 @@ Generated on: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}
         user = request.user
         
         # Check if user is authorized to sign
-        if user == contract.client:
+        if user.id == contract.client_id:
             if contract.signed_by_client:
                 return Response(
                     {'error': 'Contract already signed by client'}, 
@@ -499,7 +411,7 @@ Generated on: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}
             contract.signed_by_client = True
             contract.client_signed_at = timezone.now()
             
-        elif user == contract.freelancer:
+        elif user.id == contract.freelancer_id:
             if contract.signed_by_freelancer:
                 return Response(
                     {'error': 'Contract already signed by freelancer'}, 
@@ -550,7 +462,7 @@ Generated on: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}
         contract = self.get_object()
         
         # Only allow contract parties to add milestones
-        if request.user not in [contract.client, contract.freelancer]:
+        if not contract.is_party(request.user):
             return Response(
                 {'error': 'Not authorized to modify this contract'}, 
                 status=status.HTTP_403_FORBIDDEN
@@ -563,32 +475,15 @@ Generated on: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Parse existing milestones
-        try:
-            existing_milestones = json.loads(contract.milestones) if contract.milestones else []
-        except (json.JSONDecodeError, TypeError):
-            existing_milestones = []
-        
-        # Add new milestone
-        new_milestone = {
-            'id': len(existing_milestones) + 1,
-            'title': milestone_data.get('title', ''),
-            'description': milestone_data.get('description', ''),
-            'amount': float(milestone_data.get('amount', 0)),
-            'due_date': milestone_data.get('due_date', ''),
-            'status': 'pending',
-            'created_by': request.user.id,
-            'created_at': timezone.now().isoformat(),
-        }
-        
-        existing_milestones.append(new_milestone)
-        contract.milestones = json.dumps(existing_milestones)
-        contract.save()
+        serializer = ContractMilestoneSerializer(data=milestone_data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        serializer.save(contract=contract, created_by=request.user)
         
         return Response({
             'message': 'Milestone added successfully',
-            'milestone': new_milestone,
-            'total_milestones': len(existing_milestones)
+            'milestone': serializer.data,
+            'total_milestones': contract.milestone_items.count()
         })
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
@@ -602,45 +497,35 @@ Generated on: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}
                 {'error': 'Milestone ID required'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
+        try:
+            milestone_id = int(milestone_id)
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'Invalid milestone ID'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         # Only freelancer can mark milestones as completed
-        if request.user != contract.freelancer:
+        if request.user.id != contract.freelancer_id:
             return Response(
                 {'error': 'Only freelancer can mark milestones as completed'}, 
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Parse milestones
-        try:
-            milestones = json.loads(contract.milestones) if contract.milestones else []
-        except (json.JSONDecodeError, TypeError):
-            return Response(
-                {'error': 'Invalid milestone data'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Find and update milestone
-        milestone_found = False
-        for milestone in milestones:
-            if milestone.get('id') == int(milestone_id):
-                milestone['status'] = 'completed'
-                milestone['completed_at'] = timezone.now().isoformat()
-                milestone['completed_by'] = request.user.id
-                milestone_found = True
-                break
-        
-        if not milestone_found:
+        if not ContractMilestone.complete(contract.id, milestone_id, request.user):
+            if ContractMilestone.objects.filter(id=milestone_id, contract=contract).exists():
+                return Response(
+                    {'error': 'Milestone is already completed'}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             return Response(
                 {'error': 'Milestone not found'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        contract.milestones = json.dumps(milestones)
-        contract.save()
-        
         # Send notification to client
-        from notifications.utils import create_notification
-        create_notification(
+        from notifications.utils import create_and_send_notification
+        create_and_send_notification(
             user=contract.client,
             title="Milestone Completed",
             message=f"A milestone has been completed for project '{contract.project_proposal.project.title}'",
@@ -649,13 +534,33 @@ Generated on: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}
         
         return Response({'message': 'Milestone marked as completed'})
 
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def upcoming_milestones(self, request):
+        """Pending milestones due in the next ?days= days (default 7) across the user's contracts"""
+        try:
+            days = int(request.query_params.get('days', 7))
+        except ValueError:
+            return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        today = timezone.now().date()
+        milestones = ContractMilestone.objects.filter(
+            contract__in=self.get_queryset().values('id'),
+            status='pending',
+            due_date__range=(today, today + timedelta(days=days))
+        ).order_by('due_date', 'id')
+        
+        page = self.paginate_queryset(milestones)
+        if page is not None:
+            return self.get_paginated_response(ContractMilestoneSerializer(page, many=True).data)
+        return Response(ContractMilestoneSerializer(milestones, many=True).data)
+
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def extend_deadline(self, request, pk=None):
         """Extend contract deadline"""
         contract = self.get_object()
         
         # Only allow contract parties to extend deadline
-        if request.user not in [contract.client, contract.freelancer]:
+        if not contract.is_party(request.user):
             return Response(
                 {'error': 'Not authorized to modify this contract'}, 
                 status=status.HTTP_403_FORBIDDEN
@@ -690,7 +595,7 @@ Generated on: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}
         contract.save()
         
         # Send notification to other party
-        other_user = contract.client if request.user == contract.freelancer else contract.freelancer
+        other_user = contract.client if request.user.id == contract.freelancer_id else contract.freelancer
         from notifications.utils import create_notification
         create_notification(
             user=other_user,
@@ -712,7 +617,7 @@ Generated on: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}
         contract = self.get_object()
         
         # Only allow contract parties to terminate
-        if request.user not in [contract.client, contract.freelancer]:
+        if not contract.is_party(request.user):
             return Response(
                 {'error': 'Not authorized to terminate this contract'}, 
                 status=status.HTTP_403_FORBIDDEN
@@ -739,7 +644,7 @@ Generated on: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}
         contract.save()
         
         # Send notification to other party
-        other_user = contract.client if request.user == contract.freelancer else contract.freelancer
+        other_user = contract.client if request.user.id == contract.freelancer_id else contract.freelancer
         from notifications.utils import create_notification
         create_notification(
             user=other_user,
@@ -28,17 +28,18 @@ def test_pdf_endpoint():
             
         print(f"✅ Found contract #{contract.id}")
         
-        # Test the view directly
-        from contracts.views import ContractViewSet
-        from contracts.pdf_generator_reportlab import ContractPDFGenerator
+        # Render through the same service the download_pdf view uses
+        from contracts import pdf_cache, render_service
         
-        # Test PDF generation directly
-        pdf_generator = ContractPDFGenerator()
-        response = pdf_generator.create_pdf_response(contract)
+        version = pdf_cache.content_version(contract)
+        content = render_service.render(contract, version)
         
-        print(f"✅ Direct PDF generation: {response.status_code}")
-        print(f"   Content-Type: {response.get('Content-Type')}")
-        print(f"   Content-Length: {response.get('Content-Length')}")
+        if content is None:
+            print(f"⏳ Still rendering: {render_service.job_status(contract.id, version)}")
+            return False
+        
+        print(f"✅ Direct PDF generation: {len(content):,} bytes")
+        print(f"   Starts with %PDF: {content.startswith(b'%PDF')}")
         
         return True
         
@@ -0,0 +1,67 @@
+"""
+Dispute summary PDF, laid out with ``freelancehub_backend.pdf``.
+"""
+from freelancehub_backend.pdf import REPORTLAB_AVAILABLE, footer, heading, render, spacer, table, text, title
+
+DATE_FORMAT = '%B %d, %Y'
+
+
+def dispute_pdf_data(dispute, generated_at):
+    """Snapshot everything the dispute summary shows"""
+    def name(user):
+        return (user.get_full_name() or user.username) if user else ''
+
+    return {
+        'id': dispute.id,
+        'title': dispute.title,
+        'type': dispute.get_type_display(),
+        'priority': dispute.get_priority_display(),
+        'status': dispute.get_status_display(),
+        'opened': dispute.created_at.strftime(DATE_FORMAT),
+        'updated': dispute.updated_at.strftime(DATE_FORMAT),
+        'opened_by': name(dispute.created_by),
+        'project_title': dispute.project.title if dispute.project else '',
+        'contract_id': dispute.contract_id,
+        'description': dispute.description,
+        'resolution': dispute.resolution,
+        'resolved_by': name(dispute.resolved_by),
+        'generated_at': generated_at.strftime('%B %d, %Y at %I:%M %p'),
+    }
+
+
+def dispute_layout(data):
+    details = [
+        ['Dispute #:', str(data['id'])],
+        ['Title:', data['title']],
+        ['Type:', data['type']],
+        ['Priority:', data['priority']],
+        ['Status:', data['status']],
+        ['Opened:', f"{data['opened']} by {data['opened_by']}"],
+        ['Last update:', data['updated']],
+    ]
+    if data['project_title']:
+        details.append(['Project:', data['project_title']])
+    if data['contract_id']:
+        details.append(['Contract:', f"#{data['contract_id']}"])
+
+    layout = [
+        title("DISPUTE SUMMARY"),
+        spacer(20),
+        table(details, [2, 4], style='fields'),
+        spacer(20),
+        heading("DESCRIPTION"),
+        text(data['description']),
+        spacer(15),
+    ]
+    if data['resolution']:
+        layout += [heading("RESOLUTION"), text(data['resolution'])]
+        if data['resolved_by']:
+            layout.append(text(f"Resolved by {data['resolved_by']}"))
+        layout.append(spacer(15))
+    layout += [spacer(15), footer(f"Generated on {data['generated_at']}")]
+    return layout
+
+
+def render_dispute_pdf(data):
+    """Render the dispute summary PDF and return its bytes"""
+    return render(dispute_layout(data))
@@ -1,3 +1,46 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .models import Dispute
+
+User = get_user_model()
+
+
+class DisputePdfTestCase(TestCase):
+    def setUp(self):
+        self.freelancer = User.objects.create_user(
+            username="freelancer", email="freelancer@example.com", password="testpass123", user_type='freelancer'
+        )
+        self.dispute = Dispute.objects.create(
+            title="Late payment <milestone 2>",
+            description="The client has not paid the second milestone & ignores messages.",
+            type='payment',
+            created_by=self.freelancer
+        )
+        self.url = f"/api/disputes/{self.dispute.id}/pdf/"
+        self.client = APIClient()
+
+    def test_dispute_pdf_is_served_to_its_author_only(self):
+        """Test the dispute PDF download and that other users cannot fetch it"""
+        self.client.force_authenticate(user=self.freelancer)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertIn(f'dispute-{self.dispute.id}.pdf', response["Content-Disposition"])
+        self.assertTrue(response.content.startswith(b"%PDF"))
+
+        outsider = User.objects.create_user(
+            username="outsider", email="outsider@example.com", password="testpass123", user_type='freelancer'
+        )
+        self.client.force_authenticate(user=outsider)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        client_user = User.objects.create_user(
+            username="client", email="client@example.com", password="testpass123", user_type='client'
+        )
+        self.client.force_authenticate(user=client_user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
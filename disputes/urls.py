@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import DisputeListCreateView, DisputeDetailView, DisputeResolveView
+from .views import DisputeListCreateView, DisputeDetailView, DisputePdfView, DisputeResolveView
 
 urlpatterns = [
     path('', DisputeListCreateView.as_view(), name='dispute-list-create'),
     path('<int:pk>/', DisputeDetailView.as_view(), name='dispute-detail'),
+    path('<int:pk>/pdf/', DisputePdfView.as_view(), name='dispute-pdf'),
     path('<int:pk>/resolve/', DisputeResolveView.as_view(), name='dispute-resolve'),
 ]
 
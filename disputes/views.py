@@ -1,6 +1,9 @@
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils import timezone
 from rest_framework import generics, permissions, status
 from .models import Dispute
+from .pdf import REPORTLAB_AVAILABLE, dispute_pdf_data, render_dispute_pdf
 from .serializers import DisputeSerializer, CreateDisputeSerializer
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -18,7 +21,7 @@ class IsFreelancerPermission(permissions.BasePermission):
             return False
         
         # Check if user is a freelancer
-        return hasattr(request.user, 'freelancer_profile') and request.user.freelancer_profile is not None
+        return request.user.user_type == 'freelancer'
 
 class DisputeListCreateView(generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated, IsFreelancerPermission]
@@ -63,7 +66,7 @@ class DisputeListCreateView(generics.ListCreateAPIView):
         
     def create(self, request, *args, **kwargs):
         # Add additional validation for freelancer-only access
-        if not hasattr(request.user, 'freelancer_profile') or not request.user.freelancer_profile:
+        if request.user.user_type != 'freelancer':
             return Response(
                 {'error': 'Only freelancers can create disputes'}, 
                 status=status.HTTP_403_FORBIDDEN
@@ -127,6 +130,21 @@ class DisputeDetailView(generics.RetrieveAPIView):
             'project', 'contract', 'created_by', 'resolved_by'
         )
 
+class DisputePdfView(DisputeDetailView):
+    """Download a dispute summary as PDF"""
+
+    def retrieve(self, request, *args, **kwargs):
+        dispute = self.get_object()
+        
+        if not REPORTLAB_AVAILABLE:
+            return Response({'error': 'PDF generation is not available'},
+                          status=status.HTTP_501_NOT_IMPLEMENTED)
+        
+        content = render_dispute_pdf(dispute_pdf_data(dispute, timezone.now()))
+        response = HttpResponse(content, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="dispute-{dispute.id}.pdf"'
+        return response
+
 class DisputeResolveView(APIView):
     permission_classes = [permissions.IsAdminUser]
 
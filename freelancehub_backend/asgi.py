@@ -8,22 +8,23 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
 import os
-import django
-from channels.routing import ProtocolTypeRouter, URLRouter
 from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "freelancehub_backend.settings")
+django_asgi_app = get_asgi_application()
+
+# Imported after Django is set up since they load models
+from channels.routing import ProtocolTypeRouter, URLRouter
 from .jwt_middleware import JWTAuthMiddlewareStack
 import chats.routing
 import notifications.routing
 
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "freelancehub_backend.settings")
-django.setup()
-
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": django_asgi_app,
     "websocket": JWTAuthMiddlewareStack(
         URLRouter(
             chats.routing.websocket_urlpatterns +
             notifications.routing.websocket_urlpatterns
         )
     ),
-})
\ No newline at end of file
+})
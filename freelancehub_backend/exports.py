@@ -0,0 +1,163 @@
+"""
+Streaming JSONL and ZIP exports shared by the chat, notification, payment and
+contract APIs.
+
+Rows are read in fixed-size chunks with keyset pagination on ``id`` so memory
+use does not depend on how much history is exported, and every line carries
+its ``id`` so an interrupted download can be resumed with ``after_id``.
+"""
+import io
+import json
+import zipfile
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+EXPORT_CHUNK_SIZE = 500
+# Encoded lines are buffered up to this size before being written out
+WRITE_BUFFER_SIZE = 64 * 1024
+
+
+def iter_queryset_chunks(queryset, after_id=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield lists of objects in ascending ``id`` order, one chunk per query"""
+    last_id = after_id or 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id).order_by('id')[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1].id
+
+
+def iter_jsonl(records):
+    """Encode dicts as newline-delimited JSON, one line per record"""
+    buffer = []
+    buffered = 0
+    for record in records:
+        line = json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False).encode() + b'\n'
+        buffer.append(line)
+        buffered += len(line)
+        if buffered >= WRITE_BUFFER_SIZE:
+            yield b''.join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def iter_gzip(chunks):
+    """Gzip a byte stream incrementally"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class ZipSink(io.RawIOBase):
+    """Write-only file that collects zipfile output until it is drained"""
+
+    def __init__(self):
+        self.chunks = []
+        self.buffered = 0
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.buffered += len(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        # No seek(), so zipfile writes data descriptors instead of going back
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        self.buffered = 0
+        return data
+
+
+def iter_zip(entries):
+    """
+    Build a ZIP archive incrementally from ``(name, modified, chunks)`` entries
+
+    ``chunks`` is an iterable of bytes, so no file has to fit in memory.
+    """
+    sink = ZipSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, modified, chunks in entries:
+            info = zipfile.ZipInfo(name, date_time=modified.timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            # Sizes are not known up front, so always allow entries over 4 GB
+            with archive.open(info, 'w', force_zip64=True) as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    if sink.buffered >= WRITE_BUFFER_SIZE:
+                        yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
+
+
+async def aiter_sync(iterator):
+    """
+    Drive a blocking iterator from the event loop.
+
+    Under ASGI Django would otherwise collect a synchronous iterator into
+    memory before sending it, so each chunk is pulled in the sync thread.
+    """
+    sentinel = object()
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await next_chunk(iterator, sentinel)
+        if chunk is sentinel:
+            return
+        yield chunk
+
+
+def parse_after_id(request):
+    """Read the ``after_id`` resume cursor, raising ``ValueError`` if malformed"""
+    after_id = request.query_params.get('after_id')
+    return int(after_id) if after_id else None
+
+
+def jsonl_response(request, records, filename):
+    """
+    Build a streaming JSONL response, gzipped when ``?gzip=true`` is passed
+    """
+    body = iter_jsonl(records)
+    if request.query_params.get('gzip', '').lower() in ('1', 'true', 'yes'):
+        body = iter_gzip(body)
+        content_type = 'application/gzip'
+        filename = f'{filename}.jsonl.gz'
+    else:
+        content_type = 'application/x-ndjson'
+        filename = f'{filename}.jsonl'
+
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        body = aiter_sync(body)
+
+    response = StreamingHttpResponse(body, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def zip_response(request, entries, filename):
+    """Build a streaming ZIP response from ``iter_zip`` entries"""
+    body = iter_zip(entries)
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        body = aiter_sync(body)
+
+    response = StreamingHttpResponse(body, content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.zip"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
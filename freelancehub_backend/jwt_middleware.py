@@ -0,0 +1,189 @@
+"""
+JWT authentication for WebSocket connections.
+
+The access token is read from the ``token`` query parameter (browsers cannot
+set headers on a WebSocket handshake) or an ``Authorization: Bearer`` header,
+validated once here, and the resolved user is placed in ``scope['user']`` for
+every consumer.
+
+Users are resolved through a bounded in-process TTL cache keyed by user id and
+the token's ``token_version`` claim, so a reconnect storm does not turn into a
+database query per socket. Saving a user evicts their entries in this process;
+other processes pick up changes when the entry expires.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ValidationError
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+User = get_user_model()
+
+
+class UserCache:
+    """Bounded LRU cache whose entries expire after ``ttl`` seconds"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        user, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return user
+
+    def set(self, key, user):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = (user, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def evict_user(self, user_id):
+        for key in [key for key in self._entries if key[0] == user_id]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+user_cache = UserCache(
+    maxsize=getattr(settings, 'WS_USER_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'WS_USER_CACHE_TTL', 300),
+)
+
+
+class UserLoader:
+    """
+    Coalesces cache misses into batched ``id__in`` queries.
+
+    Handshakes that miss the cache while a query is in flight are collected
+    and resolved together by the next query instead of queueing one query
+    each on the database thread.
+    """
+
+    def __init__(self):
+        self._waiting = {}
+        self._task = None
+
+    async def load(self, user_id):
+        future = self._waiting.get(user_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._waiting[user_id] = future
+            if self._task is None:
+                self._task = loop.create_task(self._flush())
+        return await asyncio.shield(future)
+
+    async def _flush(self):
+        try:
+            # Let handshakes arriving in the same tick join the first batch
+            await asyncio.sleep(0)
+            while self._waiting:
+                waiting, self._waiting = self._waiting, {}
+                try:
+                    users = await load_users(list(waiting))
+                except Exception as e:
+                    for future in waiting.values():
+                        future.set_exception(e)
+                else:
+                    for user_id, future in waiting.items():
+                        future.set_result(users.get(user_id))
+        finally:
+            self._task = None
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def evict_cached_user(sender, instance, **kwargs):
+    user_cache.evict_user(instance.pk)
+
+
+def get_token_from_scope(scope):
+    """Return the raw JWT from the query string or Authorization header"""
+    query = parse_qs(scope.get('query_string', b'').decode())
+    token = query.get('token', [None])[0]
+    if token:
+        return token
+
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            auth_type, _, credentials = value.decode().partition(' ')
+            if auth_type.lower() == 'bearer' and credentials:
+                return credentials.strip()
+    return None
+
+
+@database_sync_to_async
+def load_users(user_ids):
+    return User.objects.filter(is_active=True).in_bulk(user_ids)
+
+
+user_loader = UserLoader()
+
+
+async def get_user_for_token(raw_token):
+    """Validate an access token and resolve its user, or return ``AnonymousUser``"""
+    if not raw_token:
+        return AnonymousUser()
+
+    try:
+        token = AccessToken(raw_token)
+    except TokenError:
+        return AnonymousUser()
+
+    try:
+        user_id = User._meta.pk.to_python(token[api_settings.USER_ID_CLAIM])
+    except (KeyError, ValidationError):
+        return AnonymousUser()
+
+    version = token.get('token_version')
+    key = (user_id, version)
+
+    user = user_cache.get(key)
+    if user is None:
+        user = await user_loader.load(user_id)
+
+        # Tokens issued before a password change or deactivation are refused
+        if user is None or (version is not None and version != user.token_version):
+            return AnonymousUser()
+        user_cache.set(key, user)
+
+    return user
+
+
+class JWTAuthMiddleware:
+    """ASGI middleware that populates ``scope['user']`` from a JWT access token"""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        scope['user'] = await get_user_for_token(get_token_from_scope(scope))
+        return await self.inner(scope, receive, send)
+
+
+def JWTAuthMiddlewareStack(inner):
+    return JWTAuthMiddleware(inner)
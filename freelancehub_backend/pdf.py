@@ -0,0 +1,161 @@
+"""
+Declarative PDF layouts shared by contract, invoice and dispute documents.
+
+A layout is a list of blocks built with the helpers below::
+
+    render([
+        title("INVOICE"),
+        table([['Invoice #:', '42'], ['Amount:', '$90.00']], [2, 4], style='fields'),
+        spacer(20),
+        heading("NOTES"),
+        text(notes),
+        footer("Generated on ..."),
+    ])
+
+Fonts, paragraph styles and table styles are built once per process on first
+use, so a render only lays out its blocks. Text is escaped before it reaches
+reportlab's markup parser. Nothing here touches Django, so documents can be
+rendered in worker processes.
+"""
+from functools import lru_cache
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+# Try to import reportlab, but handle gracefully if not installed
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.units import inch
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+    REPORTLAB_AVAILABLE = True
+except ImportError:
+    REPORTLAB_AVAILABLE = False
+
+FONTS = ('Helvetica', 'Helvetica-Bold')
+
+
+def title(value):
+    return ('title', value)
+
+
+def heading(value):
+    return ('heading', value)
+
+
+def text(value):
+    return ('text', value)
+
+
+def spacer(height):
+    return ('spacer', height)
+
+
+def table(rows, col_widths, style='grid', wrap=(), repeat_header=False):
+    """
+    A table; ``col_widths`` are in inches, ``wrap`` lists body columns that
+    wrap as paragraphs and ``style`` is one of ``TABLE_STYLES``
+    """
+    return ('table', rows, col_widths, style, tuple(wrap), repeat_header)
+
+
+def footer(*lines):
+    return ('footer', lines)
+
+
+def _grid(header_background, font_size, align='CENTER'):
+    return [
+        ('BACKGROUND', (0, 0), (-1, 0), header_background),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), align),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), font_size),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]
+
+
+@lru_cache(maxsize=None)
+def styles():
+    """Paragraph and table styles, built on first use and kept for the process"""
+    # Load font metrics now rather than on the first string measured
+    for font in FONTS:
+        pdfmetrics.getFont(font)
+
+    sample = getSampleStyleSheet()
+    paragraph = {
+        'title': ParagraphStyle(
+            'DocumentTitle', parent=sample['Heading1'], fontSize=24, spaceAfter=30,
+            alignment=TA_CENTER, textColor=colors.darkblue
+        ),
+        'heading': sample['Heading2'],
+        'text': sample['Normal'],
+        'footer': ParagraphStyle(
+            'Footer', parent=sample['Normal'], fontSize=8, alignment=TA_CENTER, textColor=colors.grey
+        ),
+    }
+    tables = {
+        # Label column on the left, values on the right
+        'fields': TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ]),
+        'grid': TableStyle(_grid(colors.lightgrey, 11)),
+        'parties': TableStyle(_grid(colors.lightblue, 11)),
+        # Line items: compact rows that may run over several pages
+        'list': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ]),
+    }
+    return paragraph, tables
+
+
+def _paragraph(value, style):
+    return Paragraph(escape(str(value)).replace('\n', '<br/>'), style)
+
+
+def _flowables(block, paragraph, tables):
+    kind = block[0]
+    if kind in ('title', 'heading', 'text'):
+        return [_paragraph(block[1], paragraph[kind])]
+    if kind == 'spacer':
+        return [Spacer(1, block[1])]
+    if kind == 'footer':
+        return [_paragraph(line, paragraph['footer']) for line in block[1]]
+    if kind == 'table':
+        rows, col_widths, style, wrap, repeat_header = block[1:]
+        if wrap:
+            rows = [rows[0]] + [
+                [_paragraph(cell, paragraph['text']) if i in wrap else cell for i, cell in enumerate(row)]
+                for row in rows[1:]
+            ]
+        return [Table(
+            rows, colWidths=[width * inch for width in col_widths],
+            style=tables[style], repeatRows=1 if repeat_header else 0
+        )]
+    raise ValueError(f"Unknown PDF block {kind!r}")
+
+
+def render(blocks, pagesize=None):
+    """Lay out ``blocks`` and return the PDF bytes"""
+    paragraph, tables = styles()
+    story = []
+    for block in blocks:
+        story.extend(_flowables(block, paragraph, tables))
+
+    buffer = BytesIO()
+    SimpleDocTemplate(buffer, pagesize=pagesize or A4).build(story)
+    return buffer.getvalue()
@@ -51,6 +51,7 @@ INSTALLED_APPS = [
     'reviews.apps.ReviewsConfig',
     'notifications',
     'disputes',
+    'blobstore.apps.BlobstoreConfig',
     # 'rest_framework_simplejwt.token_blacklist'
 ]
 
@@ -139,6 +140,12 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Hash uploads while they are parsed so blobstore can skip files it already has
+FILE_UPLOAD_HANDLERS = [
+    'blobstore.uploadhandler.HashingMemoryFileUploadHandler',
+    'blobstore.uploadhandler.HashingTemporaryFileUploadHandler',
+]
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -149,7 +156,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 REST_FRAMEWORK = {
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.VersionedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
@@ -186,6 +193,17 @@ CHANNEL_LAYERS = {
     # }
 }
 
+# Shared by every web worker and the outbox dispatcher, so stats, job state and
+# invalidations are seen by all processes. Each cache call is a database query.
+# `migrate` does not create the table: run `python manage.py createcachetable`
+# on every deploy. See PRODUCTION_SCALING.md.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'freelancehub_cache',
+    },
+}
+
 # # DJOSER SETTINGS
 # DJOSER = {
 #     'LOGIN_FIELD': 'email',
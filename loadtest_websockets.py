@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+"""
+In-process WebSocket load test for the chat and notification consumers.
+
+Runs the real ASGI ``application`` (JWT middleware, routing, consumers) inside
+this process against a throwaway test database, opens many simulated clients
+spread over chat rooms and drives a configurable mix of messages, typing
+indicators and read receipts. Notification clients receive events pushed to
+their ``notifications_<user_id>`` group.
+
+Results are printed as JSON: connect latency, fan-out latency (send to
+delivery on every other participant), messages/sec and memory per connection.
+
+Usage:
+    python loadtest_websockets.py --clients 2000 --rooms 100 --duration 20
+    python loadtest_websockets.py --layer redis --redis-host 127.0.0.1
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'freelancehub_backend.settings')
+
+import django
+django.setup()
+
+from channels.layers import channel_layers, get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.db import connection
+from django.test.utils import setup_test_environment
+
+from chats.models import ChatRoom
+from users.email_auth import EmailTokenObtainPairSerializer
+from users.models import CustomUser
+
+MARKER = 'lt:'
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(len(values) * pct / 100.0)) - 1))
+    return round(values[index], 3)
+
+
+def summarize(values):
+    return {
+        'count': len(values),
+        'p50_ms': percentile(values, 50),
+        'p99_ms': percentile(values, 99),
+        'max_ms': round(max(values), 3) if values else None,
+        'mean_ms': round(statistics.fmean(values), 3) if values else None,
+    }
+
+
+class Stats:
+    def __init__(self):
+        self.connect_ms = []
+        self.fanout_ms = []
+        self.notification_ms = []
+        self.rejected = 0
+        self.errors = 0
+        self.sent = {'message': 0, 'typing': 0, 'mark_read': 0, 'notification': 0}
+        self.received = 0
+
+
+class SimClient:
+    """One simulated browser tab holding a single WebSocket"""
+
+    def __init__(self, application, path, user_id, stats):
+        self.communicator = WebsocketCommunicator(application, path)
+        self.user_id = user_id
+        self.stats = stats
+        self.connected = False
+        self.last_message_id = None
+
+    async def connect(self, timeout):
+        started = time.perf_counter()
+        try:
+            self.connected, _ = await self.communicator.connect(timeout=timeout)
+        except asyncio.TimeoutError:
+            self.connected = False
+        if self.connected:
+            self.stats.connect_ms.append((time.perf_counter() - started) * 1000)
+        else:
+            self.stats.rejected += 1
+
+    async def read_loop(self, stop):
+        # Read the output queue directly: WebsocketCommunicator.receive_from
+        # cancels the application when it times out.
+        while not stop.is_set():
+            try:
+                event = await asyncio.wait_for(self.communicator.output_queue.get(), 0.2)
+            except asyncio.TimeoutError:
+                continue
+            if event['type'] != 'websocket.send':
+                continue
+            self.stats.received += 1
+            self.handle(json.loads(event['text']))
+
+    def handle(self, data):
+        now = time.perf_counter()
+        if data.get('type') == 'chat_message':
+            message = data['message']
+            self.last_message_id = message.get('id')
+            content = message.get('content', '')
+            if content.startswith(MARKER) and message['sender']['id'] != self.user_id:
+                self.stats.fanout_ms.append((now - float(content[len(MARKER):])) * 1000)
+        elif data.get('type') == 'notification':
+            sent_at = data.get('message', {}).get('sent_at')
+            if sent_at:
+                self.stats.notification_ms.append((now - sent_at) * 1000)
+
+    async def drive(self, stop, rates):
+        """Send frames as a Poisson process mixing the configured actions"""
+        actions, weights = zip(*[(action, rate) for action, rate in rates.items() if rate > 0])
+        total_rate = sum(weights)
+        while not stop.is_set():
+            await asyncio.sleep(random.expovariate(total_rate))
+            if stop.is_set():
+                break
+            action = random.choices(actions, weights)[0]
+            if action == 'message':
+                frame = {'type': 'message', 'content': f'{MARKER}{time.perf_counter()}'}
+            elif action == 'typing':
+                frame = {'type': 'typing', 'is_typing': random.random() < 0.5}
+            elif self.last_message_id:
+                frame = {'type': 'mark_read', 'message_id': self.last_message_id}
+            else:
+                continue
+            await self.communicator.send_to(text_data=json.dumps(frame))
+            self.stats.sent[action] += 1
+
+    async def close(self):
+        if self.connected:
+            await self.communicator.disconnect(timeout=5)
+
+
+async def push_notifications(user_ids, stop, rate, stats):
+    """Emit notification events to random users like utils.send_notification_to_user"""
+    layer = get_channel_layer()
+    while not stop.is_set():
+        await asyncio.sleep(random.expovariate(rate))
+        await layer.group_send(f'notifications_{random.choice(user_ids)}', {
+            'type': 'notification_message',
+            'message': {'type': 'notification', 'sent_at': time.perf_counter()},
+        })
+        stats.sent['notification'] += 1
+
+
+def seed(args):
+    """Create users, rooms and access tokens in the test database"""
+    users = CustomUser.objects.bulk_create([
+        CustomUser(username=f'load{i}', email=f'load{i}@example.com', user_type='freelancer')
+        for i in range(args.clients)
+    ])
+    users = list(CustomUser.objects.filter(username__startswith='load').order_by('id'))
+    tokens = {
+        user.id: str(EmailTokenObtainPairSerializer.get_token(user).access_token)
+        for user in users
+    }
+
+    rooms = ChatRoom.objects.bulk_create([ChatRoom(is_group=True) for _ in range(args.rooms)])
+    rooms = list(ChatRoom.objects.order_by('id'))
+    Participant = ChatRoom.participants.through
+    Participant.objects.bulk_create([
+        Participant(chatroom_id=rooms[i % len(rooms)].id, customuser_id=user.id)
+        for i, user in enumerate(users)
+    ])
+    room_of = {user.id: rooms[i % len(rooms)].id for i, user in enumerate(users)}
+    return users, tokens, room_of
+
+
+async def run(args, users, tokens, room_of):
+    from freelancehub_backend.asgi import application
+
+    stats = Stats()
+    notification_count = int(len(users) * args.notification_share)
+    clients = []
+    for i, user in enumerate(users):
+        if i < notification_count:
+            path = f'/ws/notifications/?token={tokens[user.id]}'
+        else:
+            path = f'/ws/chat/{room_of[user.id]}/?token={tokens[user.id]}'
+        clients.append(SimClient(application, path, user.id, stats))
+    chat_clients = clients[notification_count:]
+
+    # Connect phase: ramp up in batches, measuring memory held per connection
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+    for i in range(0, len(clients), args.ramp_batch):
+        await asyncio.gather(*(c.connect(args.connect_timeout) for c in clients[i:i + args.ramp_batch]))
+    connect_elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    connected = [c for c in clients if c.connected]
+
+    # Traffic phase
+    stop = asyncio.Event()
+    rates = {'message': args.send_rate, 'typing': args.typing_rate, 'mark_read': args.read_rate}
+    tasks = [asyncio.ensure_future(c.read_loop(stop)) for c in connected]
+    tasks += [asyncio.ensure_future(c.drive(stop, rates)) for c in chat_clients if c.connected]
+    if notification_count and args.notification_rate > 0:
+        tasks.append(asyncio.ensure_future(push_notifications(
+            [c.user_id for c in clients[:notification_count] if c.connected],
+            stop, args.notification_rate, stats
+        )))
+
+    received_before = stats.received
+    started = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    stop.set()
+    # Let in-flight frames drain before counting
+    await asyncio.sleep(args.drain)
+    elapsed = time.perf_counter() - started
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    stats.errors += sum(1 for result in results if isinstance(result, Exception))
+
+    await asyncio.gather(*(c.close() for c in connected), return_exceptions=True)
+
+    return {
+        'config': {
+            'clients': len(clients),
+            'rooms': args.rooms,
+            'notification_clients': notification_count,
+            'duration_s': args.duration,
+            'layer': args.layer,
+            'rates_per_client_per_s': rates,
+            'notification_rate_per_s': args.notification_rate,
+        },
+        'connections': {
+            'connected': len(connected),
+            'rejected': stats.rejected,
+            'connects_per_sec': round(len(clients) / connect_elapsed, 1),
+            'latency': summarize(stats.connect_ms),
+            'memory_per_connection_kb': round((current - baseline) / max(1, len(connected)) / 1024, 2),
+            'peak_memory_mb': round(peak / 1024 / 1024, 2),
+        },
+        'traffic': {
+            'sent': stats.sent,
+            'frames_received': stats.received - received_before,
+            'messages_sent_per_sec': round(stats.sent['message'] / args.duration, 1),
+            'frames_delivered_per_sec': round((stats.received - received_before) / elapsed, 1),
+            'fanout': summarize(stats.fanout_ms),
+            'notification_delivery': summarize(stats.notification_ms),
+            'errors': stats.errors,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--rooms', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10, help='Traffic phase length in seconds')
+    parser.add_argument('--drain', type=float, default=2, help='Seconds to wait for in-flight frames')
+    parser.add_argument('--send-rate', type=float, default=0.2, help='Messages per chat client per second')
+    parser.add_argument('--typing-rate', type=float, default=0.5, help='Typing frames per chat client per second')
+    parser.add_argument('--read-rate', type=float, default=0.2, help='Read receipts per chat client per second')
+    parser.add_argument('--notification-share', type=float, default=0.1,
+                        help='Fraction of clients connecting to the notifications socket')
+    parser.add_argument('--notification-rate', type=float, default=50,
+                        help='Notification events pushed per second in total')
+    parser.add_argument('--ramp-batch', type=int, default=200, help='Clients connecting concurrently')
+    parser.add_argument('--connect-timeout', type=float, default=30)
+    parser.add_argument('--layer', choices=['memory', 'redis'], default='memory')
+    parser.add_argument('--redis-host', default='127.0.0.1')
+    parser.add_argument('--redis-port', type=int, default=6379)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Write the JSON report to this file as well')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    if args.layer == 'memory':
+        settings.CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+    else:
+        settings.CHANNEL_LAYERS = {'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [(args.redis_host, args.redis_port)]},
+        }}
+    channel_layers.backends = {}
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        users, tokens, room_of = seed(args)
+        report = asyncio.run(run(args, users, tokens, room_of))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+
+
+if __name__ == '__main__':
+    main()
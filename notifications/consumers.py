@@ -1,11 +1,21 @@
 import json
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 import logging
 
+from .models import Notification, NotificationCounter
+from .serializers import NotificationSerializer
+
 logger = logging.getLogger(__name__)
 
+# Missed notifications sent per frame, and at most per replay before the
+# client is told to fall back to the REST list
+REPLAY_BATCH_SIZE = getattr(settings, 'NOTIFICATION_REPLAY_BATCH_SIZE', 100)
+REPLAY_LIMIT = getattr(settings, 'NOTIFICATION_REPLAY_LIMIT', 1000)
+
 class NotificationsConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         """
@@ -20,8 +30,9 @@ class NotificationsConsumer(AsyncWebsocketConsumer):
         self.user = self.scope['user']
         self.user_id = self.user.id
         self.group_name = f'notifications_{self.user_id}'
+        self.replayed_ids = set()
         
-        # Join notification group
+        # Join notification group before replaying so nothing created meanwhile is missed
         await self.channel_layer.group_add(
             self.group_name,
             self.channel_name
@@ -30,6 +41,10 @@ class NotificationsConsumer(AsyncWebsocketConsumer):
         logger.info(f"User {self.user.username} connected to notifications")
         await self.accept()
 
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        if 'last_seen_id' in query:
+            await self.sync(query['last_seen_id'][0])
+
     async def disconnect(self, close_code):
         """
         Handle WebSocket disconnection
@@ -55,6 +70,8 @@ class NotificationsConsumer(AsyncWebsocketConsumer):
                     'type': 'pong',
                     'timestamp': data.get('timestamp')
                 }))
+            elif message_type == 'sync':
+                await self.sync(data.get('last_seen_id'))
             else:
                 logger.warning(f"Unknown message type: {message_type}")
                 
@@ -67,12 +84,96 @@ class NotificationsConsumer(AsyncWebsocketConsumer):
         """
         await self.send(text_data=json.dumps(event['notification']))
 
+    async def sync(self, last_seen_id):
+        """
+        Replay notifications with an id above ``last_seen_id`` in batches
+
+        Live events are dispatched to this consumer only after the replay
+        returns, so they queue up meanwhile; any of them for a notification
+        already replayed is dropped in notification_message.
+        """
+        try:
+            cursor = int(last_seen_id)
+        except (TypeError, ValueError):
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': 'Invalid last_seen_id'
+            }))
+            return
+
+        self.replayed_ids = set()
+        while len(self.replayed_ids) < REPLAY_LIMIT:
+            limit = min(REPLAY_BATCH_SIZE, REPLAY_LIMIT - len(self.replayed_ids))
+            batch = await self.get_notifications_after(cursor, limit)
+            if not batch:
+                break
+            await self.send(text_data=json.dumps({
+                'type': 'notification_batch',
+                'notifications': batch
+            }))
+            self.replayed_ids.update(notification['id'] for notification in batch)
+            cursor = batch[-1]['id']
+            if len(batch) < limit:
+                break
+
+        truncated = len(self.replayed_ids) >= REPLAY_LIMIT and await self.has_notifications_after(cursor)
+        await self.send(text_data=json.dumps({
+            'type': 'sync_complete',
+            'last_id': cursor,
+            'truncated': truncated,
+            'unread_count': await self.get_unread_count()
+        }))
+
+    @database_sync_to_async
+    def get_notifications_after(self, cursor, limit):
+        notifications = (
+            Notification.objects.filter(user_id=self.user_id, id__gt=cursor)
+            .with_targets()
+            .order_by('id')[:limit]
+        )
+        return NotificationSerializer(notifications, many=True).data
+
+    @database_sync_to_async
+    def has_notifications_after(self, cursor):
+        return Notification.objects.filter(user_id=self.user_id, id__gt=cursor).exists()
+
+    @database_sync_to_async
+    def get_unread_count(self):
+        return NotificationCounter.get_unread(self.user_id)
+
     async def notification_message(self, event):
         """
         Handle notification messages from channel layer
         """
+        if self.replayed_ids and new_notification_id(event['message']) in self.replayed_ids:
+            return
         await self.send(text_data=json.dumps({
             'type': 'notification',
             'message': event['message']
         }))
 
+    async def notification_bundle(self, event):
+        """
+        Handle several low-priority notifications delivered as one frame
+        """
+        messages = [
+            message for message in event['messages']
+            if not (self.replayed_ids and new_notification_id(message) in self.replayed_ids)
+        ]
+        if messages:
+            await self.send(text_data=json.dumps({
+                'type': 'notification_bundle',
+                'messages': messages
+            }))
+
+
+def new_notification_id(message):
+    """Return the id carried by a new-notification event, or None for other events"""
+    if not isinstance(message, dict):
+        return None
+    if message.get('type') == 'notification':
+        return message.get('data', {}).get('id')
+    if 'type' not in message:
+        # NotificationViewSet.perform_create sends the notification fields directly
+        return message.get('id')
+    return None
@@ -0,0 +1,44 @@
+import asyncio
+import signal
+
+from django.core.management.base import BaseCommand
+
+from notifications.outbox import OUTBOX_BATCH_SIZE, OUTBOX_POLL_INTERVAL, dispatch_batch, run_dispatcher
+
+
+class Command(BaseCommand):
+    help = "Deliver queued real-time notification events to the channel layer"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=OUTBOX_BATCH_SIZE, help='Events fetched per query')
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=OUTBOX_POLL_INTERVAL,
+            help='Seconds to wait when the outbox is empty'
+        )
+        parser.add_argument('--once', action='store_true', help='Drain the events that are due and exit')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            total = asyncio.run(self.drain(options['batch_size']))
+            self.stdout.write(self.style.SUCCESS(f"Processed {total} events"))
+            return
+
+        self.stdout.write("Dispatching notification events, press Ctrl+C to stop")
+        asyncio.run(self.run(options['batch_size'], options['poll_interval']))
+
+    async def drain(self, batch_size):
+        total = 0
+        while True:
+            fetched = await dispatch_batch(batch_size=batch_size)
+            total += fetched
+            if fetched < batch_size:
+                return total
+
+    async def run(self, batch_size, poll_interval):
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await run_dispatcher(stop, batch_size, poll_interval)
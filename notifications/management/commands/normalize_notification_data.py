@@ -0,0 +1,63 @@
+import ast
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from notifications.models import Notification
+
+
+def parse_legacy_data(raw):
+    """Parse a legacy ``data`` string: JSON, or the repr of a dict saved into the old TextField"""
+    for parse in (json.loads, ast.literal_eval):
+        try:
+            value = parse(raw)
+        except (ValueError, SyntaxError):
+            continue
+        if isinstance(value, dict):
+            return value
+    return {'legacy': raw}
+
+
+class Command(BaseCommand):
+    help = "Rewrite notification data stored as text into JSON objects"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows read per query')
+        parser.add_argument('--dry-run', action='store_true', help='Only report rows that would change')
+
+    def handle(self, *args, **options):
+        table = connection.ops.quote_name(Notification._meta.db_table)
+        last_id = 0
+        converted = 0
+
+        while True:
+            # Read the raw column: rows written through the old TextField hold
+            # Python reprs such as "{'project_id': 3}" that are not valid JSON
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT id, data FROM {table} WHERE id > %s ORDER BY id LIMIT %s',
+                    [last_id, options['batch_size']]
+                )
+                rows = cursor.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            for notification_id, raw in rows:
+                if isinstance(raw, str):
+                    try:
+                        if isinstance(json.loads(raw), dict):
+                            continue
+                    except ValueError:
+                        pass
+                elif isinstance(raw, dict):
+                    continue
+
+                converted += 1
+                if not options['dry_run']:
+                    data = parse_legacy_data(raw) if isinstance(raw, str) else {}
+                    Notification.objects.filter(id=notification_id).update(data=data)
+
+        verb = 'Would convert' if options['dry_run'] else 'Converted'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {converted} notifications"))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from notifications.retention import PURGE_BATCH_SIZE, PURGE_PAUSE, archive_root, purge_notifications
+
+
+class Command(BaseCommand):
+    help = "Delete read notifications older than their retention period in small batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE, help='Rows deleted per statement')
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=PURGE_PAUSE,
+            help='Seconds to sleep between batches'
+        )
+        parser.add_argument('--archive', action='store_true', help='Write rows to gzipped JSONL before deleting')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be removed')
+
+    def handle(self, *args, **options):
+        removed = purge_notifications(
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            archive=options['archive'],
+            dry_run=options['dry_run']
+        )
+
+        for days, count in removed.items():
+            self.stdout.write(f"Kept {days} days: {count} notifications")
+
+        verb = 'Would remove' if options['dry_run'] else 'Removed'
+        total = sum(removed.values())
+        suffix = f", archived to {archive_root()}" if options['archive'] and not options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(f"{verb} {total} read notifications{suffix}"))
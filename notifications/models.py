@@ -1,8 +1,61 @@
+from collections import Counter
+
+from django.apps import apps
 from django.db import models
+from django.db.models import F
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast, Greatest
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.contenttypes.prefetch import GenericPrefetch
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 from users.models import CustomUser
 
+# Keys of Notification.data copied into indexed generated columns, see related_to()
+INDEXED_DATA_KEYS = ('contract_id', 'project_id', 'payment_id')
+
+
+def data_key_field(key):
+    """
+    A stored column holding the integer id under ``key`` in ``data``
+
+    An expression index would not be matched on SQLite, which binds the JSON
+    path as a query parameter, so the value is materialized instead.
+    """
+    return models.GeneratedField(
+        expression=Cast(KT(f'data__{key}'), models.BigIntegerField()),
+        output_field=models.BigIntegerField(null=True),
+        db_persist=True
+    )
+
+
+def target_querysets():
+    """Querysets for prefetching notification targets along with what their __str__ reads"""
+    return [
+        apps.get_model('contracts', 'Contract').objects.select_related('project_proposal__project'),
+        apps.get_model('payments', 'Payment').objects.select_related('payer', 'recipient'),
+        apps.get_model('proposals', 'Proposal').objects.select_related('freelancer', 'job'),
+        apps.get_model('reviews', 'Review').objects.select_related('reviewer', 'reviewee'),
+    ]
+
+
+class NotificationQuerySet(models.QuerySet):
+    def related_to(self, **ids):
+        """Filter on ids stored in ``data``, e.g. ``related_to(contract_id=3)``"""
+        for key, value in ids.items():
+            if key not in INDEXED_DATA_KEYS:
+                raise ValueError(f"{key} is not an indexed data key")
+            self = self.filter(**{f'data_{key}': value})
+        return self
+
+    def with_targets(self):
+        """Load ``content_object`` for every row with one query per target type"""
+        return self.select_related('content_type').prefetch_related(
+            GenericPrefetch('content_object', target_querysets())
+        )
+
+
 class Notification(models.Model):
     NOTIFICATION_TYPES = [
         ('info', 'Info'),
@@ -34,11 +87,125 @@ class Notification(models.Model):
     read_at = models.DateTimeField(null=True, blank=True)
     action_text = models.CharField(max_length=100, null=True, blank=True)
     action_url = models.CharField(max_length=500, null=True, blank=True)
-    data = models.TextField(default='{}')  # JSON field for additional data
+    data = models.JSONField(default=dict, blank=True)
+    data_contract_id = data_key_field('contract_id')
+    data_project_id = data_key_field('project_id')
+    data_payment_id = data_key_field('payment_id')
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, null=True, blank=True)
     object_id = models.PositiveIntegerField(null=True, blank=True)
     content_object = GenericForeignKey('content_type', 'object_id')
+    # Number of events merged into this notification by create_or_coalesce_notification
+    coalesced_count = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = NotificationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='notif_user_created_idx'),
+            models.Index(fields=['user', 'is_read'], name='notif_user_read_idx'),
+            # Reconnect replay: user_id = ? AND id > ? ORDER BY id
+            models.Index(fields=['user', 'id'], name='notif_user_id_idx'),
+            models.Index(fields=['user', 'data_contract_id'], name='notif_user_contract_idx'),
+            models.Index(fields=['user', 'data_project_id'], name='notif_user_project_idx'),
+            models.Index(fields=['user', 'data_payment_id'], name='notif_user_payment_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user} - {self.notification_type}: {self.message[:20]}..."
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        # bulk_create skips save(), so bulk inserts adjust the counter themselves
+        if adding and not self.is_read:
+            NotificationCounter.adjust(self.user_id, 1)
+
+    def mark_read(self):
+        """Mark as read and update the unread counter, returning False if it already was"""
+        now = timezone.now()
+        updated = Notification.objects.filter(pk=self.pk, is_read=False).update(is_read=True, read_at=now)
+        self.is_read = True
+        if updated:
+            self.read_at = now
+            NotificationCounter.adjust(self.user_id, -1)
+        return bool(updated)
+
+
+class NotificationCounter(models.Model):
+    """
+    Denormalized unread notification count per user.
+
+    Rows are created lazily from a real count the first time a user's count is
+    read; until then adjustments are no-ops, so a missing row never drifts.
+    """
+    user = models.OneToOneField(
+        CustomUser,
+        primary_key=True,
+        related_name='notification_counter',
+        on_delete=models.CASCADE
+    )
+    unread_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user} - {self.unread_count} unread"
+
+    @classmethod
+    def adjust(cls, user_id, delta):
+        if delta:
+            cls.objects.filter(user_id=user_id).update(
+                unread_count=Greatest(F('unread_count') + delta, 0)
+            )
+
+    @classmethod
+    def increment_many(cls, user_ids):
+        """Add one per occurrence of each user id, one UPDATE per distinct delta"""
+        by_delta = {}
+        for user_id, delta in Counter(user_ids).items():
+            by_delta.setdefault(delta, []).append(user_id)
+        for delta, ids in by_delta.items():
+            cls.objects.filter(user_id__in=ids).update(unread_count=F('unread_count') + delta)
+
+    @classmethod
+    def get_unread(cls, user_id):
+        try:
+            return cls.objects.get(user_id=user_id).unread_count
+        except cls.DoesNotExist:
+            counter, _ = cls.objects.get_or_create(
+                user_id=user_id,
+                defaults={'unread_count': cls.count_unread(user_id)}
+            )
+            return counter.unread_count
+
+    @classmethod
+    def recount(cls, user_id):
+        """Rebuild the counter from the notifications table"""
+        count = cls.count_unread(user_id)
+        cls.objects.update_or_create(user_id=user_id, defaults={'unread_count': count})
+        return count
+
+    @staticmethod
+    def count_unread(user_id):
+        return Notification.objects.filter(user_id=user_id, is_read=False).count()
+
+
+class OutboxEvent(models.Model):
+    """A channel layer message waiting to be delivered by the outbox dispatcher"""
+    group_name = models.CharField(max_length=100)
+    message = models.JSONField(encoder=DjangoJSONEncoder)
+    priority = models.CharField(max_length=10, choices=Notification.PRIORITY_CHOICES, default='medium')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    # Set on digest events that later merges replace instead of queueing another frame
+    coalesce_key = models.CharField(max_length=100, blank=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['priority', 'next_attempt_at', 'id'], name='outbox_due_idx'),
+            models.Index(fields=['group_name'], name='outbox_group_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.group_name} - {self.message.get('type')} (attempt {self.attempts})"
@@ -0,0 +1,325 @@
+"""
+Transactional outbox for real-time notification events.
+
+Request handlers never talk to the channel layer. They record an
+``OutboxEvent`` in the same transaction as the data it describes, so a slow
+or unavailable Redis adds no latency to the request and nothing is delivered
+for work that was rolled back.
+
+The dispatcher (``manage.py dispatch_notifications``) drains due events in
+batches, sending different groups concurrently and each group's events of the
+same priority in order. Digest events for coalesced notifications are scheduled a few seconds
+out and replaced in place by later merges. Failed sends are retried with
+exponential backoff; while a group has an event waiting for a retry, its
+later events are held back so a client never sees them out of order. Run one
+dispatcher per database.
+
+Events carry their notification's priority. Each batch is shared between
+priorities by NOTIFICATION_PRIORITY_WEIGHTS, so urgent events are not stuck
+behind a flood of low-priority ones and low-priority events still get a
+share under sustained load. Within a group, higher priorities are sent first,
+so an urgent event may overtake older lower-priority events for the same
+recipient, and several low-priority events are bundled into one frame.
+Delivery latency per priority is published to the shared cache for
+``queue_stats()``.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import Notification, OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = getattr(settings, 'NOTIFICATION_OUTBOX_BATCH_SIZE', 500)
+OUTBOX_POLL_INTERVAL = getattr(settings, 'NOTIFICATION_OUTBOX_POLL_INTERVAL', 0.2)
+OUTBOX_MAX_ATTEMPTS = getattr(settings, 'NOTIFICATION_OUTBOX_MAX_ATTEMPTS', 8)
+# Retry delays double from the base up to the cap, in seconds
+OUTBOX_RETRY_BASE = getattr(settings, 'NOTIFICATION_OUTBOX_RETRY_BASE', 1)
+OUTBOX_RETRY_MAX = getattr(settings, 'NOTIFICATION_OUTBOX_RETRY_MAX', 300)
+SEND_CONCURRENCY = getattr(settings, 'NOTIFICATION_SEND_CONCURRENCY', 100)
+
+PRIORITY_WEIGHTS = getattr(settings, 'NOTIFICATION_PRIORITY_WEIGHTS', {
+    'urgent': 8,
+    'high': 4,
+    'medium': 2,
+    'low': 1,
+})
+# Highest first
+PRIORITIES = [priority for priority, _ in reversed(Notification.PRIORITY_CHOICES)]
+PRIORITY_RANK = {priority: rank for rank, priority in enumerate(PRIORITIES)}
+# Priorities whose events for one group are bundled into a single frame
+BUNDLED_PRIORITIES = {'low'}
+
+LATENCY_CACHE_KEY = 'notification_delivery_latency'
+LATENCY_SAMPLES = 1000
+
+
+def enqueue_event(group_name, message, priority='medium'):
+    """Record a channel layer message for delivery once the current transaction commits"""
+    return OutboxEvent.objects.create(group_name=group_name, message=message, priority=priority)
+
+
+def enqueue_events(events, priority='medium'):
+    """Record many ``(group_name, message)`` pairs with one INSERT per batch"""
+    return OutboxEvent.objects.bulk_create([
+        OutboxEvent(group_name=group_name, message=message, priority=priority)
+        for group_name, message in events
+    ])
+
+
+def enqueue_digest_event(group_name, message, coalesce_key, delay, priority='medium'):
+    """
+    Schedule ``message`` ``delay`` seconds out, or replace the message of the
+    digest already scheduled for ``coalesce_key`` so a burst sends one frame
+    """
+    now = timezone.now()
+    # Leave events about to fall due alone; the dispatcher may already hold them
+    replaced = OutboxEvent.objects.filter(
+        coalesce_key=coalesce_key,
+        attempts=0,
+        next_attempt_at__gt=now + timedelta(seconds=1)
+    ).update(message=message, priority=priority)
+    if not replaced:
+        OutboxEvent.objects.create(
+            group_name=group_name,
+            message=message,
+            priority=priority,
+            coalesce_key=coalesce_key,
+            next_attempt_at=now + timedelta(seconds=delay)
+        )
+
+
+def retry_delay(attempts):
+    delay = min(OUTBOX_RETRY_MAX, OUTBOX_RETRY_BASE * 2 ** (attempts - 1))
+    # Jitter so a recovering channel layer is not hit by every retry at once
+    return delay * random.uniform(0.5, 1)
+
+
+def priority_quotas(batch_size):
+    """Split a batch between priorities by weight, at least one slot each"""
+    total = sum(PRIORITY_WEIGHTS.get(priority, 1) for priority in PRIORITIES)
+    return {
+        priority: max(1, batch_size * PRIORITY_WEIGHTS.get(priority, 1) // total)
+        for priority in PRIORITIES
+    }
+
+
+@database_sync_to_async
+def fetch_due_events(batch_size):
+    """
+    Fetch up to ``batch_size`` due events by weighted fair share
+
+    Each priority first gets its weighted quota; capacity a priority leaves
+    unused goes to the others, highest first.
+    """
+    now = timezone.now()
+    # Groups with a failed event waiting for its retry; scheduled digests do not block
+    waiting = OutboxEvent.objects.filter(next_attempt_at__gt=now, attempts__gt=0).values('group_name')
+    due = OutboxEvent.objects.filter(next_attempt_at__lte=now).exclude(group_name__in=waiting)
+
+    quotas = priority_quotas(batch_size)
+    fetched = {
+        priority: list(due.filter(priority=priority).order_by('id')[:quota])
+        for priority, quota in quotas.items()
+    }
+
+    spare = batch_size - sum(len(events) for events in fetched.values())
+    for priority in PRIORITIES:
+        events = fetched[priority]
+        if spare <= 0:
+            break
+        if len(events) < quotas[priority]:
+            continue
+        more = list(due.filter(priority=priority, id__gt=events[-1].id).order_by('id')[:spare])
+        events.extend(more)
+        spare -= len(more)
+
+    return [event for priority in PRIORITIES for event in fetched[priority]]
+
+
+@database_sync_to_async
+def record_results(sent_ids, failed_groups):
+    """Delete delivered events and reschedule each failed group as a unit"""
+    if sent_ids:
+        OutboxEvent.objects.filter(id__in=sent_ids).delete()
+
+    now = timezone.now()
+    for events, error in failed_groups:
+        attempts = max(event.attempts for event in events) + 1
+        ids = [event.id for event in events]
+        OutboxEvent.objects.filter(id__in=ids).update(
+            attempts=F('attempts') + 1,
+            next_attempt_at=now + timedelta(seconds=retry_delay(attempts)),
+            last_error=error[:1000]
+        )
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            # The notification rows themselves are kept; clients see them on the next fetch
+            OutboxEvent.objects.filter(id__in=ids).delete()
+            logger.error(
+                f"Dropped {len(ids)} real-time events for {events[0].group_name} "
+                f"after {attempts} attempts: {error}"
+            )
+
+
+def group_frames(group_events):
+    """
+    Turn one group's events into ``(events, message)`` frames in send order
+
+    Higher priorities go first. Two or more bundled-priority
+    notification_message events become one notification_bundle frame.
+    """
+    group_events = sorted(group_events, key=lambda event: (PRIORITY_RANK[event.priority], event.id))
+    frames = []
+    bundle = []
+    for event in group_events:
+        if event.priority in BUNDLED_PRIORITIES and event.message.get('type') == 'notification_message':
+            bundle.append(event)
+        else:
+            frames.append(([event], event.message))
+
+    if len(bundle) == 1:
+        frames.append((bundle, bundle[0].message))
+    elif bundle:
+        frames.append((bundle, {
+            'type': 'notification_bundle',
+            'messages': [event.message['message'] for event in bundle]
+        }))
+    return frames
+
+
+class DeliveryStats:
+    """Recent send latency per priority, published to the cache for queue_stats()"""
+
+    def __init__(self, samples=LATENCY_SAMPLES):
+        self.latencies = {priority: deque(maxlen=samples) for priority in PRIORITIES}
+        self.delivered = {priority: 0 for priority in PRIORITIES}
+
+    def record(self, event, now):
+        # Digests are held back on purpose, so their wait is not queueing delay
+        if event.coalesce_key:
+            return
+        self.latencies[event.priority].append((now - event.created_at).total_seconds() * 1000)
+        self.delivered[event.priority] += 1
+
+    def summary(self):
+        summary = {}
+        for priority, values in self.latencies.items():
+            values = sorted(values)
+            summary[priority] = {
+                'delivered': self.delivered[priority],
+                'p50_ms': round(values[len(values) // 2], 1) if values else None,
+                'p99_ms': round(values[min(len(values) - 1, int(len(values) * 0.99))], 1) if values else None,
+            }
+        return summary
+
+    def publish(self):
+        cache.set(LATENCY_CACHE_KEY, self.summary(), timeout=300)
+
+
+async def dispatch_batch(channel_layer=None, batch_size=None, stats=None):
+    """Deliver one batch of due events and return how many were fetched"""
+    channel_layer = channel_layer or get_channel_layer()
+    events = await fetch_due_events(batch_size or OUTBOX_BATCH_SIZE)
+    if not events:
+        return 0
+
+    by_group = defaultdict(list)
+    for event in events:
+        by_group[event.group_name].append(event)
+
+    semaphore = asyncio.Semaphore(SEND_CONCURRENCY)
+    sent_ids = []
+    failed_groups = []
+
+    async def send_group(group_name, group_events):
+        async with semaphore:
+            frames = group_frames(group_events)
+            for index, (frame_events, message) in enumerate(frames):
+                try:
+                    await channel_layer.group_send(group_name, message)
+                except Exception as e:
+                    # Hold back the rest of the group so delivery order is kept
+                    held = [event for events, _ in frames[index:] for event in events]
+                    failed_groups.append((held, repr(e)))
+                    return
+                now = timezone.now()
+                for event in frame_events:
+                    sent_ids.append(event.id)
+                    if stats:
+                        stats.record(event, now)
+
+    # Groups holding urgent events start first and so take the semaphore first
+    ordered = sorted(
+        by_group.items(),
+        key=lambda item: min(PRIORITY_RANK[event.priority] for event in item[1])
+    )
+    await asyncio.gather(*(send_group(group_name, group_events) for group_name, group_events in ordered))
+    await record_results(sent_ids, failed_groups)
+
+    if failed_groups:
+        logger.warning(f"{sum(len(events) for events, _ in failed_groups)} real-time events will be retried")
+    return len(events)
+
+
+async def run_dispatcher(stop, batch_size=None, poll_interval=None, stats_interval=10):
+    """Drain the outbox until ``stop`` is set, polling when it is empty"""
+    batch_size = batch_size or OUTBOX_BATCH_SIZE
+    poll_interval = poll_interval or OUTBOX_POLL_INTERVAL
+    channel_layer = get_channel_layer()
+    stats = DeliveryStats()
+    published_at = time.monotonic()
+
+    while not stop.is_set():
+        try:
+            fetched = await dispatch_batch(channel_layer, batch_size, stats)
+        except Exception:
+            logger.exception("Outbox dispatch failed")
+            fetched = 0
+
+        if time.monotonic() - published_at >= stats_interval:
+            await database_sync_to_async(stats.publish)()
+            published_at = time.monotonic()
+
+        # A full batch means more is waiting; otherwise sleep until the next poll
+        if fetched < batch_size:
+            try:
+                await asyncio.wait_for(stop.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+def queue_stats():
+    """
+    Queue depth and oldest due event per priority, with the send latency the
+    dispatcher last published
+    """
+    now = timezone.now()
+    rows = (
+        OutboxEvent.objects.filter(next_attempt_at__lte=now)
+        .values('priority')
+        .annotate(depth=Count('id'), oldest=Min('created_at'))
+        .order_by()
+    )
+    by_priority = {row['priority']: row for row in rows}
+    latency = cache.get(LATENCY_CACHE_KEY) or {}
+
+    stats = {}
+    for priority in PRIORITIES:
+        row = by_priority.get(priority)
+        stats[priority] = {
+            'depth': row['depth'] if row else 0,
+            'oldest_age_seconds': round((now - row['oldest']).total_seconds(), 3) if row else None,
+            'latency': latency.get(priority),
+        }
+    return stats
@@ -0,0 +1,127 @@
+"""
+Retention policy for read notifications.
+
+NOTIFICATION_RETENTION maps ``(notification_type, priority)`` to the number
+of days a read notification is kept, with ``'*'`` matching anything; the most
+specific rule wins and ``None`` keeps rows forever. Unread notifications are
+never purged.
+
+Rows are removed in small id-ordered batches with a pause between them so a
+purge never holds the database long enough to stall live traffic (SQLite
+locks the whole file for the length of a write). Removed rows can first be
+written to gzipped JSONL files under NOTIFICATION_ARCHIVE_ROOT.
+"""
+import gzip
+import json
+import os
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Notification
+
+DEFAULT_RETENTION = {
+    ('*', '*'): 90,
+    ('*', 'high'): 180,
+    ('*', 'urgent'): 365,
+    ('payment', '*'): 365,
+    ('contract', '*'): 365,
+    ('info', 'low'): 30,
+    ('system', '*'): 30,
+}
+PURGE_BATCH_SIZE = 500
+# Seconds to sleep between batches, giving other writers a turn
+PURGE_PAUSE = 0.05
+
+ARCHIVE_FIELDS = [
+    'id', 'user_id', 'title', 'message', 'notification_type', 'priority', 'read_at',
+    'action_text', 'action_url', 'data', 'content_type_id', 'object_id', 'coalesced_count', 'created_at',
+]
+
+
+def retention_days(notification_type, priority, policy=None):
+    """Days to keep a read notification of this type and priority, or None to keep it"""
+    policy = policy if policy is not None else getattr(settings, 'NOTIFICATION_RETENTION', DEFAULT_RETENTION)
+    for key in ((notification_type, priority), (notification_type, '*'), ('*', priority), ('*', '*')):
+        if key in policy:
+            return policy[key]
+    return None
+
+
+def retention_groups(policy=None):
+    """Group every (type, priority) pair by its retention period as ``{days: Q}``"""
+    groups = {}
+    for notification_type, _ in Notification.NOTIFICATION_TYPES:
+        for priority, _ in Notification.PRIORITY_CHOICES:
+            days = retention_days(notification_type, priority, policy)
+            if days is None:
+                continue
+            condition = Q(notification_type=notification_type, priority=priority)
+            groups[days] = groups[days] | condition if days in groups else condition
+    return dict(sorted(groups.items()))
+
+
+def archive_root():
+    return Path(getattr(settings, 'NOTIFICATION_ARCHIVE_ROOT', Path(settings.BASE_DIR) / 'notification_archive'))
+
+
+def archive_batch(rows):
+    """Write rows to a gzipped JSONL file named after their id range"""
+    directory = archive_root() / timezone.now().strftime('%Y-%m-%d')
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"notifications-{rows[0]['id']}-{rows[-1]['id']}.jsonl.gz"
+    tmp_path = path.with_suffix('.tmp')
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def purge_notifications(policy=None, batch_size=PURGE_BATCH_SIZE, pause=PURGE_PAUSE,
+                        archive=False, dry_run=False, now=None):
+    """
+    Delete read notifications past their retention period
+
+    Returns ``{days: rows_removed}`` for each retention period in the policy.
+    """
+    now = now or timezone.now()
+    removed = {}
+    for days, condition in retention_groups(policy).items():
+        expired = Notification.objects.filter(
+            condition,
+            is_read=True,
+            created_at__lt=now - timedelta(days=days)
+        )
+        if dry_run:
+            removed[days] = expired.count()
+            continue
+
+        removed[days] = 0
+        last_id = 0
+        while True:
+            batch = expired.filter(id__gt=last_id).order_by('id')
+            if archive:
+                rows = list(batch.values(*ARCHIVE_FIELDS)[:batch_size])
+                ids = [row['id'] for row in rows]
+            else:
+                ids = list(batch.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+
+            if archive:
+                archive_batch(rows)
+            # Deleting by primary key keeps each statement short
+            removed[days] += Notification.objects.filter(id__in=ids).delete()[0]
+            last_id = ids[-1]
+
+            if len(ids) < batch_size:
+                break
+            time.sleep(pause)
+    return removed
@@ -9,8 +9,19 @@ class NotificationSerializer(serializers.ModelSerializer):
         required=False,
         allow_null=True
     )
+    target = serializers.SerializerMethodField()
+
     class Meta:
         model = Notification
-        fields = ['id', 'user', 'message', 'notification_type', 'is_read', 'content_type', 'object_id', 'created_at']
-        read_only_fields = ['id', 'user', 'created_at']
+        fields = ['id', 'user', 'message', 'notification_type', 'is_read', 'content_type', 'object_id', 'target', 'data', 'coalesced_count', 'created_at']
+        read_only_fields = ['id', 'user', 'coalesced_count', 'created_at']
 
+    def get_target(self, obj):
+        """Summary of the related object; use Notification.objects.with_targets() when listing"""
+        if obj.content_type_id is None or obj.content_object is None:
+            return None
+        return {
+            'type': obj.content_type.model,
+            'id': obj.object_id,
+            'label': str(obj.content_object),
+        }
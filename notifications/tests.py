@@ -1,3 +1,419 @@
-from django.test import TestCase
+import gzip
+import json
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from freelancehub_backend.asgi import application
+from freelancehub_backend.jwt_middleware import user_cache
+from users.email_auth import EmailTokenObtainPairSerializer
+from .models import Notification, NotificationCounter, OutboxEvent
+from .management.commands.normalize_notification_data import parse_legacy_data
+from .outbox import DeliveryStats, dispatch_batch, queue_stats
+from .retention import purge_notifications, retention_days
+from .utils import create_or_coalesce_notification, send_bulk_notification, send_notification_to_user
+
+User = get_user_model()
+
+
+class NotificationExportTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="exporter",
+            email="exporter@example.com",
+            password="testpass123"
+        )
+        other = User.objects.create_user(
+            username="other",
+            email="other@example.com",
+            password="testpass123"
+        )
+        self.notifications = [
+            Notification.objects.create(user=self.user, title=f"Title {i}", message=f"Message {i}")
+            for i in range(5)
+        ]
+        Notification.objects.create(user=other, title="Hidden", message="Not yours")
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def read_lines(self, response, compressed=False):
+        body = b"".join(response.streaming_content)
+        if compressed:
+            body = gzip.decompress(body)
+        return [json.loads(line) for line in body.splitlines()]
+
+    def test_export_streams_user_notifications(self):
+        """Test that export returns only the user's notifications in id order"""
+        response = self.client.get("/api/notifications/export/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = self.read_lines(response)
+        self.assertEqual([line["id"] for line in lines], [n.id for n in self.notifications])
+
+    def test_export_resume_and_gzip(self):
+        """Test resuming from an id with a gzipped body"""
+        after_id = self.notifications[2].id
+        response = self.client.get("/api/notifications/export/", {"after_id": after_id, "gzip": "true"})
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        lines = self.read_lines(response, compressed=True)
+        self.assertEqual([line["id"] for line in lines], [n.id for n in self.notifications[3:]])
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class NotificationsSocketAuthTestCase(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="socket",
+            email="socket@example.com",
+            password="testpass123"
+        )
+        user_cache.clear()
+
+    async def connect(self, token):
+        communicator = WebsocketCommunicator(application, f"/ws/notifications/?token={token}")
+        connected, _ = await communicator.connect()
+        await communicator.disconnect()
+        return connected
+
+    def test_valid_token_populates_user(self):
+        """Test that a valid access token authenticates the socket"""
+        token = str(EmailTokenObtainPairSerializer.get_token(self.user).access_token)
+        self.assertTrue(async_to_sync(self.connect)(token))
+        self.assertEqual(len(user_cache), 1)
+
+    def test_invalid_token_rejected(self):
+        """Test that a malformed token is rejected"""
+        self.assertFalse(async_to_sync(self.connect)("not-a-token"))
+
+    def test_password_change_revokes_token(self):
+        """Test that tokens issued before a password change are refused"""
+        token = str(EmailTokenObtainPairSerializer.get_token(self.user).access_token)
+        self.user.set_password("newpass456")
+        self.user.save()
+        self.assertFalse(async_to_sync(self.connect)(token))
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class BulkNotificationTestCase(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                username=f"bulk{i}",
+                email=f"bulk{i}@example.com",
+                password="testpass123"
+            )
+            for i in range(3)
+        ]
+
+    def test_bulk_notification_creates_and_sends(self):
+        """Test that bulk sends skip unknown users and reach every group"""
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(f"notifications_{self.users[1].id}", channel)
+
+        user_ids = [user.id for user in self.users] + [self.users[0].id, 999999]
+        notifications = send_bulk_notification(user_ids, title="Maintenance", message="Tonight")
+
+        self.assertEqual([n.user_id for n in notifications], [user.id for user in self.users])
+        self.assertEqual(Notification.objects.filter(title="Maintenance").count(), 3)
+        self.assertEqual(OutboxEvent.objects.count(), 3)
+
+        self.assertEqual(async_to_sync(dispatch_batch)(), 3)
+        event = async_to_sync(channel_layer.receive)(channel)
+        self.assertEqual(event["message"]["data"]["id"], notifications[1].id)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_failed_group_is_retried_in_order(self):
+        """Test that a failed send reschedules the group and holds back its later events"""
+        send_notification_to_user(self.users[0].id, {"seq": 1})
+        send_notification_to_user(self.users[0].id, {"seq": 2})
+        send_notification_to_user(self.users[1].id, {"seq": 3})
+
+        channel_layer = get_channel_layer()
+        original = channel_layer.group_send
+
+        async def flaky_group_send(group, message):
+            if message["message"]["seq"] == 1:
+                raise ConnectionError("channel layer down")
+            await original(group, message)
+
+        with mock.patch.object(channel_layer, "group_send", flaky_group_send):
+            async_to_sync(dispatch_batch)(channel_layer)
+
+        pending = list(OutboxEvent.objects.order_by("id"))
+        self.assertEqual([event.message["message"]["seq"] for event in pending], [1, 2])
+        self.assertTrue(all(event.attempts == 1 for event in pending))
+        # Nothing is due until the backoff expires
+        self.assertEqual(async_to_sync(dispatch_batch)(channel_layer), 0)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class NotificationPriorityTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [
+            User.objects.create_user(
+                username=f"priority{i}",
+                email=f"priority{i}@example.com",
+                password="testpass123"
+            )
+            for i in range(3)
+        ]
+
+    def test_urgent_events_skip_the_low_priority_backlog(self):
+        """Test weighted dequeueing, low-priority bundling and per-priority stats"""
+        for i in range(20):
+            send_notification_to_user(self.users[i % 2].id, {"seq": i}, priority="low")
+        send_notification_to_user(self.users[2].id, {"seq": "urgent"}, priority="urgent")
+        self.assertEqual(queue_stats()["low"]["depth"], 20)
+
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(f"notifications_{self.users[0].id}", channel)
+
+        stats = DeliveryStats()
+        async_to_sync(dispatch_batch)(channel_layer, 5, stats)
+        self.assertEqual(stats.delivered["urgent"], 1)
+        # The rest of the batch went to the low-priority backlog as one frame per user
+        self.assertEqual(stats.delivered["low"], 4)
+        event = async_to_sync(channel_layer.receive)(channel)
+        self.assertEqual(event["type"], "notification_bundle")
+        self.assertEqual([m["seq"] for m in event["messages"]], [0, 2])
+        self.assertEqual(queue_stats()["low"]["depth"], 16)
+
+        stats.publish()
+        self.assertEqual(queue_stats()["urgent"]["latency"]["delivered"], 1)
+
+
+class NotificationUnreadCounterTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="counter",
+            email="counter@example.com",
+            password="testpass123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def unread_count(self):
+        return self.client.get("/api/notifications/unread_count/").data["unread_count"]
+
+    def test_counter_follows_create_read_and_clear(self):
+        """Test that the counter tracks creation, reads, mark-all-read and clear"""
+        notifications = [
+            Notification.objects.create(user=self.user, title=f"N{i}", message="Hello")
+            for i in range(3)
+        ]
+        # The first read builds the counter from a real count
+        self.assertEqual(self.unread_count(), 3)
+
+        Notification.objects.create(user=self.user, title="N3", message="Hello")
+        send_bulk_notification([self.user.id], title="Bulk", message="Hello")
+        self.assertEqual(self.unread_count(), 5)
+
+        self.client.post(f"/api/notifications/{notifications[0].id}/read/")
+        self.client.post(f"/api/notifications/{notifications[0].id}/read/")
+        self.assertEqual(self.unread_count(), 4)
+
+        self.client.post("/api/notifications/mark_all_read/")
+        self.assertEqual(self.unread_count(), 0)
+
+        Notification.objects.create(user=self.user, title="N4", message="Hello")
+        self.client.post("/api/notifications/clear_all/")
+        self.assertEqual(self.unread_count(), 0)
+        self.assertEqual(NotificationCounter.recount(self.user.id), 0)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class NotificationCoalescingTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="popular",
+            email="popular@example.com",
+            password="testpass123"
+        )
+        self.other = User.objects.create_user(
+            username="subject",
+            email="subject@example.com",
+            password="testpass123"
+        )
+
+    def notify(self, obj, message="Update"):
+        return create_or_coalesce_notification(
+            user=self.user,
+            content_object=obj,
+            title="Burst",
+            message=message,
+            summary=lambda count: f"{count} updates"
+        )
+
+    def test_burst_merges_into_one_notification(self):
+        """Test that repeat events merge and later updates share one digest frame"""
+        first = self.notify(self.other)
+        for _ in range(3):
+            merged = self.notify(self.other)
+
+        self.assertEqual(merged.id, first.id)
+        notification = Notification.objects.get(user=self.user)
+        self.assertEqual(notification.coalesced_count, 4)
+        self.assertEqual(notification.message, "4 updates")
+        self.assertEqual(NotificationCounter.get_unread(self.user.id), 1)
+
+        # One immediate frame for the first event, one pending digest for the merges
+        events = list(OutboxEvent.objects.order_by("id"))
+        self.assertEqual(len(events), 2)
+        self.assertEqual(events[1].message["message"]["data"]["coalesced_count"], 4)
+        self.assertEqual(async_to_sync(dispatch_batch)(), 1)
+
+    def test_read_or_different_object_starts_new_notification(self):
+        """Test that read notifications and other objects are not merged into"""
+        first = self.notify(self.other)
+        first.mark_read()
+        self.assertNotEqual(self.notify(self.other).id, first.id)
+        self.notify(self.user)
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 3)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class NotificationReplayTestCase(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="replay",
+            email="replay@example.com",
+            password="testpass123"
+        )
+        self.notifications = [
+            Notification.objects.create(user=self.user, title=f"Missed {i}", message="While offline")
+            for i in range(3)
+        ]
+        self.token = str(EmailTokenObtainPairSerializer.get_token(self.user).access_token)
+        user_cache.clear()
+
+    async def replay(self, query, frame=None):
+        communicator = WebsocketCommunicator(application, f"/ws/notifications/?token={self.token}{query}")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        if frame:
+            await communicator.send_json_to(frame)
+        received = []
+        while not received or received[-1]["type"] != "sync_complete":
+            received.append(await communicator.receive_json_from())
+
+        # A live event for a notification that was already replayed is not repeated
+        await get_channel_layer().group_send(f"notifications_{self.user.id}", {
+            "type": "notification_message",
+            "message": {"type": "notification", "data": {"id": self.notifications[-1].id}},
+        })
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+        return received
+
+    def test_connect_replays_missed_notifications(self):
+        """Test that last_seen_id on connect streams only newer notifications"""
+        frames = async_to_sync(self.replay)(f"&last_seen_id={self.notifications[0].id}")
+        self.assertEqual(frames[0]["type"], "notification_batch")
+        self.assertEqual(
+            [n["id"] for n in frames[0]["notifications"]],
+            [n.id for n in self.notifications[1:]]
+        )
+        self.assertEqual(frames[-1]["last_id"], self.notifications[-1].id)
+        self.assertFalse(frames[-1]["truncated"])
+        self.assertEqual(frames[-1]["unread_count"], 3)
+
+    def test_sync_frame_replays_everything_after_zero(self):
+        """Test that a sync frame replays the full backlog"""
+        frames = async_to_sync(self.replay)("", {"type": "sync", "last_seen_id": 0})
+        self.assertEqual(len(frames[0]["notifications"]), 3)
+
+
+class NotificationTargetsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="targets",
+            email="targets@example.com",
+            password="testpass123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_notifications(self, count):
+        for i in range(count):
+            target = User.objects.create_user(username=f"target{count}-{i}", email=f"t{count}-{i}@example.com")
+            Notification.objects.create(
+                user=self.user,
+                title="Related",
+                message="Hello",
+                content_object=target,
+                data={'contract_id': i, 'note': 'extra'}
+            )
+
+    def test_list_loads_targets_in_constant_queries(self):
+        """Test that listing notifications does not query once per target"""
+        self.create_notifications(5)
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/notifications/")
+        self.create_notifications(20)
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/notifications/")
+        results = response.data["results"] if "results" in response.data else response.data
+        self.assertEqual(len(results), 12)
+        self.assertEqual(results[0]["target"]["type"], "customuser")
+
+    def test_filter_by_data_key(self):
+        """Test filtering on an indexed key inside data"""
+        self.create_notifications(3)
+        response = self.client.get("/api/notifications/", {"contract_id": 2})
+        results = response.data["results"] if "results" in response.data else response.data
+        self.assertEqual([n["data"]["contract_id"] for n in results], [2])
+        self.assertEqual(self.client.get("/api/notifications/", {"contract_id": "x"}).status_code, 400)
+
+    def test_parse_legacy_data(self):
+        """Test that text written by the old TextField is recovered as a dict"""
+        self.assertEqual(parse_legacy_data("{'project_id': 3}"), {'project_id': 3})
+        self.assertEqual(parse_legacy_data('{"a": 1}'), {'a': 1})
+        self.assertEqual(parse_legacy_data('oops'), {'legacy': 'oops'})
+
+
+class NotificationRetentionTestCase(TestCase):
+    policy = {('*', '*'): 90, ('*', 'urgent'): None, ('info', 'low'): 30}
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="retention",
+            email="retention@example.com",
+            password="testpass123"
+        )
+
+    def create(self, days_old, is_read=True, **fields):
+        notification = Notification.objects.create(user=self.user, title="Old", message="Old", is_read=is_read, **fields)
+        Notification.objects.filter(id=notification.id).update(created_at=timezone.now() - timedelta(days=days_old))
+        return notification
+
+    def test_purge_follows_policy_in_batches(self):
+        """Test that only read rows past their period are removed, batch by batch"""
+        expired = [self.create(100) for _ in range(5)]
+        low_info = self.create(40, priority='low')
+        kept = [
+            self.create(40),
+            self.create(100, is_read=False),
+            self.create(400, priority='urgent'),
+        ]
+
+        self.assertEqual(retention_days('info', 'low', self.policy), 30)
+        removed = purge_notifications(policy=self.policy, batch_size=2, pause=0)
+
+        self.assertEqual(removed, {30: 1, 90: 5})
+        remaining = set(Notification.objects.values_list('id', flat=True))
+        self.assertEqual(remaining, {n.id for n in kept})
+        self.assertNotIn(low_info.id, remaining)
+        self.assertFalse(set(n.id for n in expired) & remaining)
@@ -1,24 +1,36 @@
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-from .models import Notification
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+from .models import Notification, NotificationCounter
+from .outbox import enqueue_digest_event, enqueue_event, enqueue_events
 from .serializers import NotificationSerializer
 import json
 
+# Notifications inserted per bulk_create chunk
+BULK_CHUNK_SIZE = getattr(settings, 'NOTIFICATION_BULK_CHUNK_SIZE', 1000)
+# Seconds during which repeat events about the same object merge into one notification
+COALESCE_WINDOW = getattr(settings, 'NOTIFICATION_COALESCE_WINDOW', 600)
+# Seconds a merged update waits for more merges before it is sent to the socket
+DIGEST_DELAY = getattr(settings, 'NOTIFICATION_DIGEST_DELAY', 10)
 
-def send_notification_to_user(user_id, notification_data):
+
+def send_notification_to_user(user_id, notification_data, priority='medium'):
     """
-    Send a real-time notification to a specific user via WebSocket
+    Queue a real-time notification for a specific user's WebSocket
+
+    The event is delivered by the outbox dispatcher after the surrounding
+    transaction commits, ahead of queued events of lower ``priority``.
     """
-    channel_layer = get_channel_layer()
-    group_name = f'notifications_{user_id}'
-    
-    # Send via WebSocket
-    async_to_sync(channel_layer.group_send)(
-        group_name,
+    enqueue_event(
+        f'notifications_{user_id}',
         {
             'type': 'notification_message',
             'message': notification_data
-        }
+        },
+        priority=priority
     )
 
 
@@ -69,15 +81,13 @@ def create_and_send_notification(user, title, message, notification_type='info',
 
 def send_notification_to_group(group_name, notification_data):
     """
-    Send a notification to a group of users via WebSocket
+    Queue a notification for a group of users' WebSockets
     
     Args:
         group_name (str): The name of the group to send notification to
         notification_data (dict): The notification data to send
     """
-    channel_layer = get_channel_layer()
-    
-    async_to_sync(channel_layer.group_send)(
+    enqueue_event(
         group_name,
         {
             'type': 'notification_message', 
@@ -102,11 +112,13 @@ NOTIFICATION_TYPES = {
 # Quick notification functions for common use cases
 def notify_proposal_received(client_user, project, freelancer):
     """Send notification when a new proposal is received"""
-    return create_and_send_notification(
+    return create_or_coalesce_notification(
         user=client_user,
+        content_object=project,
         title="New Proposal Received",
         message=f"You received a new proposal from {freelancer.get_full_name() or freelancer.username} for '{project.title}'",
         notification_type='info',
+        summary=lambda count: f"You received {count} new proposals for '{project.title}'",
         data={
             'project_id': project.id,
             'freelancer_id': freelancer.id,
@@ -182,53 +194,138 @@ def create_and_send_notification(user, title='', message='', notification_type='
     if data is None:
         data = {}
     
-    # Create notification in database
-    notification = Notification.objects.create(
-        user=user,
-        title=title or 'New Notification',
-        message=message,
-        notification_type=notification_type,
-        priority=priority,
-        action_url=action_url,
-        action_text=action_text,
-        data=data,
-        content_object=content_object
-    )
-    
-    # Serialize notification data
-    serializer = NotificationSerializer(notification)
-    notification_data = {
-        'type': 'notification',
-        'data': serializer.data
-    }
-    
-    # Send via WebSocket
-    send_notification_to_user(user.id, notification_data)
+    with transaction.atomic():
+        # Create notification in database
+        notification = Notification.objects.create(
+            user=user,
+            title=title or 'New Notification',
+            message=message,
+            notification_type=notification_type,
+            priority=priority,
+            action_url=action_url,
+            action_text=action_text,
+            data=data,
+            content_object=content_object
+        )
+        
+        # Serialize notification data
+        serializer = NotificationSerializer(notification)
+        notification_data = {
+            'type': 'notification',
+            'data': serializer.data
+        }
+        
+        # Queue for WebSocket delivery alongside the row itself
+        send_notification_to_user(user.id, notification_data, priority=notification.priority)
     
     return notification
 
 
-def send_bulk_notification(user_ids, title='', message='', notification_type='info', priority='medium'):
+def create_or_coalesce_notification(user, content_object, title='', message='', notification_type='info',
+                                    summary=None, window=None, **kwargs):
     """
-    Send notifications to multiple users
+    Create a notification, or merge it into a recent one about the same object
+
+    Events are keyed by (user, notification_type, title, content_object); the
+    title tells apart different events about the same object. If the user has
+    an unread notification for that key created within ``window`` seconds it
+    is updated in place: ``coalesced_count`` goes up and the message becomes
+    ``summary(count)`` when given. The first event is sent straight away;
+    merged updates reach the socket as one digest frame per DIGEST_DELAY.
     """
-    notifications = []
-    
-    for user_id in user_ids:
-        from users.models import CustomUser
-        try:
-            user = CustomUser.objects.get(id=user_id)
-            notification = create_and_send_notification(
-                user=user, 
-                title=title, 
-                message=message, 
+    window = COALESCE_WINDOW if window is None else window
+    fields = dict(kwargs, title=title, message=message, notification_type=notification_type)
+    if window <= 0:
+        return create_and_send_notification(user, content_object=content_object, **fields)
+
+    with transaction.atomic():
+        existing = (
+            Notification.objects.select_for_update()
+            .filter(
+                user=user,
                 notification_type=notification_type,
+                title=title or 'New Notification',
+                content_type=ContentType.objects.get_for_model(content_object),
+                object_id=content_object.pk,
+                is_read=False,
+                created_at__gte=timezone.now() - timedelta(seconds=window)
+            )
+            .order_by('-id')
+            .first()
+        )
+        if existing is None:
+            return create_and_send_notification(user, content_object=content_object, **fields)
+
+        existing.coalesced_count += 1
+        existing.message = summary(existing.coalesced_count) if summary else message
+        update_fields = ['coalesced_count', 'message']
+        # The latest event's details win
+        for field in ('priority', 'action_url', 'action_text', 'data'):
+            if kwargs.get(field) is not None:
+                setattr(existing, field, kwargs[field])
+                update_fields.append(field)
+        existing.save(update_fields=update_fields)
+
+        enqueue_digest_event(
+            f'notifications_{user.id}',
+            {
+                'type': 'notification_message',
+                'message': {
+                    'type': 'notification_updated',
+                    'data': NotificationSerializer(existing).data
+                }
+            },
+            coalesce_key=f'notification:{existing.id}',
+            delay=DIGEST_DELAY,
+            priority=existing.priority
+        )
+    return existing
+
+
+def send_bulk_notification(user_ids, title='', message='', notification_type='info', priority='medium',
+                           data=None):
+    """
+    Send the same notification to many users
+
+    Users are resolved in one query, and notifications and their outbox events
+    are inserted with ``bulk_create`` in chunks. Unknown user ids are skipped.
+    """
+    from users.models import CustomUser
+
+    existing = set(CustomUser.objects.filter(id__in=user_ids).values_list('id', flat=True))
+    # Keep the caller's order and drop duplicates
+    recipient_ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id in existing]
+
+    notifications = []
+    for start in range(0, len(recipient_ids), BULK_CHUNK_SIZE):
+        with transaction.atomic():
+            chunk = Notification.objects.bulk_create([
+                Notification(
+                    user_id=user_id,
+                    title=title or 'New Notification',
+                    message=message,
+                    notification_type=notification_type,
+                    priority=priority,
+                    data=data or {}
+                )
+                for user_id in recipient_ids[start:start + BULK_CHUNK_SIZE]
+            ])
+            NotificationCounter.increment_many([notification.user_id for notification in chunk])
+            enqueue_events(
+                (
+                    (
+                        f'notifications_{notification.user_id}',
+                        {
+                            'type': 'notification_message',
+                            'message': {'type': 'notification', 'data': payload}
+                        }
+                    )
+                    for notification, payload in zip(chunk, NotificationSerializer(chunk, many=True).data)
+                ),
                 priority=priority
             )
-            notifications.append(notification)
-        except CustomUser.DoesNotExist:
-            continue
-    
+        notifications.extend(chunk)
+
     return notifications
 
 
@@ -340,11 +437,15 @@ def notify_contract_status_change(contract, old_status, new_status):
         is_client = user == contract.client
         other_party = contract.freelancer if is_client else contract.client
         
-        create_and_send_notification(
+        create_or_coalesce_notification(
             user=user,
             title=f"Contract Status Updated",
             message=f"Contract with {other_party.get_full_name() or other_party.username} status changed from {old_status} to {new_status}. {status_messages.get(new_status, '')}",
             notification_type='contract',
+            summary=lambda count: (
+                f"Contract with {other_party.get_full_name() or other_party.username} was updated "
+                f"{count} times and is now {new_status}. {status_messages.get(new_status, '')}"
+            ),
             priority='high' if new_status in ['cancelled', 'disputed'] else 'medium',
             action_url=f"/dashboard/contracts/{contract.id}",
             action_text="View Contract",
@@ -370,7 +471,7 @@ def notify_contract_deadline_approaching(contract, days_remaining):
         is_client = user == contract.client
         role = "client" if is_client else "freelancer"
         
-        create_and_send_notification(
+        create_or_coalesce_notification(
             user=user,
             title=f"Contract Deadline Approaching",
             message=f"Your contract deadline is in {days_remaining} day{'s' if days_remaining != 1 else ''}. Please ensure all deliverables are submitted on time.",
@@ -1,11 +1,16 @@
 from django.shortcuts import render
 from rest_framework import generics, permissions, viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .models import Notification
+from django.db import transaction
+from django.utils import timezone
+from .models import INDEXED_DATA_KEYS, Notification, NotificationCounter
 from .serializers import NotificationSerializer
+from .outbox import queue_stats
 from .utils import send_notification_to_user
+from freelancehub_backend.exports import iter_queryset_chunks, jsonl_response, parse_after_id
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,7 +20,20 @@ class NotificationViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user).order_by('-created_at')
+        queryset = Notification.objects.filter(user=self.request.user).with_targets()
+        
+        # Filter by related object ids stored in data, e.g. ?contract_id=3
+        related = {}
+        for key in INDEXED_DATA_KEYS:
+            value = self.request.query_params.get(key)
+            if value:
+                if not value.isdigit():
+                    raise ValidationError({'error': f'Invalid {key}'})
+                related[key] = int(value)
+        if related:
+            queryset = queryset.related_to(**related)
+        
+        return queryset.order_by('-created_at')
 
     def perform_create(self, serializer):
         notification = serializer.save(user=self.request.user)
@@ -31,19 +49,30 @@ class NotificationViewSet(viewsets.ModelViewSet):
                     'type': notification.notification_type,
                     'is_read': notification.is_read,
                     'created_at': notification.created_at.isoformat(),
-                }
+                },
+                priority=notification.priority
             )
             logger.info(f"Real-time notification sent to user {self.request.user.id}")
         except Exception as e:
             logger.error(f"Failed to send real-time notification: {e}")
 
+    def perform_update(self, serializer):
+        was_read = serializer.instance.is_read
+        notification = serializer.save()
+        if notification.is_read != was_read:
+            NotificationCounter.adjust(notification.user_id, -1 if notification.is_read else 1)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        if not instance.is_read:
+            NotificationCounter.adjust(instance.user_id, -1)
+
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def read(self, request, pk=None):
         """Mark a specific notification as read"""
         try:
             notification = self.get_object()
-            notification.is_read = True
-            notification.save()
+            notification.mark_read()
             
             # Send real-time update via WebSocket
             try:
@@ -66,10 +95,12 @@ class NotificationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def mark_all_read(self, request):
         """Mark all notifications as read for the current user"""
-        updated_count = Notification.objects.filter(
-            user=request.user, 
-            is_read=False
-        ).update(is_read=True)
+        with transaction.atomic():
+            updated_count = Notification.objects.filter(
+                user=request.user, 
+                is_read=False
+            ).update(is_read=True, read_at=timezone.now())
+            NotificationCounter.adjust(request.user.id, -updated_count)
         
         # Send real-time update via WebSocket
         try:
@@ -91,7 +122,12 @@ class NotificationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def clear_all(self, request):
         """Delete all notifications for the current user"""
-        deleted_count, _ = Notification.objects.filter(user=request.user).delete()
+        with transaction.atomic():
+            # Delete unread rows separately so the counter moves by exactly what was removed
+            unread_deleted, _ = Notification.objects.filter(user=request.user, is_read=False).delete()
+            read_deleted, _ = Notification.objects.filter(user=request.user).delete()
+            NotificationCounter.adjust(request.user.id, -unread_deleted)
+        deleted_count = unread_deleted + read_deleted
         
         # Send real-time update via WebSocket
         try:
@@ -113,8 +149,26 @@ class NotificationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def unread_count(self, request):
         """Get count of unread notifications"""
-        count = Notification.objects.filter(user=request.user, is_read=False).count()
-        return Response({'unread_count': count})
+        return Response({'unread_count': NotificationCounter.get_unread(request.user.id)})
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def queue_stats(self, request):
+        """Real-time delivery queue depth and latency per priority"""
+        return Response({'priorities': queue_stats()})
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def export(self, request):
+        """Stream the user's full notification history as JSONL"""
+        try:
+            after_id = parse_after_id(request)
+        except ValueError:
+            return Response({'error': 'Invalid after_id'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        def records():
+            for chunk in iter_queryset_chunks(self.get_queryset(), after_id):
+                yield from self.get_serializer(chunk, many=True).data
+        
+        return jsonl_response(request, records(), f'notifications-{request.user.id}')
 
 # Legacy views for backward compatibility
 class NotificationListCreateView(generics.ListCreateAPIView):
@@ -122,7 +176,7 @@ class NotificationListCreateView(generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user).order_by('-created_at')
+        return Notification.objects.filter(user=self.request.user).with_targets().order_by('-created_at')
 
     def perform_create(self, serializer):
         notification = serializer.save(user=self.request.user)
@@ -138,7 +192,8 @@ class NotificationListCreateView(generics.ListCreateAPIView):
                     'type': notification.notification_type,
                     'is_read': notification.is_read,
                     'created_at': notification.created_at.isoformat(),
-                }
+                },
+                priority=notification.priority
             )
         except Exception as e:
             logger.error(f"Failed to send real-time notification: {e}")
@@ -149,8 +204,7 @@ class NotificationMarkReadView(APIView):
     def post(self, request, pk):
         try:
             notification = Notification.objects.get(pk=pk, user=request.user)
-            notification.is_read = True
-            notification.save()
+            notification.mark_read()
             
             # Send real-time update via WebSocket
             try:
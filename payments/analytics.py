@@ -0,0 +1,133 @@
+"""
+Payment trends and type breakdown for the analytics dashboard.
+
+Trends come from one GROUP BY on the truncated ``processed_at`` and the
+breakdown from one GROUP BY on ``payment_type``. Each range, granularity and
+the breakdown are cached per user under their own key in the shared cache and
+dropped once that user's next payment save or delete commits;
+PAYMENT_ANALYTICS_CACHE_TIMEOUT only bounds how long the current period's
+bucket can lag behind the calendar.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import Payment, month_start
+
+CACHE_TIMEOUT = getattr(settings, 'PAYMENT_ANALYTICS_CACHE_TIMEOUT', 3600)
+RANGE_MONTHS = (3, 6, 12, 24)
+DEFAULT_RANGE_MONTHS = 6
+GRANULARITIES = ('month', 'week')
+
+
+def trends_cache_key(user_id, months, granularity):
+    return f'payment_analytics:{user_id}:trends:{months}:{granularity}'
+
+
+def breakdown_cache_key(user_id):
+    return f'payment_analytics:{user_id}:breakdown'
+
+
+def user_cache_keys(user_id):
+    """Every key dashboard_figures can set for the user"""
+    return [breakdown_cache_key(user_id)] + [
+        trends_cache_key(user_id, months, granularity)
+        for months in RANGE_MONTHS for granularity in GRANULARITIES
+    ]
+
+
+def completed_payments(user):
+    """The user's completed payments and the amount field that counts for them"""
+    if user.user_type == 'freelancer':
+        return Payment.objects.filter(recipient=user, status='completed'), 'net_amount'
+    return Payment.objects.filter(payer=user, status='completed'), 'amount'
+
+
+def range_start(months, granularity, now=None):
+    """Start of the oldest bucket in a range ending with the current month"""
+    start = month_start(now)
+    month_index = start.year * 12 + start.month - 1 - (months - 1)
+    start = start.replace(year=month_index // 12, month=month_index % 12 + 1)
+    if granularity == 'week':
+        start -= timedelta(days=start.weekday())
+    return start
+
+
+def iter_periods(start, now, granularity):
+    period = start
+    while period <= now:
+        yield period
+        if granularity == 'week':
+            period += timedelta(days=7)
+        else:
+            period = (period + timedelta(days=32)).replace(day=1)
+
+
+def trends(user, months=DEFAULT_RANGE_MONTHS, granularity='month'):
+    """Amount and count per month or week, oldest first, including empty periods"""
+    now = timezone.localtime()
+    start = range_start(months, granularity, now)
+    payments, amount_field = completed_payments(user)
+    trunc = TruncWeek if granularity == 'week' else TruncMonth
+
+    rows = payments.filter(processed_at__gte=start).annotate(
+        period=trunc('processed_at')
+    ).values('period').annotate(
+        amount=Sum(amount_field), count=Count('id')
+    ).order_by('period')
+    totals = {row['period'].date(): row for row in rows}
+
+    result = []
+    for period in iter_periods(start, now, granularity):
+        row = totals.get(period.date(), {})
+        if granularity == 'week':
+            entry = {'week': period.strftime('%Y-%m-%d'), 'label': f"Week of {period.strftime('%b %d, %Y')}"}
+        else:
+            entry = {'month': period.strftime('%Y-%m'), 'label': period.strftime('%B %Y')}
+        entry.update(amount=float(row.get('amount') or 0), count=row.get('count', 0))
+        result.append(entry)
+    return result
+
+
+def breakdown(user):
+    """Count and amount per payment type that has any completed payments"""
+    payments, amount_field = completed_payments(user)
+    labels = dict(Payment.PAYMENT_TYPE_CHOICES)
+    rows = payments.values('payment_type').annotate(
+        count=Count('id'), amount=Sum(amount_field)
+    ).order_by('payment_type')
+    return {
+        row['payment_type']: {
+            'label': labels.get(row['payment_type'], row['payment_type']),
+            'count': row['count'],
+            'amount': float(row['amount'] or 0),
+        }
+        for row in rows
+    }
+
+
+def dashboard_figures(user, months=DEFAULT_RANGE_MONTHS, granularity='month'):
+    """``(trends, breakdown)``, each from the cache when it holds them"""
+    trends_key = trends_cache_key(user.id, months, granularity)
+    breakdown_key = breakdown_cache_key(user.id)
+    cached = cache.get_many([trends_key, breakdown_key])
+    if trends_key not in cached:
+        cached[trends_key] = trends(user, months, granularity)
+        cache.set(trends_key, cached[trends_key], CACHE_TIMEOUT)
+    if breakdown_key not in cached:
+        cached[breakdown_key] = breakdown(user)
+        cache.set(breakdown_key, cached[breakdown_key], CACHE_TIMEOUT)
+    return cached[trends_key], cached[breakdown_key]
+
+
+def invalidate_for_payment(sender, instance, **kwargs):
+    """post_save/post_delete receiver for Payment"""
+    keys = [key for user_id in (instance.payer_id, instance.recipient_id) if user_id for key in user_cache_keys(user_id)]
+    # Payment.save runs in a transaction; drop the entries only once it commits so a
+    # reader cannot cache figures from before the change for the whole timeout
+    transaction.on_commit(lambda: cache.delete_many(keys))
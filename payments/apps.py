@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class PaymentsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "payments"
+
+    def ready(self):
+        from .analytics import invalidate_for_payment
+        from .models import Payment, remove_payment_analytics
+        post_delete.connect(remove_payment_analytics, sender=Payment, dispatch_uid='payment_analytics_delete')
+        post_save.connect(invalidate_for_payment, sender=Payment, dispatch_uid='payment_dashboard_cache_save')
+        post_delete.connect(invalidate_for_payment, sender=Payment, dispatch_uid='payment_dashboard_cache_delete')
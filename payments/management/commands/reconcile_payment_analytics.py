@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from payments.models import PaymentAnalytics, month_start
+
+
+class Command(BaseCommand):
+    help = "Recompute PaymentAnalytics totals from payments and fix rows that drifted"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Analytics rows checked per transaction')
+        parser.add_argument('--user', type=int, help='Only reconcile this user')
+        parser.add_argument('--dry-run', action='store_true', help='Only report rows that would change')
+
+    def handle(self, *args, **options):
+        fields = PaymentAnalytics.TOTAL_FIELDS
+        rows = PaymentAnalytics.objects.order_by('user_id')
+        if options['user']:
+            rows = rows.filter(user_id=options['user'])
+
+        last_user_id = 0
+        checked = fixed = 0
+        while True:
+            # Lock the batch so payment deltas wait and land on top of the recomputed totals
+            with transaction.atomic():
+                batch = list(
+                    rows.select_for_update().filter(user_id__gt=last_user_id)[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                last_user_id = batch[-1].user_id
+
+                now = timezone.now()
+                totals = PaymentAnalytics.payment_totals([row.user_id for row in batch], now)
+                drifted = []
+                for row in batch:
+                    expected = totals[row.user_id]
+                    if row.month_start != month_start(now) or any(getattr(row, f) != expected[f] for f in fields):
+                        for field in fields:
+                            setattr(row, field, expected[field])
+                        row.month_start = month_start(now)
+                        row.last_updated = now
+                        drifted.append(row)
+
+                if drifted and not options['dry_run']:
+                    PaymentAnalytics.objects.bulk_update(drifted, [*fields, 'month_start', 'last_updated'])
+            checked += len(batch)
+            fixed += len(drifted)
+
+        verb = 'Would fix' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {fixed} of {checked} payment analytics rows"))
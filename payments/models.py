@@ -1,10 +1,43 @@
-from django.db import models
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import models, transaction
 from django.conf import settings
+from django.db.models import Case, Exists, F, OuterRef, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
 from contracts.models import Contract
-from projects.models import Project
+from projects.models import Project, ProjectProposal
 from django.utils import timezone
 from datetime import datetime, timedelta
 
+# Payment fields that decide what a payment adds to PaymentAnalytics
+ANALYTICS_FIELDS = ('payer_id', 'recipient_id', 'status', 'amount', 'net_amount', 'processed_at')
+
+
+def month_start(now=None):
+    now = now or timezone.now()
+    return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def analytics_contributions(values, now=None):
+    """
+    What one payment adds to each party's PaymentAnalytics, as
+    ``{user_id: {field: amount}}``; ``values`` maps ``ANALYTICS_FIELDS``
+    """
+    contributions = defaultdict(dict)
+    amount = values['amount'] or 0
+    net_amount = values['net_amount'] or 0
+    if values['status'] == 'completed':
+        contributions[values['payer_id']]['total_spent'] = amount
+        contributions[values['recipient_id']]['total_earned'] = net_amount
+        processed_at = values['processed_at']
+        if processed_at and processed_at >= month_start(now):
+            contributions[values['payer_id']]['current_month_spent'] = amount
+            contributions[values['recipient_id']]['current_month_earned'] = net_amount
+    elif values['status'] == 'pending':
+        contributions[values['payer_id']]['total_pending_payments'] = amount
+    return contributions
+
 class Payment(models.Model):
     PAYMENT_STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -62,6 +95,9 @@ class Payment(models.Model):
             models.Index(fields=['payment_type', '-created_at']),
         ]
     
+    # Values last written to the database, None until the payment is saved
+    _analytics_values = None
+    
     def __str__(self):
         return f"Payment {self.id}: ${self.amount} from {self.payer.username} to {self.recipient.username}"
     
@@ -77,12 +113,33 @@ class Payment(models.Model):
         # Set project from contract if not set
         if not self.project and self.contract:
             self.project = self.contract.project_proposal.project
-            
-        super().save(*args, **kwargs)
+        
+        # Analytics move by the difference between the old and new row, in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            PaymentAnalytics.apply_change(self._analytics_values, self.analytics_values())
+        self._analytics_values = self.analytics_values()
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._analytics_values = instance.analytics_values()
+        return instance
+    
+    def analytics_values(self):
+        return {field: getattr(self, field) for field in ANALYTICS_FIELDS}
 
 
 class PaymentAnalytics(models.Model):
-    """Store aggregated payment analytics for performance"""
+    """
+    Store aggregated payment analytics for performance
+    
+    Totals are moved by F-expression deltas whenever a payment is saved or
+    deleted, so a payment write costs the same however long the account's
+    history is. ``reconcile_payment_analytics`` recomputes them periodically
+    as a safety net for writes that bypass ``Payment.save`` (queryset
+    ``update()``, raw SQL).
+    """
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='payment_analytics')
     
     # Lifetime totals
@@ -90,99 +147,132 @@ class PaymentAnalytics(models.Model):
     total_spent = models.DecimalField(max_digits=15, decimal_places=2, default=0)
     total_pending_payments = models.DecimalField(max_digits=15, decimal_places=2, default=0)
     
-    # Monthly totals
+    # Monthly totals, for the month starting on month_start
     current_month_earned = models.DecimalField(max_digits=15, decimal_places=2, default=0)
     current_month_spent = models.DecimalField(max_digits=15, decimal_places=2, default=0)
-    
-    # Project counts
-    completed_projects_count = models.IntegerField(default=0)
-    pending_projects_count = models.IntegerField(default=0)
-    available_projects_count = models.IntegerField(default=0)  # For freelancers - projects they can bid on
+    month_start = models.DateTimeField(null=True, blank=True)
     
     # Last updated
     last_updated = models.DateTimeField(auto_now=True)
     
+    TOTAL_FIELDS = ('total_earned', 'total_spent', 'total_pending_payments', 'current_month_earned', 'current_month_spent')
+    MONTHLY_FIELDS = ('current_month_earned', 'current_month_spent')
+    
     def __str__(self):
         return f"Analytics for {self.user.username}"
     
+    def monthly_totals(self):
+        """``(earned, spent)`` this month; a row untouched since last month has none yet"""
+        if self.month_start != month_start():
+            return Decimal('0.00'), Decimal('0.00')
+        return self.current_month_earned, self.current_month_spent
+    
     @classmethod
-    def update_analytics(cls, user):
-        """Update analytics for a specific user"""
-        analytics, created = cls.objects.get_or_create(user=user)
-        
-        # Current month date range
+    def apply_change(cls, old_values, new_values):
+        """
+        Move both parties' totals from ``old_values`` to ``new_values`` of one
+        payment. Users without a row yet are skipped; their row is built from
+        history the first time it is read.
+        """
         now = timezone.now()
-        start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        deltas = defaultdict(lambda: defaultdict(Decimal))
+        for sign, values in ((-1, old_values), (1, new_values)):
+            if values is None:
+                continue
+            for user_id, contribution in analytics_contributions(values, now).items():
+                for field, amount in contribution.items():
+                    deltas[user_id][field] += sign * amount
         
-        if user.user_type == 'freelancer':
-            # Freelancer analytics
-            completed_payments = Payment.objects.filter(
-                recipient=user,
-                status='completed'
-            )
-            
-            analytics.total_earned = sum(p.net_amount or 0 for p in completed_payments)
-            analytics.current_month_earned = sum(
-                p.net_amount or 0 for p in completed_payments.filter(processed_at__gte=start_of_month)
+        for user_id, delta in deltas.items():
+            delta = {field: amount for field, amount in delta.items() if amount}
+            if delta:
+                cls.apply_delta(user_id, delta, now)
+    
+    @classmethod
+    def apply_delta(cls, user_id, delta, now=None):
+        """Add ``delta`` to a user's totals in one UPDATE; False when the user has no row yet"""
+        this_month = month_start(now)
+        updates = {field: F(field) + amount for field, amount in delta.items() if field not in cls.MONTHLY_FIELDS}
+        for field in cls.MONTHLY_FIELDS:
+            amount = delta.get(field, 0)
+            # The first event of a month starts its totals from zero
+            updates[field] = Case(
+                When(month_start=this_month, then=F(field) + amount),
+                default=Value(Decimal(amount)),
+                output_field=models.DecimalField(max_digits=15, decimal_places=2),
             )
-            
-            # Project counts for freelancer
-            from contracts.models import Contract
-            analytics.completed_projects_count = Contract.objects.filter(
-                project_proposal__freelancer=user,
-                status='completed'
-            ).count()
-            
-            analytics.pending_projects_count = Contract.objects.filter(
-                project_proposal__freelancer=user,
-                status='active'
-            ).count()
-            
-            # Available projects (projects without accepted proposals that freelancer hasn't bid on)
-            from projects.models import Project, ProjectProposal
-            freelancer_proposals = ProjectProposal.objects.filter(freelancer=user).values_list('project_id', flat=True)
-            analytics.available_projects_count = Project.objects.filter(
-                status='open'
-            ).exclude(
-                id__in=freelancer_proposals
+        return cls.objects.filter(user_id=user_id).update(
+            month_start=this_month, last_updated=timezone.now(), **updates
+        ) > 0
+    
+    @classmethod
+    def payment_totals(cls, user_ids, now=None):
+        """Recompute the payment totals of ``user_ids`` with two grouped queries"""
+        this_month = month_start(now)
+        zero = Value(Decimal('0.00'), output_field=models.DecimalField(max_digits=15, decimal_places=2))
+        totals = {user_id: dict.fromkeys(cls.TOTAL_FIELDS, Decimal('0.00')) for user_id in user_ids}
+        completed = Q(status='completed')
+        this_month_completed = Q(status='completed', processed_at__gte=this_month)
+        
+        paid = Payment.objects.filter(payer_id__in=user_ids).values('payer_id').order_by().annotate(
+            total_spent=Coalesce(Sum('amount', filter=completed), zero),
+            current_month_spent=Coalesce(Sum('amount', filter=this_month_completed), zero),
+            total_pending_payments=Coalesce(Sum('amount', filter=Q(status='pending')), zero),
+        )
+        for row in paid:
+            totals[row.pop('payer_id')].update(row)
+        
+        received = Payment.objects.filter(recipient_id__in=user_ids).values('recipient_id').order_by().annotate(
+            total_earned=Coalesce(Sum('net_amount', filter=completed), zero),
+            current_month_earned=Coalesce(Sum('net_amount', filter=this_month_completed), zero),
+        )
+        for row in received:
+            totals[row.pop('recipient_id')].update(row)
+        return totals
+    
+    @classmethod
+    def project_counts(cls, user):
+        """
+        Contract and open-project counts shown next to the payment totals
+        
+        Read live rather than stored: they change with contracts and projects,
+        which never pass through ``apply_change``.
+        """
+        if user.user_type == 'freelancer':
+            contracts = Contract.objects.filter(freelancer=user)
+            available = Project.objects.filter(status='open').exclude(
+                Exists(ProjectProposal.objects.filter(project=OuterRef('pk'), freelancer=user))
             ).exclude(
-                proposals__status='accepted'
-            ).count()
-            
-        elif user.user_type == 'client':
-            # Client analytics
-            made_payments = Payment.objects.filter(
-                payer=user,
-                status='completed'
-            )
-            
-            analytics.total_spent = sum(p.amount for p in made_payments)
-            analytics.current_month_spent = sum(
-                p.amount for p in made_payments.filter(processed_at__gte=start_of_month)
-            )
-            
-            # Pending payments
-            analytics.total_pending_payments = sum(
-                p.amount for p in Payment.objects.filter(payer=user, status='pending')
+                Exists(ProjectProposal.objects.filter(project=OuterRef('pk'), status='accepted'))
             )
-            
-            # Project counts for client
-            from contracts.models import Contract
-            analytics.completed_projects_count = Contract.objects.filter(
-                project_proposal__project__client=user,
-                status='completed'
-            ).count()
-            
-            analytics.pending_projects_count = Contract.objects.filter(
-                project_proposal__project__client=user,
-                status='active'
-            ).count()
-            
-            # Available projects for client = their open projects
-            analytics.available_projects_count = Project.objects.filter(
-                client=user,
-                status='open'
-            ).count()
+        elif user.user_type == 'client':
+            contracts = Contract.objects.filter(client=user)
+            available = Project.objects.filter(client=user, status='open')
+        else:
+            return {'completed_projects_count': 0, 'pending_projects_count': 0, 'available_projects_count': 0}
         
-        analytics.save()
-        return analytics
\ No newline at end of file
+        counts = contracts.order_by().aggregate(
+            completed_projects_count=models.Count('id', filter=Q(status='completed')),
+            pending_projects_count=models.Count('id', filter=Q(status='active')),
+        )
+        counts['available_projects_count'] = available.count()
+        return counts
+    
+    @classmethod
+    def for_user(cls, user):
+        """The user's row, built from their payment history on first use"""
+        return cls.objects.filter(user=user).first() or cls.update_analytics(user)
+    
+    @classmethod
+    def update_analytics(cls, user):
+        """Recompute every stored total for a user from scratch"""
+        now = timezone.now()
+        values = cls.payment_totals([user.id], now)[user.id]
+        values['month_start'] = month_start(now)
+        analytics, _ = cls.objects.update_or_create(user=user, defaults=values)
+        return analytics
+
+
+def remove_payment_analytics(sender, instance, **kwargs):
+    """post_delete receiver for Payment: take the payment back out of both parties' totals"""
+    PaymentAnalytics.apply_change(instance._analytics_values, None)
@@ -0,0 +1,85 @@
+"""
+Invoice PDF for a single payment, laid out with ``freelancehub_backend.pdf``.
+"""
+from freelancehub_backend.pdf import REPORTLAB_AVAILABLE, footer, heading, render, spacer, table, text, title
+
+DATE_FORMAT = '%B %d, %Y'
+
+
+def invoice_pdf_data(payment, generated_at):
+    """Snapshot everything the invoice shows"""
+    return {
+        'id': payment.id,
+        'issued': payment.created_at.strftime(DATE_FORMAT),
+        'due': payment.due_date.strftime(DATE_FORMAT) if payment.due_date else 'On receipt',
+        'paid': payment.processed_at.strftime(DATE_FORMAT) if payment.processed_at else '',
+        'status': payment.get_status_display(),
+        'contract_id': payment.contract_id,
+        'project_title': payment.project.title if payment.project else '',
+        'parties': [
+            {'name': user.get_full_name() or user.username, 'email': user.email}
+            for user in (payment.payer, payment.recipient)
+        ],
+        'description': payment.description,
+        'payment_type': payment.get_payment_type_display(),
+        'milestone_number': payment.milestone_number if payment.is_milestone else None,
+        'amount': str(payment.amount),
+        'platform_fee': str(payment.platform_fee),
+        'net_amount': str(payment.net_amount if payment.net_amount is not None else payment.amount),
+        'transaction_id': payment.transaction_id or '',
+        'notes': payment.notes,
+        'generated_at': generated_at.strftime('%B %d, %Y at %I:%M %p'),
+    }
+
+
+def invoice_layout(data):
+    payer, recipient = data['parties']
+    item = data['payment_type']
+    if data['milestone_number']:
+        item = f"{item} (milestone {data['milestone_number']})"
+
+    details = [
+        ['Invoice #:', f"INV-{data['id']:06d}"],
+        ['Issued:', data['issued']],
+        ['Due:', data['due']],
+        ['Status:', data['status']],
+        ['Contract:', f"#{data['contract_id']} {data['project_title']}".strip()],
+    ]
+    if data['paid']:
+        details.append(['Paid:', data['paid']])
+    if data['transaction_id']:
+        details.append(['Transaction:', data['transaction_id']])
+
+    layout = [
+        title("INVOICE"),
+        spacer(20),
+        table(details, [2, 4], style='fields'),
+        spacer(20),
+        table([
+            ['BILLED TO', 'PAY TO'],
+            [payer['name'], recipient['name']],
+            [payer['email'], recipient['email']],
+        ], [3, 3], style='parties'),
+        spacer(20),
+        heading("ITEMS"),
+        table([
+            ['Description', 'Type', 'Amount'],
+            [data['description'], item, f"${data['amount']}"],
+        ], [3.5, 1.5, 1], style='list', wrap=[0]),
+        spacer(10),
+        table([
+            ['Subtotal:', f"${data['amount']}"],
+            ['Platform fee:', f"${data['platform_fee']}"],
+            ['Net to recipient:', f"${data['net_amount']}"],
+        ], [2, 4], style='fields'),
+        spacer(20),
+    ]
+    if data['notes']:
+        layout += [heading("NOTES"), text(data['notes']), spacer(15)]
+    layout += [spacer(15), footer(f"Generated on {data['generated_at']}")]
+    return layout
+
+
+def render_invoice_pdf(data):
+    """Render the invoice PDF and return its bytes"""
+    return render(invoice_layout(data))
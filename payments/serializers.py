@@ -47,7 +47,7 @@ class CreatePaymentSerializer(serializers.ModelSerializer):
             contract = Contract.objects.get(id=value)
             # Ensure user has access to this contract
             user = self.context['request'].user
-            if user != contract.client and user != contract.freelancer and not user.is_superuser:
+            if not contract.is_party(user) and not user.is_superuser:
                 raise serializers.ValidationError("You don't have access to this contract")
             return value
         except Contract.DoesNotExist:
@@ -68,7 +68,7 @@ class CreatePaymentSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError("Recipient not found")
         else:
             # Default recipient logic
-            if payer == contract.client:
+            if payer.id == contract.client_id:
                 recipient = contract.freelancer
             else:
                 recipient = contract.client
@@ -91,8 +91,7 @@ class PaymentAnalyticsSerializer(serializers.ModelSerializer):
         model = PaymentAnalytics
         fields = [
             'user', 'total_earned', 'total_spent', 'total_pending_payments',
-            'current_month_earned', 'current_month_spent', 'completed_projects_count',
-            'pending_projects_count', 'available_projects_count', 'last_updated'
+            'current_month_earned', 'current_month_spent', 'last_updated'
         ]
 
 class PaymentSummarySerializer(serializers.Serializer):
@@ -128,5 +127,5 @@ class DashboardAnalyticsSerializer(serializers.Serializer):
     # Payment breakdown by type
     payment_breakdown = serializers.DictField()
     
-    # Monthly trends (last 6 months)
+    # Trend buckets for the requested range and granularity
     monthly_trends = serializers.ListField()
\ No newline at end of file
@@ -1,3 +1,219 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from contracts.models import Contract
+from freelancehub_backend import pdf
+from projects.models import Project, ProjectProposal
+from . import analytics as payment_analytics
+from .models import Payment, PaymentAnalytics, month_start
+
+User = get_user_model()
+
+
+def create_contract(client, freelancer):
+    project = Project.objects.create(
+        title="Website redesign",
+        description="Redesign the marketing site",
+        budget=1000,
+        deadline=timezone.now() + timedelta(days=30),
+        client=client
+    )
+    proposal = ProjectProposal.objects.create(
+        project=project, freelancer=freelancer, cover_letter="I can do this",
+        proposed_budget=900, status='accepted'
+    )
+    return Contract.objects.create(project_proposal=proposal, start_date=date.today(), total_payment=900)
+
+
+class PaymentInvoiceTestCase(TestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            username="client", email="client@example.com", password="testpass123", user_type='client'
+        )
+        self.freelancer = User.objects.create_user(
+            username="freelancer", email="freelancer@example.com", password="testpass123", user_type='freelancer'
+        )
+        contract = create_contract(self.client_user, self.freelancer)
+        self.payment = Payment.objects.create(
+            contract=contract, payer=self.client_user, recipient=self.freelancer, amount=300,
+            platform_fee=30, description="First milestone <design & copy>", notes="Thanks!"
+        )
+        self.client = APIClient()
+
+    def test_invoice_pdf_is_rendered_with_shared_styles(self):
+        """Test the invoice download, its access check and that styles are built once"""
+        pdf.styles.cache_clear()
+        self.client.force_authenticate(user=self.freelancer)
+        for _ in range(2):
+            response = self.client.get(f"/api/payments/payments/{self.payment.id}/invoice/")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response["Content-Type"], "application/pdf")
+            self.assertTrue(response.content.startswith(b"%PDF"))
+        self.assertEqual(pdf.styles.cache_info().misses, 1)
+
+        outsider = User.objects.create_user(
+            username="outsider", email="outsider@example.com", password="testpass123", user_type='client'
+        )
+        self.client.force_authenticate(user=outsider)
+        response = self.client.get(f"/api/payments/payments/{self.payment.id}/invoice/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PaymentAnalyticsDeltaTestCase(TestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            username="client", email="client@example.com", password="testpass123", user_type='client'
+        )
+        self.freelancer = User.objects.create_user(
+            username="freelancer", email="freelancer@example.com", password="testpass123", user_type='freelancer'
+        )
+        self.contract = create_contract(self.client_user, self.freelancer)
+
+    def pay(self, amount, **kwargs):
+        return Payment.objects.create(
+            contract=self.contract, project=self.contract.project_proposal.project, payer=self.client_user,
+            recipient=self.freelancer, amount=amount, platform_fee=Decimal(amount) / 10,
+            description="Milestone", **kwargs
+        )
+
+    def complete(self, payment):
+        payment.status = 'completed'
+        with CaptureQueriesContext(connection) as queries:
+            payment.save()
+        return len(queries)
+
+    def analytics(self, user):
+        return PaymentAnalytics.objects.get(user=user)
+
+    def test_payment_writes_move_totals_by_delta_and_reconcile_fixes_drift(self):
+        """Test delta updates, constant write cost and the reconcile command"""
+        self.pay(100, status='completed')
+        PaymentAnalytics.for_user(self.client_user)
+        PaymentAnalytics.for_user(self.freelancer)
+
+        payment = self.pay(200)
+        self.assertEqual(self.analytics(self.client_user).total_pending_payments, Decimal('200.00'))
+        short_history = self.complete(payment)
+
+        client = self.analytics(self.client_user)
+        self.assertEqual(client.total_spent, Decimal('300.00'))
+        self.assertEqual(client.total_pending_payments, Decimal('0.00'))
+        self.assertEqual(client.monthly_totals(), (Decimal('0.00'), Decimal('300.00')))
+        self.assertEqual(self.analytics(self.freelancer).total_earned, Decimal('270.00'))
+
+        for _ in range(30):
+            self.pay(10, status='completed')
+        self.assertEqual(self.complete(self.pay(50)), short_history)
+
+        payment.delete()
+        self.assertEqual(self.analytics(self.client_user).total_spent, Decimal('450.00'))
+
+        # Writes that bypass Payment.save drift until the reconcile job runs
+        Payment.objects.filter(amount=50).update(amount=80, net_amount=72)
+        self.assertEqual(self.analytics(self.client_user).total_spent, Decimal('450.00'))
+        out = StringIO()
+        call_command("reconcile_payment_analytics", stdout=out)
+        self.assertIn("Fixed 2 of 2", out.getvalue())
+        self.assertEqual(self.analytics(self.client_user).total_spent, Decimal('480.00'))
+        self.assertEqual(self.analytics(self.freelancer).total_earned, Decimal('432.00'))
+
+        api = APIClient()
+        api.force_authenticate(user=self.client_user)
+        response = api.get("/api/payments/analytics/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Decimal(response.data["total_spent"]), Decimal('480.00'))
+
+    def test_project_counts_follow_contracts_after_the_row_exists(self):
+        """Test that project counts are read live, not from a row built before the contract changed"""
+        PaymentAnalytics.for_user(self.client_user)
+        api = APIClient()
+        api.force_authenticate(user=self.client_user)
+
+        Contract.objects.filter(id=self.contract.id).update(status='active')
+        response = api.get("/api/payments/analytics/")
+        self.assertEqual((response.data["pending_projects"], response.data["completed_projects"]), (1, 0))
+
+        Contract.objects.filter(id=self.contract.id).update(status='completed')
+        response = api.get("/api/payments/analytics/")
+        self.assertEqual((response.data["pending_projects"], response.data["completed_projects"]), (0, 1))
+
+
+class PaymentTrendsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client_user = User.objects.create_user(
+            username="client", email="client@example.com", password="testpass123", user_type='client'
+        )
+        freelancer = User.objects.create_user(
+            username="freelancer", email="freelancer@example.com", password="testpass123", user_type='freelancer'
+        )
+        contract = create_contract(self.client_user, freelancer)
+        this_month = month_start(timezone.localtime())
+        two_months_ago = payment_analytics.range_start(3, 'month')
+        for amount, processed_at, payment_type in [
+            (100, this_month, 'project_payment'),
+            (50, this_month + timedelta(hours=1), 'bonus_payment'),
+            (300, two_months_ago + timedelta(days=3), 'project_payment'),
+            (999, two_months_ago - timedelta(days=3), 'project_payment'),
+        ]:
+            Payment.objects.create(
+                contract=contract, payer=self.client_user, recipient=freelancer, amount=amount,
+                description="Work", status='completed', processed_at=processed_at, payment_type=payment_type
+            )
+        self.contract = contract
+        self.freelancer = freelancer
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.client_user)
+
+    def test_trends_and_breakdown_are_grouped_and_cached_until_the_next_payment(self):
+        """Test GROUP BY trends with empty months, the breakdown and per-user caching"""
+        response = self.client.get("/api/payments/analytics/", {"months": 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        trends = response.data["monthly_trends"]
+        self.assertEqual([entry["amount"] for entry in trends], [300.0, 0.0, 150.0])
+        self.assertEqual(trends[-1]["month"], month_start(timezone.localtime()).strftime('%Y-%m'))
+        self.assertEqual(response.data["payment_breakdown"]["project_payment"]["count"], 3)
+        self.assertEqual(response.data["payment_breakdown"]["bonus_payment"]["amount"], 50.0)
+
+        with mock.patch.object(payment_analytics, 'trends', wraps=payment_analytics.trends) as trends_query:
+            self.client.get("/api/payments/analytics/", {"months": 3})
+            self.assertEqual(trends_query.call_count, 0)
+            # Other ranges are cached under their own keys
+            self.client.get("/api/payments/analytics/", {"months": 6})
+            self.assertEqual(trends_query.call_count, 1)
+
+            with self.captureOnCommitCallbacks() as callbacks:
+                Payment.objects.create(
+                    contract=self.contract, payer=self.client_user, recipient=self.freelancer, amount=25,
+                    description="Work", status='completed'
+                )
+            # Until the payment commits, readers keep the cached figures
+            self.client.get("/api/payments/analytics/", {"months": 3})
+            self.assertEqual(trends_query.call_count, 1)
+            for callback in callbacks:
+                callback()
+
+            response = self.client.get("/api/payments/analytics/", {"months": 3})
+            self.assertEqual(trends_query.call_count, 2)
+            self.client.get("/api/payments/analytics/", {"months": 6})
+            self.assertEqual(trends_query.call_count, 3)
+        self.assertEqual(response.data["monthly_trends"][-1]["amount"], 175.0)
+
+        response = self.client.get("/api/payments/analytics/", {"months": 12, "granularity": "week"})
+        self.assertGreaterEqual(len(response.data["monthly_trends"]), 48)
+        self.assertEqual(sum(entry["amount"] for entry in response.data["monthly_trends"]), 1474.0)
 
-# Create your tests here.
+        response = self.client.get("/api/payments/analytics/", {"months": 5})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,6 +1,7 @@
 import stripe
 from django.conf import settings
 from django.db.models import Sum, Count, Q
+from django.http import HttpResponse
 from django.utils import timezone
 from datetime import datetime, timedelta
 from rest_framework import viewsets, status, permissions
@@ -8,6 +9,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
+from . import analytics as payment_analytics
 from .models import Payment, PaymentAnalytics
 from .serializers import (
     PaymentSerializer, CreatePaymentSerializer, PaymentAnalyticsSerializer,
@@ -15,6 +17,8 @@ from .serializers import (
 )
 from contracts.models import Contract
 from projects.models import Project
+from freelancehub_backend.exports import iter_queryset_chunks, jsonl_response, parse_after_id
+from .pdf import REPORTLAB_AVAILABLE, invoice_pdf_data, render_invoice_pdf
 
 stripe.api_key = getattr(settings, 'STRIPE_SECRET_KEY', 'sk_test_dummy')
 
@@ -63,13 +67,8 @@ class PaymentViewSet(viewsets.ModelViewSet):
         return PaymentSerializer
     
     def perform_create(self, serializer):
-        payment = serializer.save()
-        
-        # Update analytics for both users
-        PaymentAnalytics.update_analytics(payment.payer)
-        PaymentAnalytics.update_analytics(payment.recipient)
-        
-        return payment
+        # Payment.save moves both users' analytics
+        return serializer.save()
     
     @action(detail=False, methods=['get'])
     def my_payments(self, request):
@@ -152,6 +151,39 @@ class PaymentViewSet(viewsets.ModelViewSet):
         serializer = PaymentSummarySerializer(summary_data)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream payment history as JSONL (admins may pass ?user=<id>)"""
+        try:
+            after_id = parse_after_id(request)
+            user_id = int(request.query_params['user']) if request.query_params.get('user') else None
+        except ValueError:
+            return Response({'error': 'Invalid after_id or user'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = self.get_queryset()
+        if user_id and request.user.is_superuser:
+            queryset = queryset.filter(Q(payer_id=user_id) | Q(recipient_id=user_id))
+        
+        def records():
+            for chunk in iter_queryset_chunks(queryset, after_id):
+                yield from PaymentSerializer(chunk, many=True).data
+        
+        return jsonl_response(request, records(), f'payments-{user_id or request.user.id}')
+    
+    @action(detail=True, methods=['get'])
+    def invoice(self, request, pk=None):
+        """Download the payment as an invoice PDF"""
+        payment = self.get_object()
+        
+        if not REPORTLAB_AVAILABLE:
+            return Response({'error': 'PDF generation is not available'},
+                          status=status.HTTP_501_NOT_IMPLEMENTED)
+        
+        content = render_invoice_pdf(invoice_pdf_data(payment, timezone.now()))
+        response = HttpResponse(content, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="invoice-{payment.id}.pdf"'
+        return response
+    
     @action(detail=True, methods=['post'])
     def mark_completed(self, request, pk=None):
         """Mark payment as completed (admin only)"""
@@ -167,10 +199,6 @@ class PaymentViewSet(viewsets.ModelViewSet):
         payment.processed_at = timezone.now()
         payment.save()
         
-        # Update analytics
-        PaymentAnalytics.update_analytics(payment.payer)
-        PaymentAnalytics.update_analytics(payment.recipient)
-        
         return Response({'detail': 'Payment marked as completed'})
 
 class CreatePaymentIntentView(APIView):
@@ -192,7 +220,7 @@ class CreatePaymentIntentView(APIView):
             # Validate contract access
             try:
                 contract = Contract.objects.get(id=contract_id)
-                if request.user != contract.client and not request.user.is_superuser:
+                if request.user.id != contract.client_id and not request.user.is_superuser:
                     return Response(
                         {'error': 'Only the client can make payments for this contract'},
                         status=status.HTTP_403_FORBIDDEN
@@ -243,97 +271,52 @@ class PaymentAnalyticsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
+        """
+        Dashboard figures; ?months=3|6|12|24 (default 6) sets the trend range
+        and ?granularity=month|week its buckets
+        """
         user = request.user
+        granularity = request.query_params.get('granularity', 'month')
+        try:
+            months = int(request.query_params.get('months', payment_analytics.DEFAULT_RANGE_MONTHS))
+        except ValueError:
+            months = None
+        if months not in payment_analytics.RANGE_MONTHS:
+            return Response({'error': f'months must be one of {list(payment_analytics.RANGE_MONTHS)}'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        if granularity not in payment_analytics.GRANULARITIES:
+            return Response({'error': f'granularity must be one of {list(payment_analytics.GRANULARITIES)}'},
+                          status=status.HTTP_400_BAD_REQUEST)
         
-        # Update analytics first
-        analytics = PaymentAnalytics.update_analytics(user)
-        
-        # Get monthly trends (last 6 months)
-        monthly_trends = self.get_monthly_trends(user)
+        analytics = PaymentAnalytics.for_user(user)
+        current_month_earned, current_month_spent = analytics.monthly_totals()
+        project_counts = PaymentAnalytics.project_counts(user)
         
-        # Get payment breakdown by type
-        payment_breakdown = self.get_payment_breakdown(user)
+        # Trends and type breakdown, cached until the user's next payment event
+        monthly_trends, payment_breakdown = payment_analytics.dashboard_figures(user, months, granularity)
         
         # Get recent payments
         recent_payments = Payment.objects.filter(
             Q(payer=user) | Q(recipient=user)
-        ).order_by('-created_at')[:5]
+        ).select_related('payer', 'recipient', 'contract', 'project').order_by('-created_at')[:5]
         
         dashboard_data = {
             'user_type': user.user_type,
             'total_earned': analytics.total_earned if user.user_type == 'freelancer' else 0,
             'total_spent': analytics.total_spent if user.user_type == 'client' else 0,
             'pending_payments': analytics.total_pending_payments,
-            'current_month_earned': analytics.current_month_earned,
-            'current_month_spent': analytics.current_month_spent,
-            'completed_projects': analytics.completed_projects_count,
-            'pending_projects': analytics.pending_projects_count,
-            'available_projects': analytics.available_projects_count,
-            'recent_payments': PaymentSerializer(recent_payments, many=True).data,
+            'current_month_earned': current_month_earned,
+            'current_month_spent': current_month_spent,
+            'completed_projects': project_counts['completed_projects_count'],
+            'pending_projects': project_counts['pending_projects_count'],
+            'available_projects': project_counts['available_projects_count'],
+            'recent_payments': recent_payments,
             'payment_breakdown': payment_breakdown,
             'monthly_trends': monthly_trends,
         }
         
         serializer = DashboardAnalyticsSerializer(dashboard_data)
         return Response(serializer.data)
-    
-    def get_monthly_trends(self, user):
-        """Get payment trends for last 6 months"""
-        trends = []
-        now = timezone.now()
-        
-        for i in range(6):
-            month_start = (now.replace(day=1) - timedelta(days=32*i)).replace(day=1)
-            month_end = (month_start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
-            
-            if user.user_type == 'freelancer':
-                amount = Payment.objects.filter(
-                    recipient=user,
-                    status='completed',
-                    processed_at__range=[month_start, month_end]
-                ).aggregate(Sum('net_amount'))['net_amount__sum'] or 0
-            else:
-                amount = Payment.objects.filter(
-                    payer=user,
-                    status='completed',
-                    processed_at__range=[month_start, month_end]
-                ).aggregate(Sum('amount'))['amount__sum'] or 0
-            
-            trends.append({
-                'month': month_start.strftime('%Y-%m'),
-                'amount': float(amount),
-                'label': month_start.strftime('%B %Y')
-            })
-        
-        return list(reversed(trends))
-    
-    def get_payment_breakdown(self, user):
-        """Get payment breakdown by type"""
-        if user.user_type == 'freelancer':
-            payments = Payment.objects.filter(recipient=user, status='completed')
-        else:
-            payments = Payment.objects.filter(payer=user, status='completed')
-        
-        breakdown = {}
-        for payment_type, label in Payment.PAYMENT_TYPE_CHOICES:
-            count = payments.filter(payment_type=payment_type).count()
-            if count > 0:
-                if user.user_type == 'freelancer':
-                    amount = payments.filter(payment_type=payment_type).aggregate(
-                        Sum('net_amount')
-                    )['net_amount__sum'] or 0
-                else:
-                    amount = payments.filter(payment_type=payment_type).aggregate(
-                        Sum('amount')
-                    )['amount__sum'] or 0
-                
-                breakdown[payment_type] = {
-                    'label': label,
-                    'count': count,
-                    'amount': float(amount)
-                }
-        
-        return breakdown
 
 class PaymentWebhookView(APIView):
     """Handle Stripe webhook events"""
@@ -374,10 +357,6 @@ class PaymentWebhookView(APIView):
             payment.transaction_id = payment_intent.get('charges', {}).get('data', [{}])[0].get('id')
             payment.save()
             
-            # Update analytics
-            PaymentAnalytics.update_analytics(payment.payer)
-            PaymentAnalytics.update_analytics(payment.recipient)
-            
         except Payment.DoesNotExist:
             pass  # Payment not found
     
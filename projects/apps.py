@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete
 
 
 class ProjectsConfig(AppConfig):
@@ -7,3 +8,6 @@ class ProjectsConfig(AppConfig):
     
     def ready(self):
         import projects.signals
+        from blobstore.storage import release_files
+        from .models import ProjectAttachment
+        post_delete.connect(release_files, sender=ProjectAttachment, dispatch_uid='project_attachment_release_files')
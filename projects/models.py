@@ -1,4 +1,5 @@
 from django.db import models
+from blobstore.storage import get_blob_storage
 from users.models import CustomUser
 
 class Category(models.Model):
@@ -69,7 +70,7 @@ class ProjectProposal(models.Model):
 
 class ProjectAttachment(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='project_attachments')
-    file = models.FileField(upload_to='project_attachments/')
+    file = models.FileField(upload_to='project_attachments/', storage=get_blob_storage)
     filename = models.CharField(max_length=255)
     uploaded_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     uploaded_at = models.DateTimeField(auto_now_add=True)
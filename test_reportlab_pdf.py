@@ -13,8 +13,10 @@ sys.path.append('/Users/rejan/Documents/Epita/Action Learning /final')
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'freelancehub_backend.settings')
 django.setup()
 
+from django.utils import timezone
+
 from contracts.models import Contract
-from contracts.pdf_generator_reportlab import ContractPDFGenerator
+from contracts.pdf_generator import contract_pdf_data, render_contract_pdf
 import traceback
 
 def test_reportlab_pdf():
@@ -33,8 +35,7 @@ def test_reportlab_pdf():
         
         # Test PDF generation
         print("🎨 Generating PDF with ReportLab...")
-        pdf_generator = ContractPDFGenerator()
-        pdf_content = pdf_generator.generate_contract_pdf(contract)
+        pdf_content = render_contract_pdf(contract_pdf_data(contract, timezone.now()))
         
         if pdf_content and len(pdf_content) > 0:
             print(f"✅ PDF generated! Size: {len(pdf_content):,} bytes")
@@ -46,13 +47,6 @@ def test_reportlab_pdf():
             
             print(f"💾 PDF saved to: {output_file}")
             
-            # Test the HTTP response creation
-            print("🌐 Testing HTTP response...")
-            response = pdf_generator.create_pdf_response(contract)
-            print(f"✅ HTTP response created: {response.status_code}")
-            print(f"   Content-Type: {response.get('Content-Type')}")
-            print(f"   Content-Length: {response.get('Content-Length')}")
-            
             return True
         else:
             print("❌ PDF generation failed")
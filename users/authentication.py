@@ -0,0 +1,19 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+
+
+class VersionedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that also checks the ``token_version`` claim.
+
+    Access tokens issued before a password change or deactivation carry a stale
+    version and are refused, matching the WebSocket middleware.
+    """
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        version = validated_token.get('token_version')
+        if version is not None and version != user.token_version:
+            raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+        return user
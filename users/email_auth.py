@@ -10,7 +10,9 @@ class EmailTokenObtainPairSerializer(TokenObtainPairSerializer):
 
     @classmethod
     def get_token(cls, user):
-        return super().get_token(user)
+        token = super().get_token(user)
+        token['token_version'] = user.token_version
+        return token
 
     def validate(self, attrs):
         email = attrs.get('email')
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.db import models
+from django.utils.crypto import salted_hmac
 
 class CustomUser(AbstractUser):
     USER_TYPE_CHOICES = (
@@ -25,4 +26,17 @@ class CustomUser(AbstractUser):
         help_text='Specific permissions for this user.',
         verbose_name='user permissions',
     )
+
+    @property
+    def token_version(self):
+        """
+        Changes whenever the password or active flag changes, invalidating issued tokens
+
+        Keyed on SECRET_KEY so the claim carried in every token reveals nothing
+        about the password hash.
+        """
+        return salted_hmac(
+            'users.CustomUser.token_version', f'{self.password}:{self.is_active}',
+            algorithm='sha256'
+        ).hexdigest()[:16]
 # Create your models here.
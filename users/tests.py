@@ -1,3 +1,36 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .email_auth import EmailTokenObtainPairSerializer
+
+User = get_user_model()
+
+
+class VersionedJWTAuthenticationTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="rest",
+            email="rest@example.com",
+            password="testpass123"
+        )
+        self.client = APIClient()
+
+    def test_password_change_revokes_rest_token(self):
+        """Test that access tokens issued before a password change are refused over REST"""
+        token = str(EmailTokenObtainPairSerializer.get_token(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        response = self.client.get("/api/notifications/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.user.set_password("newpass456")
+        self.user.save()
+        response = self.client.get("/api/notifications/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_version_is_keyed_on_secret_key(self):
+        """Test that the token version claim depends on SECRET_KEY, not just the password hash"""
+        version = self.user.token_version
+        with override_settings(SECRET_KEY="another-secret-key-for-this-test"):
+            self.assertNotEqual(self.user.token_version, version)